@@ -0,0 +1,582 @@
+import board
+import cmd
+import interpreter
+import script_parser
+import vector_compiler
+from math import ceil
+from random import Random
+from functools import wraps
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency, only needed by the batch engine
+    np = None
+
+
+def batch_critical_action(func):
+    # Same as cmd.critical_action, for commands which act on the acting unit of the current game of a batch
+    @wraps(func)
+    def decorated(self, *args, **kwargs):
+        if self.engine.can_current_act() is False:
+            return False  # Could not perform action
+        self.engine.critical_action_performed()
+        return func(self, *args, **kwargs)
+    decorated.critical = True
+    return decorated
+
+
+class BatchCommands(cmd.Commands):
+    # The user commands of cmd.Commands, executed by the acting unit of the current game of a batch engine (the game
+    # whose script is being executed). Arithmetic and general commands are inherited as is, so scripts analyzed by the
+    # interpreter with these commands behave exactly as in a regular game
+    def __init__(self, engine):
+        self.engine = engine
+        self.bound_functions = cmd.bind_commands(self)
+
+    ####################################################################################################################
+    # Critical actions
+    ####################################################################################################################
+
+    @batch_critical_action
+    def attack(self):
+        self.engine.act_attack(*self.engine.acting_unit())
+        return True
+
+    @batch_critical_action
+    def charge_attack(self, num_turns):
+        self.engine.act_charge_attack(*self.engine.acting_unit(), np.array([num_turns], dtype=np.float64))
+        return True
+
+    @batch_critical_action
+    def move(self):
+        self.engine.act_move(*self.engine.acting_unit())
+        return True
+
+    @batch_critical_action
+    def spawn(self):
+        self.engine.act_spawn(*self.engine.acting_unit())
+        return True
+
+    @batch_critical_action
+    def wait(self):
+        return True
+
+    @batch_critical_action
+    def defend(self):
+        self.engine.act_defend(*self.engine.acting_unit())
+        return True
+
+    @batch_critical_action
+    def fortify(self):
+        self.engine.act_fortify(*self.engine.acting_unit())
+        return True
+
+    ####################################################################################################################
+    # Non-critical actions (information-providing commands)
+    ####################################################################################################################
+
+    def get_unit_id(self):
+        return self.engine.info_value("get_unit_id")
+
+    def get_turn_number(self):
+        return self.engine.info_value("get_turn_number")
+
+    def num_adjacent_allies(self):
+        return self.engine.info_value("num_adjacent_allies")
+
+    def num_adjacent_enemies(self):
+        return self.engine.info_value("num_adjacent_enemies")
+
+    def num_total_allies(self):
+        return self.engine.info_value("num_total_allies")
+
+    def num_total_enemies(self):
+        return self.engine.info_value("num_total_enemies")
+
+    def distance_from_closest_ally(self):
+        return self.engine.info_value("distance_from_closest_ally")
+
+    def distance_from_closest_enemy(self):
+        return self.engine.info_value("distance_from_closest_enemy")
+
+    @cmd.pure
+    def get_unit_limit(self):
+        return self.engine.unit_limit
+
+
+def called_commands(sequence, names=None):
+    # Return the set of names of all commands called anywhere in a parsed script
+    if names is None:
+        names = set()
+    for node in sequence.statements:
+        if isinstance(node, script_parser.Call):
+            names.add(node.name)
+            for arg in node.args:
+                called_commands(arg, names)
+    return names
+
+
+class BatchEngine:
+    # Plays many games between the same strategies in lockstep. Instead of an object per unit, the state of all games is
+    # held in numpy arrays with one row per game: the board (owner player id and unit slot of every cell) and the units
+    # (one column per unit slot; hp, timers, defense, location, ...). Each call to step() plays one unit turn in every
+    # game which has not ended yet. Turn start (timers, spawns and charged attacks), the info commands and all actions
+    # are array operations over the games.
+    # Scripts are run in one of two modes:
+    # - "vector": each script is compiled into a program over arrays (see vector_compiler), which executes the script
+    #   for the acting units of all games of a player at once. Scripts using constructs which have no array equivalent
+    #   fall back to the scalar mode
+    # - "scalar": each script is analyzed by the regular interpreter, and executed game by game
+    # The rules are those of Game (see unit.py and board.py), and the order of play is the same:
+    # - Every game keeps its units in a ring in acting order, and new units are inserted just before the acting unit,
+    #   exactly like TurnHandler does
+    # - With rng_mode "python", every game has its own random.Random seeded with its seed, and makes the same calls to
+    #   it as Board does, so game i plays exactly like Game(filepaths, seed=seeds[i]). This is what makes the engine
+    #   testable against Game
+    # - With rng_mode "numpy", random choices are drawn from a single numpy generator for the whole batch. This is
+    #   faster, but games then differ from those of Game with the same seeds (while following the same rules)
+    rng_modes = ("python", "numpy")
+    script_modes = ("vector", "scalar")
+    max_players = 2 ** 15 - 1  # Player ids are stored as int16 (see owner and unit_player)
+
+    def __init__(self, filepaths, num_games, board_size=None, turn_limit=10000, unit_limit_pct=0.05, seeds=None,
+                 rng_mode="python", script_mode="vector", interpreter_mode="compiled", early_exit=False):
+        if np is None:
+            raise Exception("The batch engine requires numpy")
+        if board_size is None:  # Avoid mutable default argument
+            board_size = [20, 20]
+        if len(filepaths) < 2:
+            raise Exception("Game requires at least two players. "
+                            "Provide a file path for the script used for each player")
+        if len(filepaths) > BatchEngine.max_players:
+            raise Exception("The batch engine supports at most " + str(BatchEngine.max_players) + " players and got "
+                            + str(len(filepaths)))
+        if rng_mode not in BatchEngine.rng_modes:
+            raise Exception("Unknown rng mode " + str(rng_mode) + "; expected one of " + str(BatchEngine.rng_modes))
+        if script_mode not in BatchEngine.script_modes:
+            raise Exception("Unknown script mode " + str(script_mode) + "; expected one of "
+                            + str(BatchEngine.script_modes))
+        if unit_limit_pct <= 0 or unit_limit_pct > 1:
+            raise Exception("Unit limit (% of board capacity) must be greater than 0 and less than or equal to 1")
+        if seeds is None:
+            seed_generator = Random()
+            seeds = [seed_generator.getrandbits(32) for _ in range(num_games)]
+        if len(seeds) != num_games:
+            raise Exception("Expected " + str(num_games) + " seeds and got " + str(len(seeds)))
+
+        self.num_games = num_games
+        self.num_players = len(filepaths)  # Player ids are 1 to num_players, as in Game. 0 marks free cells
+        self.board_size = board_size
+        self.num_cells = board_size[0] * board_size[1]
+        self.turn_limit = turn_limit
+        self.unit_limit = ceil(board_size[0] * board_size[1] * unit_limit_pct)
+        self.num_slots = self.unit_limit * self.num_players  # Maximal number of units alive at once in a game
+        self.seeds = list(seeds)
+        self.rng_mode = rng_mode
+        self.rngs = [Random(seed) for seed in self.seeds]
+        self.np_rng = np.random.default_rng(self.seeds)
+
+        # Neighbour table of the board, shared with Board so that neighbours are listed in the same order
+        self.neighbours = np.array(board.neighbour_table(board_size), dtype=np.int64)
+
+        # Board state: game -> cell -> player id of the unit in the cell (0 if free), and slot of the unit (-1 if free)
+        num_games, num_slots = self.num_games, self.num_slots
+        self.owner = np.zeros((num_games, self.num_cells), dtype=np.int16)
+        self.slot_at = np.full((num_games, self.num_cells), -1, dtype=np.int64)
+
+        # Unit state: game -> unit slot -> value. Free slots have alive set to False
+        self.alive = np.zeros((num_games, num_slots), dtype=bool)
+        self.unit_id = np.zeros((num_games, num_slots), dtype=np.int64)
+        self.unit_player = np.zeros((num_games, num_slots), dtype=np.int16)
+        self.unit_cell = np.zeros((num_games, num_slots), dtype=np.int64)
+        self.hp = np.zeros((num_games, num_slots), dtype=np.int64)
+        self.spawn_timer = np.zeros((num_games, num_slots), dtype=np.int64)
+        self.charge_timer = np.zeros((num_games, num_slots), dtype=np.float64)  # May be set to any number by a script
+        self.charge_strength = np.zeros((num_games, num_slots), dtype=np.int64)
+        self.unit_turn_number = np.zeros((num_games, num_slots), dtype=np.int64)
+        self.defending = np.zeros((num_games, num_slots), dtype=bool)
+        self.acted = np.zeros((num_games, num_slots), dtype=bool)  # Performed a critical action this turn
+        self.free_slots = [list(range(num_slots - 1, -1, -1)) for _ in range(num_games)]
+
+        # User-defined variables. Scripts run in scalar mode keep them in a list per unit, and scripts run in vector
+        # mode in a column per variable: name -> (game -> slot -> value, game -> slot -> whether it is defined)
+        self.var_data = [[[] for _ in range(num_slots)] for _ in range(num_games)]
+        self.variables = {}
+
+        # Turn order: game -> slot -> next/previous slot in acting order, and the slot of the acting unit of each game
+        self.next_slot = np.zeros((num_games, num_slots), dtype=np.int64)
+        self.prev_slot = np.zeros((num_games, num_slots), dtype=np.int64)
+        self.current = np.full(num_games, -1, dtype=np.int64)
+
+        # Game state
+        self.turn_number = np.zeros(num_games, dtype=np.int64)
+        self.num_units_spawned = np.zeros(num_games, dtype=np.int64)
+        self.player_units = np.zeros((num_games, self.num_players + 1), dtype=np.int64)  # Indexed by player id
+        self.ended = np.zeros(num_games, dtype=bool)
+
+        # Scripts, indexed by player id. All games share the same scripts: scalar scripts act on the game set in
+        # self.game, and vector programs on the games they are given
+        self.commands = BatchCommands(self)
+        self.interpreter = interpreter.Interpreter(self.commands, interpreter_mode, early_exit=early_exit)
+        self.vector_compiler = vector_compiler.VectorCompiler(self)
+        self.scripts = [None]
+        self.programs = [None]
+        self.used_info = set()
+        for path in filepaths:
+            with open(path, 'r') as input_file:
+                bot_cmds = input_file.read()
+            tree = self.interpreter.parse_tree(bot_cmds)
+            program = None
+            if script_mode == "vector":
+                try:
+                    program = self.vector_compiler.compile(tree)
+                except vector_compiler.NotVectorizable:
+                    pass  # Run this script game by game instead
+            self.programs.append(program)
+            self.scripts.append(self.interpreter.analyze(bot_cmds) if program is None else None)
+            self.used_info |= called_commands(tree) & set(vector_compiler.info_commands)
+        self.game = 0  # Game and slot of the unit whose scalar script is executed
+        self.slot = 0
+        self.lane = 0  # Index of the game among the games whose scripts are executed
+        self.info_cache = {}  # Info command -> list of its value for the acting unit of each of these games
+        self.info_fresh = False  # Whether info_cache holds the values of the current game
+
+        for game_idx in range(num_games):
+            self.spawn_initial_units(game_idx)
+        self.update_ended()
+
+    def variable_columns(self, name):
+        # Return the value and definition columns of a variable of vector programs, creating them if needed
+        if name not in self.variables:
+            self.variables[name] = (np.zeros((self.num_games, self.num_slots), dtype=np.float64),
+                                    np.zeros((self.num_games, self.num_slots), dtype=bool))
+        return self.variables[name]
+
+    ####################################################################################################################
+    # Randomness
+    ####################################################################################################################
+
+    def random_cell(self, game_idx):
+        # Same as Board.get_random_location
+        if self.rng_mode == "python":
+            rng = self.rngs[game_idx]
+            return rng.randint(0, self.board_size[0] - 1) * self.board_size[1] + rng.randint(0, self.board_size[1] - 1)
+        return int(self.np_rng.integers(self.num_cells))
+
+    def choose_neighbours(self, games, candidates):
+        # Pick one neighbour for each of the given games, among the neighbours marked in candidates (an array of one row
+        # of 8 booleans per game). Returns the position of the chosen neighbour in the neighbour table, or -1 for games
+        # with no candidates. Board lists the candidate cells in the order of the neighbour table and picks one with
+        # rng.choice, and the "python" rng mode does exactly the same
+        counts = candidates.sum(axis=1)
+        if self.rng_mode == "python":
+            chosen = np.full(len(games), -1, dtype=np.int64)
+            for idx in np.flatnonzero(counts).tolist():
+                chosen[idx] = self.rngs[games[idx]].choice(np.flatnonzero(candidates[idx]).tolist())
+            return chosen
+        picks = (self.np_rng.random(len(games)) * counts).astype(np.int64)
+        chosen = (np.cumsum(candidates, axis=1) > picks[:, None]).argmax(axis=1)
+        return np.where(counts > 0, chosen, -1)
+
+    def neighbour_owners(self, games, slots):
+        # Return the neighbouring cells of the given units, and the player ids owning them (one row per unit)
+        neighbour_cells = self.neighbours[self.unit_cell[games, slots]]
+        return neighbour_cells, self.owner[games[:, None], neighbour_cells]
+
+    ####################################################################################################################
+    # Units
+    ####################################################################################################################
+
+    def spawn_initial_units(self, game_idx):
+        # Same as Game.spawn_initial_units
+        spawn_cells = set()
+        new_cell = self.random_cell(game_idx)
+        for player_id in range(1, self.num_players + 1):
+            while new_cell in spawn_cells:
+                new_cell = self.random_cell(game_idx)
+            spawn_cells.add(new_cell)
+            self.spawn_unit(game_idx, player_id, new_cell)
+
+    def spawn_unit(self, game_idx, player_id, cell, unit_hp=3):
+        # Same as Board.spawn_unit
+        if self.player_units[game_idx, player_id] >= self.unit_limit:
+            return False
+        slot = self.free_slots[game_idx].pop()
+        self.num_units_spawned[game_idx] += 1
+        self.unit_id[game_idx, slot] = self.num_units_spawned[game_idx]
+        self.unit_player[game_idx, slot] = player_id
+        self.unit_cell[game_idx, slot] = cell
+        self.hp[game_idx, slot] = unit_hp
+        self.spawn_timer[game_idx, slot] = 0
+        self.charge_timer[game_idx, slot] = 0
+        self.charge_strength[game_idx, slot] = 0
+        self.unit_turn_number[game_idx, slot] = 0
+        self.defending[game_idx, slot] = False
+        self.acted[game_idx, slot] = False
+        self.var_data[game_idx][slot] = []
+        for values, defined in self.variables.values():
+            defined[game_idx, slot] = False
+        self.alive[game_idx, slot] = True
+        self.owner[game_idx, cell] = player_id
+        self.slot_at[game_idx, cell] = slot
+        self.player_units[game_idx, player_id] += 1
+
+        # Insert the unit into the turn order just before the acting unit, as TurnHandler.add_to_queue does
+        current = self.current[game_idx]
+        if current < 0:
+            self.current[game_idx] = slot
+            self.next_slot[game_idx, slot] = slot
+            self.prev_slot[game_idx, slot] = slot
+        else:
+            prev = self.prev_slot[game_idx, current]
+            self.next_slot[game_idx, prev] = slot
+            self.prev_slot[game_idx, slot] = prev
+            self.next_slot[game_idx, slot] = current
+            self.prev_slot[game_idx, current] = slot
+        return True
+
+    def despawn_unit(self, game_idx, slot):
+        # Same as Board.despawn_unit
+        cell = self.unit_cell[game_idx, slot]
+        self.owner[game_idx, cell] = 0
+        self.slot_at[game_idx, cell] = -1
+        self.alive[game_idx, slot] = False
+        self.player_units[game_idx, self.unit_player[game_idx, slot]] -= 1
+        prev = self.prev_slot[game_idx, slot]
+        nxt = self.next_slot[game_idx, slot]
+        self.next_slot[game_idx, prev] = nxt
+        self.prev_slot[game_idx, nxt] = prev
+        if self.current[game_idx] == slot:
+            self.current[game_idx] = nxt
+        self.free_slots[game_idx].append(slot)
+
+    def spawn_in_adjacent_cells(self, games, slots):
+        # Same as Board.spawn_in_adjacent_location, for a unit in each of the given games
+        neighbour_cells, neighbour_owners = self.neighbour_owners(games, slots)
+        chosen = self.choose_neighbours(games, neighbour_owners == 0)
+        for idx in np.flatnonzero(chosen >= 0).tolist():
+            game_idx = games[idx]
+            self.spawn_unit(game_idx, self.unit_player[game_idx, slots[idx]], neighbour_cells[idx, chosen[idx]])
+
+    def attack_adjacent_enemies(self, games, slots, dmg):
+        # Same as Board.attack_adjacent_enemy followed by Unit.damage on the attacked units, for a unit in each of the
+        # given games. dmg holds the damage dealt by each unit
+        players = self.unit_player[games, slots]
+        neighbour_cells, neighbour_owners = self.neighbour_owners(games, slots)
+        chosen = self.choose_neighbours(games, (neighbour_owners != 0) & (neighbour_owners != players[:, None]))
+        hits = np.flatnonzero(chosen >= 0)
+        if len(hits) == 0:
+            return
+        hit_games = games[hits]
+        targets = self.slot_at[hit_games, neighbour_cells[hits, chosen[hits]]]
+        blocked = self.defending[hit_games, targets]
+        self.defending[hit_games[blocked], targets[blocked]] = False
+        damaged_games = hit_games[~blocked]
+        damaged = targets[~blocked]
+        self.hp[damaged_games, damaged] -= dmg[hits][~blocked]
+        killed = self.hp[damaged_games, damaged] <= 0
+        for game_idx, slot in zip(damaged_games[killed].tolist(), damaged[killed].tolist()):
+            self.despawn_unit(game_idx, slot)
+
+    ####################################################################################################################
+    # Actions, performed by a unit in each of the given games (as the critical actions of cmd.Commands)
+    ####################################################################################################################
+
+    def act_attack(self, games, slots):
+        self.attack_adjacent_enemies(games, slots, np.ones(len(games), dtype=np.int64))
+
+    def act_charge_attack(self, games, slots, num_turns):
+        # Same as Unit.charge_attack: attack immediately if charged for 0 turns, and start charging otherwise
+        now = num_turns == 0
+        self.act_attack(games[now], slots[now])
+        self.charge_timer[games[~now], slots[~now]] = num_turns[~now]
+
+    def act_move(self, games, slots):
+        # Same as Board.move_to_adjacent_loc
+        neighbour_cells, neighbour_owners = self.neighbour_owners(games, slots)
+        chosen = self.choose_neighbours(games, neighbour_owners == 0)
+        moving = np.flatnonzero(chosen >= 0)
+        games = games[moving]
+        slots = slots[moving]
+        old_cells = self.unit_cell[games, slots]
+        new_cells = neighbour_cells[moving, chosen[moving]]
+        self.owner[games, new_cells] = self.owner[games, old_cells]
+        self.slot_at[games, new_cells] = slots
+        self.owner[games, old_cells] = 0
+        self.slot_at[games, old_cells] = -1
+        self.unit_cell[games, slots] = new_cells
+
+    def act_spawn(self, games, slots):
+        self.spawn_timer[games, slots] += 3
+
+    def act_defend(self, games, slots):
+        self.defending[games, slots] = True
+
+    def act_fortify(self, games, slots):
+        self.hp[games, slots] += 1
+
+    def can_act(self, games, slots):
+        # Same as Unit.can_act, for a unit in each of the given games
+        return (self.spawn_timer[games, slots] == 0) & (self.charge_timer[games, slots] == 0) \
+            & ~self.acted[games, slots]
+
+    ####################################################################################################################
+    # Acting unit of the current game of scalar scripts (used by BatchCommands)
+    ####################################################################################################################
+
+    def acting_unit(self):
+        return np.array([self.game]), np.array([self.slot])
+
+    def can_current_act(self):
+        return bool(self.spawn_timer[self.game, self.slot] == 0
+                    and self.charge_timer[self.game, self.slot] == 0
+                    and not self.acted[self.game, self.slot])
+
+    def critical_action_performed(self):
+        self.acted[self.game, self.slot] = True
+        self.info_fresh = False  # The action may change the board, so the cached info is no longer valid
+
+    def info_value(self, name):
+        # Return the value of an info command for the acting unit of the current game
+        if self.info_fresh:
+            return self.info_cache[name][self.lane]
+        return self.compute_info(name, *self.acting_unit())[0].item()
+
+    ####################################################################################################################
+    # Info commands, computed for the acting units (slots) of a set of games at once
+    ####################################################################################################################
+
+    def compute_info(self, name, games, slots):
+        if name == "get_unit_id":
+            return self.unit_id[games, slots]
+        if name == "get_turn_number":
+            return self.unit_turn_number[games, slots]
+        players = self.unit_player[games, slots]
+        if name == "num_total_allies":
+            return self.player_units[games, players] - 1
+        if name == "num_total_enemies":
+            return self.player_units[games].sum(axis=1) - self.player_units[games, players]
+        if name in ("num_adjacent_allies", "num_adjacent_enemies"):
+            neighbour_owners = self.neighbour_owners(games, slots)[1]
+            num_allies = (neighbour_owners == players[:, None]).sum(axis=1)
+            if name == "num_adjacent_allies":
+                return num_allies
+            return (neighbour_owners != 0).sum(axis=1) - num_allies
+        if name in ("distance_from_closest_ally", "distance_from_closest_enemy"):
+            size_x, size_y = self.board_size
+            cells = self.unit_cell[games]
+            own_cells = cells[np.arange(len(games)), slots][:, None]
+            xdist = np.abs(cells // size_y - own_cells // size_y)
+            ydist = np.abs(cells % size_y - own_cells % size_y)
+            dist = np.maximum(np.minimum(xdist, size_x - xdist), np.minimum(ydist, size_y - ydist))
+            same_player = self.unit_player[games] == players[:, None]
+            if name == "distance_from_closest_ally":
+                candidates = self.alive[games] & same_player
+                candidates[np.arange(len(games)), slots] = False
+            else:
+                candidates = self.alive[games] & ~same_player
+            # If there is no such unit on the board, the distance is larger than the board itself
+            return np.where(candidates, dist, size_x + size_y).min(axis=1)
+        raise Exception("Unknown info command " + name)
+
+    ####################################################################################################################
+    # Turns
+    ####################################################################################################################
+
+    def update_ended(self):
+        # Same as Game.game_ended: the turn limit was reached, or only one player has units left
+        self.ended = (self.turn_number >= self.turn_limit) | ((self.player_units > 0).sum(axis=1) <= 1)
+
+    def step(self):
+        # Play one unit turn in every game which has not ended. Returns the number of games which played a turn
+        games = np.flatnonzero(~self.ended)
+        if len(games) == 0:
+            return 0
+        slots = self.current[games]
+
+        # Turn start (as TurnHandler.start_turn and Unit.on_new_turn)
+        self.turn_number[games] += 1
+        self.unit_turn_number[games, slots] += 1
+        self.defending[games, slots] = False
+        self.acted[games, slots] = False
+
+        spawning = self.spawn_timer[games, slots] > 0
+        self.spawn_timer[games[spawning], slots[spawning]] -= 1
+        spawn_ready = spawning & (self.spawn_timer[games, slots] == 0)
+        if spawn_ready.any():
+            self.spawn_in_adjacent_cells(games[spawn_ready], slots[spawn_ready])
+
+        charging = self.charge_timer[games, slots] > 0
+        self.charge_timer[games[charging], slots[charging]] -= 1
+        self.charge_strength[games[charging], slots[charging]] += 1
+        charge_ready = charging & (self.charge_timer[games, slots] == 0)
+        if charge_ready.any():
+            ready_games = games[charge_ready]
+            ready_slots = slots[charge_ready]
+            strength = self.charge_strength[ready_games, ready_slots]
+            self.attack_adjacent_enemies(ready_games, ready_slots, (strength + 1) * (strength + 2) // 2)
+            self.charge_strength[ready_games, ready_slots] = 0
+            self.acted[ready_games, ready_slots] = True
+
+        # Compute the info commands used by the scripts for the acting units of all games, then execute the script of
+        # each player for the games in which one of its units is acting
+        info = {name: self.compute_info(name, games, slots) for name in self.used_info}
+        players = self.unit_player[games, slots]
+        for player_id in range(1, self.num_players + 1):
+            lanes = np.flatnonzero(players == player_id)
+            if len(lanes) == 0:
+                continue
+            player_info = {name: values[lanes] for name, values in info.items()}
+            if self.programs[player_id] is not None:
+                self.programs[player_id](games[lanes], slots[lanes], player_info)
+            else:
+                self.run_scalar_scripts(player_id, games[lanes], slots[lanes], player_info)
+
+        # Turn end
+        self.current[games] = self.next_slot[games, self.current[games]]
+        self.update_ended()
+        return len(games)
+
+    def run_scalar_scripts(self, player_id, games, slots, info):
+        # Execute the script of a player game by game
+        self.info_cache = {name: values.tolist() for name, values in info.items()}
+        script = self.scripts[player_id]
+        for lane, (game_idx, slot) in enumerate(zip(games.tolist(), slots.tolist())):
+            self.game = game_idx
+            self.slot = slot
+            self.lane = lane
+            self.info_fresh = True
+            self.interpreter.set_context(self.var_data[game_idx][slot])
+            script()
+        self.info_fresh = False
+
+    def run(self):
+        # Play all games to the end, and return the winners of each game
+        while self.step() > 0:
+            pass
+        return self.winners()
+
+    ####################################################################################################################
+    # Results
+    ####################################################################################################################
+
+    def winner(self, game_idx):
+        # Same as Game.announce_winner: the id of the winning player, or a list of the ids of the tied players
+        units = self.player_units[game_idx, 1:].tolist()
+        max_num_units_left = max(units)
+        winners = [player_id for player_id, num_units in enumerate(units, 1) if num_units == max_num_units_left]
+        if len(winners) == 1:
+            return winners[0]
+        return winners
+
+    def winners(self):
+        return [self.winner(game_idx) for game_idx in range(self.num_games)]
+
+    def board_state(self, game_idx):
+        # Return the units of a game as a dict of unit id -> (player id, location, hp)
+        size_y = self.board_size[1]
+        return {int(self.unit_id[game_idx, slot]): (int(self.unit_player[game_idx, slot]),
+                                                    [int(self.unit_cell[game_idx, slot]) // size_y,
+                                                     int(self.unit_cell[game_idx, slot]) % size_y],
+                                                    int(self.hp[game_idx, slot]))
+                for slot in np.flatnonzero(self.alive[game_idx]).tolist()}
@@ -0,0 +1,282 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+from math import sqrt
+from random import Random
+from contextlib import contextmanager
+import game
+import board
+import player
+import turn_handler
+import interpreter
+import batch_engine
+import script_cache
+from custom_logger_levels import LoggerLevels
+
+# Benchmarks of the interpreter, the board and whole games. Every benchmark uses fixed seeds, so that results can be
+# compared between versions of the code. Results are written as JSON, see main() below.
+# Each benchmark takes a scale factor, which multiplies the amount of work done (the default of 1 takes a few seconds
+# per benchmark; the unit tests use a tiny scale), and returns a dict of results. Times are in seconds, and are the best
+# of a few repetitions where a benchmark repeats a measurement
+
+format_version = 1
+strategy_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "strategies")
+strategy_paths = [os.path.join(strategy_dir, "test1.txt"), os.path.join(strategy_dir, "test2.txt")]
+
+benchmarks = {}  # Benchmark name -> benchmark function, in the order they are run
+
+
+def benchmark(name):
+    # Decorator registering a benchmark function under the given name
+    def register(function):
+        benchmarks[name] = function
+        return function
+    return register
+
+
+def best_time(function, repeat=3):
+    # Run the function repeat times, and return the shortest run time
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def read_strategy(path):
+    with open(path, 'r') as input_file:
+        return input_file.read()
+
+
+def large_script(num_lines):
+    # Generate a long script, made of the kind of statements real strategies use
+    return "\n".join("if(and(gt(distance_from_closest_enemy(), " + str(i % 10) + "), lt(num_total_allies(), 4)),"
+                     " define(x" + str(i) + ", add(mul(2, 3), sub(num_adjacent_enemies(), 1))) spawn())"
+                     for i in range(num_lines))
+
+
+@contextmanager
+def quiet_logger(module_logger):
+    # Silence a module logger for the duration of a benchmark, and restore its level afterwards
+    level = module_logger.level
+    module_logger.setLevel(LoggerLevels.Quiet)
+    try:
+        yield
+    finally:
+        module_logger.setLevel(level)
+
+
+def quiet_game(**kwargs):
+    return game.Game(strategy_paths, log_level=LoggerLevels.Quiet, **kwargs)
+
+
+########################################################################################################################
+# Benchmarks
+########################################################################################################################
+
+@benchmark("interpreter_analyze")
+def bench_interpreter_analyze(scale):
+    # Time Interpreter.analyze on one of the bundled strategies and on a very large generated script, both when the
+    # script is parsed from scratch and when its parsed tree is taken from the script cache
+    scripts = {"small": read_strategy(strategy_paths[0]), "large": large_script(max(1, int(2000 * scale)))}
+    results = {}
+    for mode in interpreter.Interpreter.modes:
+        test_interpreter = quiet_game(interpreter_mode=mode).interpreter
+        for script_name, script in scripts.items():
+            test_interpreter.cache = script_cache.ScriptCache(max_size=0)  # Keeps nothing
+            uncached_seconds = best_time(lambda: test_interpreter.analyze(script))
+            test_interpreter.cache = script_cache.ScriptCache()
+            test_interpreter.analyze(script)
+            results[mode + "_" + script_name] = {
+                "lines": script.count("\n") + 1,
+                "seconds": uncached_seconds,
+                "cached_seconds": best_time(lambda: test_interpreter.analyze(script))}
+    return results
+
+
+@benchmark("script_execution")
+def bench_script_execution(scale):
+    # Time the execution of the players' scripts alone, over the turns of a seeded game. The rest of each turn is
+    # played as in Game.turn, but not timed
+    num_turns = max(1, int(5000 * scale))
+    results = {}
+    for mode in interpreter.Interpreter.modes:
+        test_game = quiet_game(interpreter_mode=mode, seed=1)
+        with test_game.logger_levels():
+            test_game.populate_players()
+            test_game.spawn_initial_units()
+            handler = test_game.turn_handler
+            elapsed = 0
+            turns = 0
+            while turns < num_turns and not test_game.one_player_left():
+                handler.start_turn()
+                test_game.interpreter.set_context(handler.current_unit().var_data)
+                script = handler.current_player().command_script
+                start = time.perf_counter()
+                script()
+                elapsed += time.perf_counter() - start
+                handler.end_turn()
+                test_game.remove_eliminated_players()
+                turns += 1
+        results[mode] = {"turns": turns, "seconds": elapsed, "microseconds_per_turn": 1e6 * elapsed / turns}
+    return results
+
+
+@benchmark("board_queries")
+def bench_board_queries(scale, sizes=(20, 100, 300), densities=(0.01, 0.1, 0.5)):
+    # Time the board queries behind the info commands, on square boards of several sizes and unit densities. Each
+    # query is called for units picked at random from the board, and computed from scratch (bypassing the query cache
+    # of the board, which would otherwise answer repeated queries about the same unit)
+    num_calls = max(1, int(20000 * scale))
+    results = {}
+    for size in sizes:
+        for density in densities:
+            rng = Random(size * 1000 + int(density * 100))
+            players = {1: player.Player(1, None), 2: player.Player(2, None)}
+            test_board = board.Board(turn_handler.TurnHandler(), players, [size, size], 1, rng)
+            num_units = max(2, int(size * size * density))
+            with quiet_logger(board.logger):  # Filling the boards would otherwise log every spawn
+                while sum(t_player.num_units() for t_player in players.values()) < num_units:
+                    loc = test_board.get_random_location()
+                    if test_board.is_free(loc):
+                        test_board.spawn_unit(players[rng.randint(1, 2)], loc)
+            units = [t_unit for t_player in players.values() for t_unit in t_player.units]
+            sample = [rng.choice(units) for _ in range(num_calls)]
+            query_names = ["num_free_tiles_around_unit", "num_allies_around_unit", "num_enemies_around_unit",
+                           "distance_from_closest_ally", "distance_from_closest_enemy"]
+            board_results = {"units": len(units)}
+            for query_name in query_names:
+                query = getattr(board.Board, query_name)
+                query = getattr(query, "__wrapped__", query)  # The query itself, without the cache
+                seconds = best_time(lambda: [query(test_board, t_unit) for t_unit in sample])
+                board_results[query_name] = {"seconds": seconds, "calls_per_second": num_calls / seconds}
+            results[str(size) + "x" + str(size) + "_" + str(density)] = board_results
+    return results
+
+
+@benchmark("game_throughput")
+def bench_game_throughput(scale):
+    # Play whole seeded games between the bundled strategies with Game.start_game, and measure turns per second
+    turn_limit = max(1, int(5000 * scale))
+    results = {}
+    for mode in interpreter.Interpreter.modes:
+        turns = 0
+        elapsed = 0
+        for seed in (1, 2, 3):
+            test_game = quiet_game(interpreter_mode=mode, seed=seed, turn_limit=turn_limit)
+            start = time.perf_counter()
+            test_game.start_game()
+            elapsed += time.perf_counter() - start
+            turns += test_game.turn_handler.turn_number
+        results[mode] = {"turns": turns, "seconds": elapsed, "turns_per_second": turns / elapsed}
+    return results
+
+
+@benchmark("large_arena")
+def bench_large_arena(scale, units_per_player=60):
+    # Play a game in large arena mode on a very large board with many players (at the default scale, 500 players on a
+    # 1000x1000 board, each starting with 60 units). The memory used per tile and per unit is measured with tracemalloc
+    # while the board is built and the units are spawned, and the turns are timed afterwards
+    size = max(10, int(1000 * sqrt(scale)))
+    num_players = max(2, int(500 * scale))
+    num_turns = max(1, int(20000 * scale))
+
+    tracemalloc.start()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    test_game = game.Game([strategy_paths[idx % 2] for idx in range(num_players)], board_size=[size, size],
+                          turn_limit=num_turns, log_level=LoggerLevels.Quiet, seed=1, large_arena=True)
+    board_memory = tracemalloc.get_traced_memory()[0] - start_memory
+    with test_game.logger_levels():
+        test_game.populate_players()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        test_game.spawn_initial_units()
+        for t_player in test_game.players.values():
+            for _ in range(units_per_player - 1):
+                loc = test_game.board.get_random_location()
+                while not test_game.board.is_free(loc):
+                    loc = test_game.board.get_random_location()
+                test_game.board.spawn_unit(t_player, loc)
+        num_units = test_game.board.num_live_units
+        units_memory = tracemalloc.get_traced_memory()[0] - start_memory
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        turns = 0
+        while turns < num_turns and not test_game.game_ended():
+            test_game.turn()
+            turns += 1
+        elapsed = time.perf_counter() - start
+    return {"board_size": [size, size], "players": num_players, "units": num_units,
+            "bytes_per_tile": board_memory / (size * size), "bytes_per_unit": units_memory / num_units,
+            "turns": turns, "seconds": elapsed, "microseconds_per_turn": 1e6 * elapsed / turns}
+
+
+@benchmark("batch_engine")
+def bench_batch_engine(scale):
+    # Play a batch of games in lockstep with the batch engine, in each of its script and random number generator
+    # modes, and measure turns per second over the whole batch
+    if batch_engine.np is None:
+        return {"skipped": "numpy is not installed"}
+    turn_limit = max(1, int(2000 * scale))
+    num_games = max(1, int(500 * scale))
+    results = {}
+    for script_mode in batch_engine.BatchEngine.script_modes:
+        for rng_mode in batch_engine.BatchEngine.rng_modes:
+            start = time.perf_counter()
+            engine = batch_engine.BatchEngine(strategy_paths, num_games, seeds=list(range(num_games)),
+                                              turn_limit=turn_limit, rng_mode=rng_mode, script_mode=script_mode)
+            engine.run()
+            elapsed = time.perf_counter() - start
+            turns = int(engine.turn_number.sum())
+            results[script_mode + "_" + rng_mode] = {"games": num_games, "turns": turns, "seconds": elapsed,
+                                                     "turns_per_second": turns / elapsed}
+    return results
+
+
+########################################################################################################################
+# Running
+########################################################################################################################
+
+def run_benchmarks(names=None, scale=1):
+    # Run the given benchmarks (all of them by default), and return the results as a JSON-serializable dict
+    if names is None:
+        names = list(benchmarks)
+    results = {}
+    for name in names:
+        if name not in benchmarks:
+            raise Exception("Unknown benchmark " + name)
+        results[name] = benchmarks[name](scale)
+    return {"format_version": format_version,
+            "python": platform.python_implementation() + " " + platform.python_version(),
+            "platform": platform.platform(),
+            "scale": scale,
+            "results": results}
+
+
+def main():
+    # Argument parsing
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-b', '--benchmarks', nargs='*', choices=list(benchmarks), default=None,
+                        help='Benchmarks to run (all by default)')
+    parser.add_argument('-s', '--scale', type=float, default=1, help='Multiplier for the amount of work done')
+    parser.add_argument('-o', '--output', default=None, help='Path to write the results to (stdout by default)')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.benchmarks, args.scale)
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
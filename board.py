@@ -1,9 +1,11 @@
 from typing import List
 from typing import Optional
+from typing import Dict
 from unit import Unit
-from random import choice
+from spatial_index import SpatialIndex
 from math import ceil
-from random import randint
+from random import Random
+from functools import wraps
 import logging
 from custom_logger_levels import LoggerLevels
 
@@ -12,33 +14,155 @@ logger = logging.getLogger(__name__)
 logger.setLevel(1)
 
 
+neighbour_tables = {}  # Board size -> neighbour table, see neighbour_table below
+
+
+def neighbour_table(board_size):
+    # Return, for every cell index of a board of the given size, the tuple of the indices of its eight adjacent cells
+    # (taking into account that the board wraps around). The table only depends on the board size, so it is built once
+    # per size and shared by all boards of that size
+    key = (board_size[0], board_size[1])
+    table = neighbour_tables.get(key)
+    if table is None:
+        size_x, size_y = key
+        table = [tuple(((x + x_adj) % size_x) * size_y + (y + y_adj) % size_y
+                       for x_adj in (-1, 0, 1) for y_adj in (-1, 0, 1) if x_adj != 0 or y_adj != 0)
+                 for x in range(size_x) for y in range(size_y)]
+        neighbour_tables[key] = table
+    return table
+
+
+class ComputedNeighbours:
+    # Stands in for the neighbour table of a board (see neighbour_table) on compact boards: the indices of the adjacent
+    # cells of a cell are computed when asked for, in the same order as in the table, instead of being stored. A table
+    # takes about 370 bytes per cell, which is too much for very large boards
+    def __init__(self, board_size):
+        self.size_x, self.size_y = board_size
+
+    def __len__(self):
+        return self.size_x * self.size_y
+
+    def __getitem__(self, idx):
+        size_x, size_y = self.size_x, self.size_y
+        x, y = divmod(idx, size_y)
+        before = ((x - 1) % size_x) * size_y
+        row = x * size_y
+        after = ((x + 1) % size_x) * size_y
+        y_before = (y - 1) % size_y
+        y_after = (y + 1) % size_y
+        return (before + y_before, before + y, before + y_after, row + y_before, row + y_after,
+                after + y_before, after + y, after + y_after)
+
+
+def cached_query(func):
+    # Decorator for board queries about a unit or a player whose result only changes when units are spawned, moved or
+    # removed. Results are kept in the query cache of the board, which is cleared on each of these changes (see
+    # Board.invalidate_queries), so that a script reading the same information several times in a turn only computes it
+    # once, while reads after the unit has moved or attacked see the new state of the board
+    @wraps(func)
+    def cached(self, arg):
+        key = (cached, arg)
+        try:
+            return self.query_cache[key]
+        except KeyError:
+            value = self.query_cache[key] = func(self, arg)
+            return value
+    return cached
+
+
 class BoardMatrix:
     # A wrapper class for the matrix of elements on the board, which takes as an index a list of two values (x index
-    # and y index)
-    board_matrix: List[List[Optional[Unit]]]  # Type hinting
-
-    def __init__(self, size):
-        self.board_matrix = [[None for _ in range(size[1])] for _ in range(size[0])]
+    # and y index). The elements are stored in a flat list, where location [x, y] is at cell index x * size_y + y.
+    # Alongside the elements, the matrix keeps the id of the player owning the unit in each cell (None for free cells),
+    # so that adjacency checks compare plain ids instead of going through the units.
+    # It also keeps count of the occupied neighbours of every cell, in total and per player. The counts are updated
+    # over the eight neighbours of a cell whenever a unit is placed in or removed from it, so the number of free, allied
+    # and enemy tiles around any cell can be read without looking at its neighbours.
+    # A compact matrix computes the neighbours of cells instead of keeping a table of them, which brings the memory used
+    # down from about 385 to 17 bytes per cell (8 for the element, 8 for the owner and 1 for the neighbour count), for
+    # a somewhat slower lookup of neighbours
+    cells: List[Optional[Unit]]  # Type hinting
+    owners: List[Optional[int]]
+    occupied_neighbours: bytearray
+    player_neighbours: Dict[int, Dict[int, int]]
+
+    def __init__(self, size, compact=False):
+        self.size_y = size[1]
+        self.neighbours = ComputedNeighbours(size) if compact else neighbour_table(size)
+        self.cells = [None] * (size[0] * size[1])
+        self.owners = [None] * (size[0] * size[1])
+        self.occupied_neighbours = bytearray(size[0] * size[1])  # Cell index -> number of occupied adjacent cells
+        # Player id -> {cell index -> number of adjacent cells occupied by the player}. Cells with no neighbours of
+        # the player are left out, so the memory used grows with the number of units rather than the size of the board
+        self.player_neighbours = {}
+
+    def cell_index(self, loc):
+        return loc[0] * self.size_y + loc[1]
+
+    def cell_loc(self, idx):
+        return [idx // self.size_y, idx % self.size_y]
 
     def __getitem__(self, loc):
-        return self.board_matrix[loc[0]][loc[1]]
+        return self.cells[loc[0] * self.size_y + loc[1]]
 
     def __setitem__(self, loc, value):
-        self.board_matrix[loc[0]][loc[1]] = value
+        self.set_cell(loc[0] * self.size_y + loc[1], value)
+
+    def set_cell(self, idx, value):
+        old_owner = self.owners[idx]
+        if old_owner is not None:
+            self.update_neighbour_counts(idx, old_owner, -1)
+        self.cells[idx] = value
+        self.owners[idx] = None if value is None else value.player.id
+        if value is not None:
+            self.update_neighbour_counts(idx, value.player.id, 1)
+
+    def update_neighbour_counts(self, idx, player_id, delta):
+        # Add delta to the neighbour counts of all cells adjacent to cell idx, which is occupied by the given player
+        occupied_neighbours = self.occupied_neighbours
+        counts = self.player_neighbours.setdefault(player_id, {})
+        for neighbour_idx in self.neighbours[idx]:
+            occupied_neighbours[neighbour_idx] += delta
+            count = counts.get(neighbour_idx, 0) + delta
+            if count == 0:
+                del counts[neighbour_idx]
+            else:
+                counts[neighbour_idx] = count
+
+    def num_free_neighbours(self, idx):
+        return 8 - self.occupied_neighbours[idx]
+
+    def num_player_neighbours(self, idx, player_id):
+        counts = self.player_neighbours.get(player_id)
+        return 0 if counts is None else counts.get(idx, 0)
+
+    def rows(self):
+        # Return the matrix as a list of rows (one row per x index)
+        return [self.cells[start:start + self.size_y] for start in range(0, len(self.cells), self.size_y)]
 
 
 class Board:
     # This class handles the board_matrix object and the units on it and the manipulation thereof.
     # It also handles all unit- and board_matrix-related commands that should not be directly exposed to the user
 
-    def __init__(self, turn_handler, players, board_size, unit_limit_pct):
+    def __init__(self, turn_handler, players, board_size, unit_limit_pct, rng=None, compact=False):
         # Board initialization
         self.turn_handler = turn_handler
+        self.rng = rng if rng is not None else Random()  # All randomness on the board goes through this generator,
+        # so that a game can be reproduced from the seed of its generator
         self.players = players
         self.board_size = board_size
         self.unit_limit = ceil(board_size[0] * board_size[1] * unit_limit_pct)
-        self.board_matrix = BoardMatrix(board_size)
+        self.board_matrix = BoardMatrix(board_size, compact)  # See BoardMatrix for compact boards
+        self.neighbours = self.board_matrix.neighbours  # Cell index -> indices of the adjacent cells
+        self.spatial_index = SpatialIndex(board_size)  # Index of units by location for closest ally/enemy queries
         self.num_total_units_spawned = 0
+        self.num_live_units = 0  # Number of units on the board
+        self.player_unit_counts = {}  # Player -> number of units of the player on the board
+        self.eliminated_players = []  # Players whose last unit was removed, until the game handles them (see
+        # Game.remove_eliminated_players)
+        self.event_log = None  # Optional event_log.EventWriter recording everything that happens on the board
+        self.query_cache = {}  # (query, unit or player) -> result, see cached_query
 
         if unit_limit_pct <= 0 or unit_limit_pct > 1:
             raise Exception("Unit limit (% of board capacity) must be greater than 0 and less than or equal to 1")
@@ -53,86 +177,121 @@ class Board:
             raise Exception("Cannot spawn unit in location " + str(loc) + " since it is occupied")
 
         if player.num_units() >= self.unit_limit:
-            logger.log(LoggerLevels.ActionMessage, "Player " + str(player.id)
-                       + " attempted to spawn new unit, but has reached the spawn limit.")
+            logger.log(LoggerLevels.ActionMessage,
+                       "Player %s attempted to spawn new unit, but has reached the spawn limit.", player.id)
             return False  # Couldn't spawn new unit
 
+        self.invalidate_queries()
         self.num_total_units_spawned += 1
         unit_id = self.num_total_units_spawned
         new_unit = Unit(self, unit_id, player, loc, unit_hp)
         self.board_matrix[loc] = new_unit
+        self.spatial_index.add(new_unit)
         self.turn_handler.add_to_queue(new_unit)
         player.units.add(new_unit)
-        logger.log(LoggerLevels.ActionMessage, "New unit " + str(unit_id) + " spawned by player "
-                   + str(player.id) + " in location " + str(loc))
+        self.num_live_units += 1
+        self.player_unit_counts[player] = self.player_unit_counts.get(player, 0) + 1
+        if self.event_log is not None:
+            self.event_log.spawn(new_unit)
+        logger.log(LoggerLevels.ActionMessage, "New unit %s spawned by player %s in location %s",
+                   unit_id, player.id, loc)
         return True  # Spawned new unit
 
     def despawn_unit(self, unit):
         # Remove unit from board
-        loc = unit.loc
-        self.board_matrix[loc] = None
+        self.invalidate_queries()
+        self.board_matrix.set_cell(unit.cell, None)
+        self.spatial_index.remove(unit)
         self.turn_handler.remove_from_queue(unit)
         unit.player.units.remove(unit)
+        self.num_live_units -= 1
+        self.player_unit_counts[unit.player] -= 1
+        if self.player_unit_counts[unit.player] == 0:
+            del self.player_unit_counts[unit.player]
+            self.eliminated_players.append(unit.player)
+        if self.event_log is not None:
+            self.event_log.kill(unit)
 
     def spawn_in_adjacent_location(self, player, loc):
-        spawn_loc = self.get_free_adjacent_loc(loc)
-        if spawn_loc is None:
+        return self.spawn_in_adjacent_cell(player, self.board_matrix.cell_index(loc))
+
+    def spawn_in_adjacent_cell(self, player, idx):
+        spawn_cell = self.get_free_adjacent_cell(idx)
+        if spawn_cell is None:
             return False
-        return self.spawn_unit(player, spawn_loc)
+        return self.spawn_unit(player, self.board_matrix.cell_loc(spawn_cell))
 
     def move_unit(self, unit, new_loc):
         if not self.is_free(new_loc):
             raise Exception("Tried to move unit " + str(unit.id) + "to occupied location " + str(new_loc))
-        old_loc = unit.loc
+        self.invalidate_queries()
+        old_cell = unit.cell
+        self.board_matrix.set_cell(old_cell, None)
         unit.loc = new_loc
-        self.board_matrix[old_loc] = None
-        self.board_matrix[new_loc] = unit
+        self.board_matrix.set_cell(unit.cell, unit)
+        self.spatial_index.move(unit, old_cell)
+        if self.event_log is not None:
+            self.event_log.move(unit)
+
+    def invalidate_queries(self):
+        # Called whenever units are spawned, moved or removed. Damage does not invalidate the cache, since no cached
+        # query depends on the hp of units (and a unit which dies is removed)
+        if self.query_cache:
+            self.query_cache.clear()
 
     def move_to_adjacent_loc(self, unit):
         current_loc = unit.loc
         new_loc = self.get_free_adjacent_loc(current_loc)
         if new_loc is None:
             return
-        logger.log(LoggerLevels.ActionMessage, "Unit " + str(unit.id) + " moved from "
-                   + str(current_loc) + " to " + str(new_loc))
+        logger.log(LoggerLevels.ActionMessage, "Unit %s moved from %s to %s", unit.id, current_loc, new_loc)
         self.move_unit(unit, new_loc)
 
     ####################################################################################################################
     # Functions for use in user-commands
     ####################################################################################################################
 
+    # The adjacency queries are O(1) reads of the neighbour counts of BoardMatrix, and the total queries of the unit
+    # counts kept by the board, so only the distance queries are cached
+
     def num_allies_around_unit(self, unit):
-        return self.count_adjacent_locs(unit.loc, lambda tloc: self.is_ally(tloc, unit.player))
+        return self.board_matrix.num_player_neighbours(unit.cell, unit.player.id)
 
     def num_enemies_around_unit(self, unit):
-        return 8 - self.num_free_tiles_around_unit(unit) - self.num_allies_around_unit(unit)
+        idx = unit.cell
+        return self.board_matrix.occupied_neighbours[idx] - self.board_matrix.num_player_neighbours(idx, unit.player.id)
 
     @staticmethod
     def num_total_allies(player):
         return player.num_units() - 1
 
     def num_total_enemies(self, player):
-        return sum([t_player.num_units() for t_player_id, t_player in self.players.items() if t_player != player])
+        return self.num_live_units - self.player_unit_counts.get(player, 0)
 
+    @cached_query
     def distance_from_closest_ally(self, unit):
-        return self.distance_from_closest_in_collection(unit, self.get_all_allies(unit))
+        return self.distance_from_closest_in_index(unit, True)
 
+    @cached_query
     def distance_from_closest_enemy(self, unit):
-        return self.distance_from_closest_in_collection(unit, self.get_all_enemies(unit))
+        return self.distance_from_closest_in_index(unit, False)
 
-    def distance_from_closest_in_collection(self, unit, collection):
-        dist = [self.board_size[0] + self.board_size[1]]
-        for t_unit in collection:
-            dist.append(self.distance_between_units(unit, t_unit))
-        return min(dist)
+    def distance_from_closest_in_index(self, unit, allies):
+        # Search the spatial index outward from the unit. If there is no such unit on the board, return a distance
+        # larger than the board itself
+        dist = self.spatial_index.distance_from_closest(unit, allies)
+        if dist is None:
+            return self.board_size[0] + self.board_size[1]
+        return dist
 
     def attack_adjacent_enemy(self, unit, dmg):
         enemy_unit = self.get_adjacent_enemy_unit(unit)
         if enemy_unit is None:
-            logger.log(LoggerLevels.ActionMessage, "Unit " + str(unit.id)
-                       + " tried to attack, but no enemy units in range")
+            logger.log(LoggerLevels.ActionMessage, "Unit %s tried to attack, but no enemy units in range", unit.id)
             return False  # fail state
-        logger.log(LoggerLevels.ActionMessage, "Unit " + str(unit.id) + " attacked unit " + str(enemy_unit.id))
+        logger.log(LoggerLevels.ActionMessage, "Unit %s attacked unit %s", unit.id, enemy_unit.id)
+        if self.event_log is not None:
+            self.event_log.attack(unit, enemy_unit)
         enemy_unit.damage(dmg)
         return True  # success
 
@@ -141,77 +300,50 @@ class Board:
     ####################################################################################################################
 
     def get_random_location(self):
-        return [randint(0, self.board_size[0] - 1), randint(0, self.board_size[1] - 1)]
+        return [self.rng.randint(0, self.board_size[0] - 1), self.rng.randint(0, self.board_size[1] - 1)]
 
     def is_free(self, loc):
         return self.board_matrix[loc] is None
 
     def is_ally(self, loc, player):
-        unit_in_loc = self.get_unit_in_loc(loc)
-        return unit_in_loc is not None and unit_in_loc.player == player
+        owner = self.board_matrix.owners[self.board_matrix.cell_index(loc)]
+        return owner is not None and owner == player.id
 
     def is_enemy(self, loc, player):
-        unit_in_loc = self.get_unit_in_loc(loc)
-        return unit_in_loc is not None and unit_in_loc.player != player
+        owner = self.board_matrix.owners[self.board_matrix.cell_index(loc)]
+        return owner is not None and owner != player.id
 
     def get_all_adjacent_locs(self, loc):
-        adjacent_locs = [None, None, None, None, None, None, None, None]  # Preallocate list for efficiency
-        for x_id, x_adj in enumerate([-1, 0, 1]):
-            for y_id, y_adj in enumerate([-1, 0, 1]):
-                locx = (loc[0] + x_adj + self.board_size[0]) % self.board_size[0]
-                locy = (loc[1] + y_adj + self.board_size[1]) % self.board_size[1]
-
-                # Calculate index in list of the location. Ignore the middle spot (since it is not "adjacent"), and
-                # shift all indices after it by -1 to compensate
-                idx = x_id * 3 + y_id
-                if idx < 4:
-                    adjacent_locs[idx] = [locx, locy]
-                elif idx > 4:
-                    adjacent_locs[idx - 1] = [locx, locy]
-        return adjacent_locs
+        cell_loc = self.board_matrix.cell_loc
+        return [cell_loc(idx) for idx in self.neighbours[self.board_matrix.cell_index(loc)]]
 
     def get_free_adjacent_loc(self, loc):
-        free_adjacent_locs = self.get_adjacent_locs(loc, self.is_free)
-        if len(free_adjacent_locs) == 0:
+        idx = self.get_free_adjacent_cell(self.board_matrix.cell_index(loc))
+        return None if idx is None else self.board_matrix.cell_loc(idx)
+
+    def get_free_adjacent_cell(self, idx):
+        if self.board_matrix.num_free_neighbours(idx) == 0:
             return None
-        return choice(free_adjacent_locs)
+        cells = self.board_matrix.cells
+        return self.rng.choice([t_idx for t_idx in self.neighbours[idx] if cells[t_idx] is None])
 
     def num_free_tiles_around_loc(self, loc):
-        return self.count_adjacent_locs(loc, self.is_free)
+        return self.board_matrix.num_free_neighbours(self.board_matrix.cell_index(loc))
 
     def num_free_tiles_around_unit(self, unit):
-        loc = unit.loc
-        return self.num_free_tiles_around_loc(loc)
+        return self.board_matrix.num_free_neighbours(unit.cell)
 
     def get_unit_in_loc(self, loc):
         return self.board_matrix[loc]
 
     def get_adjacent_enemy_unit(self, unit):
-        enemy_locs = self.get_adjacent_locs(unit.loc,
-                                            lambda tloc: self.is_enemy(tloc, unit.player.id))
-        if len(enemy_locs) == 0:
+        if self.num_enemies_around_unit(unit) == 0:
             return None
-        return self.get_unit_in_loc(choice(enemy_locs))
-
-    def count_adjacent_locs(self, loc, f_bool=lambda x: True):
-        # Get a location and a boolean function, and count the number of adjacent locations that satisfy the function
-        return len(self.get_adjacent_locs(loc, f_bool))
-
-    def get_adjacent_locs(self, loc, f_bool=lambda x: True):
-        # Get a location and a boolean function, and return all adjacent locations that satisfy the function
-        adjacent_locs = self.get_all_adjacent_locs(loc)
-        return [adjacent_loc for adjacent_loc in adjacent_locs if f_bool(adjacent_loc)]
-
-    def get_all_enemies(self, unit):
-        return [t_unit
-                for t_player_id, t_player in self.players.items() if t_player != unit.player
-                for t_unit in t_player.units]
-
-    @staticmethod
-    def get_all_allies(unit):
-        return [t_unit
-                for t_unit in unit.player.units
-                if t_unit != unit]
+        owners = self.board_matrix.owners
+        player_id = unit.player.id
+        enemy_cells = [idx for idx in self.neighbours[unit.cell]
+                       if owners[idx] is not None and owners[idx] != player_id]
+        return self.board_matrix.cells[self.rng.choice(enemy_cells)]
 
     def distance_between_units(self, unit1, unit2):
         # Return the distance between two units. Here, distance is defined as the minimal number of steps needed to
@@ -236,7 +368,10 @@ class Board:
     def print_board(self):
         # Print the board_matrix matrix nicely formatted
         # Code adapted from https://stackoverflow.com/questions/13214809/pretty-print-2d-python-list/32159502
-        output_mtx = [['X' if elem is None else elem.id for elem in row] for row in self.board_matrix.board_matrix]
+        # Building the table is expensive, so skip it entirely if the logger discards board displays anyway
+        if not logger.isEnabledFor(LoggerLevels.SecondaryInformation):
+            return
+        output_mtx = [['X' if elem is None else elem.id for elem in row] for row in self.board_matrix.rows()]
         s = [[str(e) for e in row] for row in output_mtx]
         lens = [max(map(len, col)) for col in zip(*s)]
         fmt = '\t'.join('{{:{}}}'.format(x) for x in lens)
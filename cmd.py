@@ -1,5 +1,6 @@
 import inspect
 from functools import wraps
+from collections import namedtuple
 import logging
 from custom_logger_levels import LoggerLevels
 
@@ -17,9 +18,77 @@ def critical_action(func):
             return False  # Could not perform action
         self.turn_handler_interface.current_unit().critical_action_performed()
         return func(self, *args, **kwargs)
+    decorated.critical = True
     return decorated
 
 
+class ScriptExit(Exception):
+    # Raised to stop the execution of a script once the unit has performed a critical action (see Interpreter)
+    pass
+
+
+class BudgetExceeded(Exception):
+    # Raised to stop the execution of a script once it has used up the budget of the unit's turn (see Interpreter).
+    # reason is "nodes" or "time"
+    def __init__(self, reason):
+        super().__init__("Turn budget exceeded (" + reason + ")")
+        self.reason = reason
+
+
+undefined = object()  # Value of the variable slots of symbols which a unit has not defined (see Interpreter)
+
+
+def pure(func):
+    # Decorator for commands without side effects, whose result only depends on their arguments and on the settings of
+    # the game (which do not change during a game). Calls to these commands with constant arguments are evaluated once
+    # when the script is analyzed (see optimizer)
+    func.pure = True
+    return func
+
+
+# Commands whose second argument is only evaluated if the first one does not decide the result on its own. The second
+# argument is passed to them as a function which evaluates it (in the same way as the branches of if_else)
+short_circuit_commands = ("i_and", "i_or")
+
+
+# Language constructs: calls which the interpreter evaluates itself, since not all of their arguments are evaluated
+# before the call (the name given to define, and the branch of if_else which is not chosen). They are listed in the
+# registry of every commands class so that calls to them are verified as any other call, but have no function
+language_constructs = {"define": 2, "if_else": 3}
+
+
+# A user command in the registry of a commands class (see build_registry). function is the attribute defined in the
+# class (a function, or a static method), which is bound to each commands object by bind_commands. Language constructs
+# have no function
+CommandInfo = namedtuple("CommandInfo", ["name", "arity", "critical", "pure", "construct", "function"])
+
+
+def build_registry(cls):
+    # Build the registry of the user commands of a commands class: command name -> CommandInfo. Every public method of
+    # the class is a user command, so the registry is built once when the class is defined, and is all that is needed
+    # to verify, analyze and execute calls to commands
+    registry = {name: CommandInfo(name, arity, False, False, True, None) for name, arity in language_constructs.items()}
+    for name in dir(cls):
+        function = getattr(cls, name)
+        if name.startswith("_") or name in registry or not callable(function):
+            continue
+        attribute = inspect.getattr_static(cls, name)
+        arity = len(inspect.signature(function).parameters)
+        if not isinstance(attribute, staticmethod):
+            arity -= 1  # self
+        registry[name] = CommandInfo(name, arity, getattr(function, "critical", False),
+                                     getattr(function, "pure", False), False, attribute)
+    return registry
+
+
+def bind_commands(command_object):
+    # Build the table of the commands of a commands object bound to it: command name -> function which can be called
+    # directly. Built once per commands object, when it is created
+    owner = type(command_object)
+    return {info.name: info.function.__get__(command_object, owner) for info in command_object.registry.values()
+            if not info.construct}
+
+
 class CommandsInspector:
     # This class has methods for verification and execution of user commands in the commands class below.
     # It is separated from the main class in order to not allow the user access to these methods.
@@ -28,24 +97,46 @@ class CommandsInspector:
     def verify_commands(command_object, cmd, args):
         # Check that input command is defined in this class, and correct number of arguments is provided
         # This prevents users from executing general python commands
-        try:
-            num_expected_args = len(inspect.signature(getattr(command_object, cmd)).parameters)
-        except AttributeError:
+        info = command_object.registry.get(cmd)
+        if info is None:
             raise Exception("Unknown command " + cmd + "()!")
-        if len(args) != num_expected_args:
-            raise Exception("Invalid number of arguments; expected " + str(num_expected_args)
+        if len(args) != info.arity:
+            raise Exception("Invalid number of arguments; expected " + str(info.arity)
                             + " and got " + str(len(args)))
 
     @staticmethod
-    def execute_command(command_object, cmd, args):
-        return getattr(command_object, cmd)(*args)
+    def bound_commands(command_object):
+        # Return the commands of a commands object bound to it, by command name, so that they can be called directly
+        return command_object.bound_functions
+
+    @staticmethod
+    def constant_values(command_object):
+        # Return the values of the pure commands which take no arguments, by command name. These only depend on the
+        # game the commands belong to
+        functions = command_object.bound_functions
+        return {info.name: functions[info.name]() for info in command_object.registry.values()
+                if info.pure and info.arity == 0}
+
+    @staticmethod
+    def registry_signature(command_object):
+        # Return what verifying and optimizing a script depends on in the registry: the name, arity, critical, pure and
+        # construct flags of every command
+        return tuple(sorted((info.name, info.arity, info.critical, info.pure, info.construct)
+                            for info in command_object.registry.values()))
 
 
 class Commands:
-    # This class handles definition of allowable user-input commands
+    # This class handles definition of allowable user-input commands. Every public method is a user command, and is
+    # listed in the registry of the class (see build_registry) along with the language constructs. Subclasses get their
+    # own registry
     def __init__(self, board, turn_handler_interface):
         self.board = board
         self.turn_handler_interface = turn_handler_interface
+        self.bound_functions = bind_commands(self)  # Command name -> bound command, see CommandsInspector
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.registry = build_registry(cls)
 
     ####################################################################################################################
     # USER COMMANDS
@@ -82,22 +173,24 @@ class Commands:
         # in an adjacent free tile.
         self.turn_handler_interface.current_unit().set_spawn(3)
         unit = self.turn_handler_interface.current_unit()
-        logger.log(LoggerLevels.ActionMessage, "Setting spawn for unit " + str(unit.id) + " belonging to player "
-                   + str(unit.player.id) + " in 3 turns")
+        logger.log(LoggerLevels.ActionMessage, "Setting spawn for unit %s belonging to player %s in 3 turns",
+                   unit.id, unit.player.id)
         return True  # Performed action
 
     @critical_action
     def wait(self):
         # Forfeit turn
-        logger.log(LoggerLevels.ActionMessage, "Unit "
-                   + str(self.turn_handler_interface.current_unit().id) + " has forfeited its turn")
+        if logger.isEnabledFor(LoggerLevels.ActionMessage):
+            logger.log(LoggerLevels.ActionMessage, "Unit %s has forfeited its turn",
+                       self.turn_handler_interface.current_unit().id)
         return True  # Performed action
 
     @critical_action
     def defend(self):
         # Unit goes into defense mode (will block up to one attack until next turn)
-        logger.log(LoggerLevels.ActionMessage, "Unit "
-                   + str(self.turn_handler_interface.current_unit().id) + " is defending")
+        if logger.isEnabledFor(LoggerLevels.ActionMessage):
+            logger.log(LoggerLevels.ActionMessage, "Unit %s is defending",
+                       self.turn_handler_interface.current_unit().id)
         self.turn_handler_interface.current_unit().defend()
         return True  # Performed action
 
@@ -135,6 +228,7 @@ class Commands:
     def distance_from_closest_enemy(self):
         return self.board.distance_from_closest_enemy(self.turn_handler_interface.current_unit())
 
+    @pure
     def get_unit_limit(self):
         return self.board.get_unit_limit()
 
@@ -142,68 +236,71 @@ class Commands:
     # Arithmetic and general commands
     ####################################################################################################################
 
-    def define(self, symb, val):
-        # Command for defining new symbol
-        self.turn_handler_interface.current_unit().var_data[symb] = val
-        return True
-
-    @staticmethod
-    def if_else(pred, if_true, if_false):
-        if pred:
-            return if_true()
-        else:
-            return if_false()
-
     @staticmethod
+    @pure
     def add(a, b):
         return a + b
 
     @staticmethod
+    @pure
     def sub(a, b):
         return a - b
 
     @staticmethod
+    @pure
     def mul(a, b):
         return a * b
 
     @staticmethod
+    @pure
     def div(a, b):
         if b == 0:
             raise Exception("Division by 0")
         return a / b
 
     @staticmethod
+    @pure
     def eq(a, b):
         return a == b
 
     @staticmethod
+    @pure
     def gt(a, b):
         return a > b
 
     @staticmethod
+    @pure
     def gqt(a, b):
         return a >= b
 
     @staticmethod
+    @pure
     def lt(a, b):
         return a < b
 
     @staticmethod
+    @pure
     def lqt(a, b):
         return a <= b
 
     @staticmethod
+    @pure
     def i_and(a, b):
-        return a and b
+        return a and b()
 
     @staticmethod
+    @pure
     def i_or(a, b):
-        return a or b
+        return a or b()
 
     @staticmethod
+    @pure
     def neg(a):
         return not a
 
     @staticmethod
     def prnt(a):
-        logger.log(LoggerLevels.ActionMessage, str(a))
+        logger.log(LoggerLevels.ActionMessage, "%s", a)
+
+
+Commands.registry = build_registry(Commands)
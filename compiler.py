@@ -0,0 +1,128 @@
+from math import isfinite
+import script_parser
+from cmd import ScriptExit, short_circuit_commands, undefined
+
+
+class ScriptCompiler:
+    # This class lowers a user script into a single python function. Instead of building a tree of lambda functions
+    # which is walked on every execution (see Interpreter.analyze), the script is translated once into python source
+    # code that calls the bound methods of the commands object directly, and that source is compiled into a function.
+    # The semantics are kept identical to those of the tree-walking interpreter:
+    # - Arguments are evaluated left to right, and symbols are resolved to their values after evaluation, except for
+    #   the first argument of define and the branches of if_else, which are passed on unresolved
+    # - The value of a sequence of statements is the value of its last statement
+    # - Critical actions are handled by the critical_action decorator of the bound command methods themselves
+    # - The second argument of and/or is only evaluated if the first one does not decide the result (as python's and/or)
+    # - With early_exit, the script returns as soon as a critical action has been performed
+    # - With a turn budget, every call charges the budget before it is evaluated
+    # Symbols which are resolved or defined where they appear in the script are read and written by their slot index in
+    # the variables of the unit (see Interpreter.set_context), which the function fetches once when it starts
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+
+    def compile(self, tree):
+        # Generate the source of the script function from the syntax tree, compile it and return the resulting function
+        namespace = {"_vars": self.interpreter.current_variables, "_undefined": self.interpreter.get_slot_value,
+                     "_U": undefined, "_define": self.interpreter.define, "_resolve": self.interpreter.resolve,
+                     "_exit": self.interpreter.exit_if_performed, "_ScriptExit": ScriptExit,
+                     "_charge": self.interpreter.charge_budget}
+        statements = [self.lower_node(node, False, namespace)[0] for node in tree.statements]
+
+        lines = ["def _script():", "    _v = _vars()", "    _store = _v.__setitem__", "    _res = None"]
+        indent = "    "
+        if self.interpreter.early_exit:
+            lines.append("    try:")
+            indent = "        "
+        for statement in statements:
+            lines.append(indent + "_res = " + statement)
+        if self.interpreter.early_exit:
+            lines += ["    except _ScriptExit:", "        return True"]
+        lines.append("    return _res")
+        source = "\n".join(lines)
+
+        exec(compile(source, "<script>", "exec"), namespace)
+        script = namespace["_script"]
+        script.source = source  # Kept for debugging purposes
+        return script
+
+    @staticmethod
+    def add_to_namespace(namespace, value):
+        # Store a python object in the namespace of the generated function and return the name it is stored under
+        name = "_k" + str(len(namespace))
+        namespace[name] = value
+        return name
+
+    def lower_constant(self, value, namespace):
+        # Integers and finite floats are written into the source as literals, anything else is kept in the namespace
+        if isinstance(value, int) or (isinstance(value, float) and isfinite(value)):
+            return repr(value)
+        return self.add_to_namespace(namespace, value)
+
+    def lower_sequence(self, sequence, resolve, namespace):
+        # Lower a sequence of statements (i.e. an argument of a command) into a single python expression. Only the last
+        # statement's value is kept, so only the last statement is resolved.
+        # Returns the expression and whether its value may be an unresolved symbol
+        nodes = sequence.statements
+        if len(nodes) == 0:
+            return "None", False
+        lowered = [self.lower_node(node, False, namespace)[0] for node in nodes[:-1]]
+        last, may_be_symbol = self.lower_node(nodes[-1], resolve, namespace)
+        if len(lowered) == 0:
+            return last, may_be_symbol
+        return "(" + ", ".join(lowered + [last]) + ")[-1]", may_be_symbol
+
+    def lower_node(self, node, resolve, namespace):
+        # Lower a single statement into a python expression. If resolve is True, symbols are replaced by their values.
+        # Returns the expression and whether its value may be an unresolved symbol
+        if isinstance(node, script_parser.Number):
+            return self.lower_constant(node.value, namespace), False
+        elif isinstance(node, script_parser.Symbol):
+            if resolve:
+                # The value is read twice rather than stored, as a variable read is cheaper than a function call
+                slot = str(self.interpreter.symbol_slot(node.name))
+                return "(_v[" + slot + "] if _v[" + slot + "] is not _U else _undefined(" + slot + "))", False
+            return repr(node.name), True
+        code, may_be_symbol = self.lower_call(node, resolve, namespace)
+        if self.interpreter.budgeted():
+            code = "(_charge() or " + code + ")"  # _charge returns None
+        return code, may_be_symbol
+
+    def lower_call(self, node, resolve, namespace):
+        # Calls have already been verified when the script was parsed (see Interpreter.parse_tree)
+        cmd = node.name
+        args = node.args
+
+        if cmd == "if_else":
+            # The predicate is always resolved, while the value of the chosen branch is returned as is. Only the
+            # branch which is chosen by the predicate is evaluated
+            pred = self.lower_sequence(args[0], True, namespace)[0]
+            if_true, true_may_be_symbol = self.lower_sequence(args[1], False, namespace)
+            if_false, false_may_be_symbol = self.lower_sequence(args[2], False, namespace)
+            code = "(" + if_true + " if " + pred + " else " + if_false + ")"
+            if true_may_be_symbol or false_may_be_symbol:
+                if resolve:
+                    return "_resolve" + code, False
+                return code, True
+            return code, False
+
+        if cmd in short_circuit_commands:
+            # Python's and/or only evaluate their second operand if the first one does not decide the result
+            operator = " and " if cmd == "i_and" else " or "
+            return "(" + operator.join(self.lower_sequence(arg, True, namespace)[0] for arg in args) + ")", False
+
+        if cmd == "define":
+            # The first argument of define is the name of the symbol, so it must not be resolved. A symbol given as is
+            # is stored directly in its slot (__setitem__ returns None, and define returns True)
+            value = self.lower_sequence(args[1], True, namespace)[0]
+            names = args[0].statements
+            if len(names) == 1 and isinstance(names[0], script_parser.Symbol):
+                slot = str(self.interpreter.symbol_slot(names[0].name))
+                return "(_store(" + slot + ", " + value + ") or True)", False
+            return "_define(" + self.lower_sequence(args[0], False, namespace)[0] + ", " + value + ")", False
+
+        func_name = self.add_to_namespace(namespace, self.interpreter.functions[cmd])
+        args_lowered = [self.lower_sequence(arg, True, namespace)[0] for arg in args]
+        code = func_name + "(" + ", ".join(args_lowered) + ")"
+        if self.interpreter.early_exit and self.interpreter.registry[cmd].critical:
+            return "_exit(" + code + ")", False
+        return code, False
@@ -1,6 +1,7 @@
 from enum import IntEnum
 
 class LoggerLevels(IntEnum):
+    Quiet = 40  # Nothing is displayed. Used for headless runs, where no messages or boards are formatted at all
     PrimaryInformation = 30  # Used for win/lose messages and other critical info
     SecondaryInformation = 20  # Used for board display and turn numbers
     ActionMessage = 10  # Used for various action messages
\ No newline at end of file
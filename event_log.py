@@ -0,0 +1,176 @@
+import struct
+from enum import IntEnum
+from collections import namedtuple
+
+# File layout: a header (magic, format version, board size) followed by fixed-size little-endian event records
+magic = b"BBBE"
+version = 2
+header_struct = struct.Struct("<4sHii")
+# Each record holds the event type, the id of the unit the event refers to and four integer fields whose meaning
+# depends on the event type (unused fields are 0)
+record_struct = struct.Struct("<BxxxIiiii")
+# Charge records hold the number of turns as a float in place of the first two integer fields, since scripts may charge
+# for any number of turns (e.g. charge_attack(div(4, 2)) charges for 2.0). Both layouts have the same size
+charge_struct = struct.Struct("<BxxxIdii")
+
+
+class EventTypes(IntEnum):
+    TurnStart = 1  # a: turn number. The unit is the acting unit
+    Spawn = 2  # a: player id, b: x location, c: y location, d: hp
+    Move = 3  # a: new x location, b: new y location
+    Attack = 4  # a: id of the attacked unit
+    Damage = 5  # a: damage taken, b: remaining hp
+    Block = 6  # The unit was attacked while defending, and its defense was broken
+    Kill = 7  # The unit was destroyed
+    Defend = 8  # The unit is defending until its next turn
+    Charge = 9  # a: number of turns the attack is charged for (a float, see charge_struct)
+    Fortify = 10  # a: hp after fortifying
+
+
+Event = namedtuple("Event", ["type", "unit", "a", "b", "c", "d"])
+
+
+class EventWriter:
+    # Writes an append-only stream of game events. Records are packed into fixed-size binary records and written through
+    # a buffered file, so recording a game costs far less than formatting and writing text logs
+    def __init__(self, path, board_size, buffer_size=1 << 16):
+        self.file = open(path, "wb", buffering=buffer_size)
+        self.file.write(header_struct.pack(magic, version, board_size[0], board_size[1]))
+        self.pack = record_struct.pack
+
+    def write(self, event_type, unit_id, a=0, b=0, c=0, d=0):
+        self.file.write(self.pack(event_type, unit_id, a, b, c, d))
+
+    def turn_start(self, turn_number, unit):
+        self.write(EventTypes.TurnStart, unit.id, turn_number)
+
+    def spawn(self, unit):
+        self.write(EventTypes.Spawn, unit.id, unit.player.id, unit.loc[0], unit.loc[1], unit.hp)
+
+    def move(self, unit):
+        self.write(EventTypes.Move, unit.id, unit.loc[0], unit.loc[1])
+
+    def attack(self, unit, target):
+        self.write(EventTypes.Attack, unit.id, target.id)
+
+    def damage(self, unit, dmg):
+        self.write(EventTypes.Damage, unit.id, dmg, unit.hp)
+
+    def block(self, unit):
+        self.write(EventTypes.Block, unit.id)
+
+    def kill(self, unit):
+        self.write(EventTypes.Kill, unit.id)
+
+    def defend(self, unit):
+        self.write(EventTypes.Defend, unit.id)
+
+    def charge(self, unit, num_turns):
+        self.file.write(charge_struct.pack(EventTypes.Charge, unit.id, num_turns, 0, 0))
+
+    def fortify(self, unit):
+        self.write(EventTypes.Fortify, unit.id, unit.hp)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ReplayUnit:
+    # The state of a unit as reconstructed from the event log
+    __slots__ = ("id", "player_id", "loc", "hp", "defending")
+
+    def __init__(self, unit_id, player_id, loc, hp):
+        self.id = unit_id
+        self.player_id = player_id
+        self.loc = loc
+        self.hp = hp
+        self.defending = False
+
+
+class ReplayBoard:
+    # The state of the board reconstructed by applying events one after another
+    def __init__(self, board_size):
+        self.board_size = board_size
+        self.turn_number = 0
+        self.units = {}  # unit_id -> ReplayUnit
+
+    def apply(self, event):
+        event_type = event.type
+        if event_type == EventTypes.TurnStart:
+            self.turn_number = event.a
+            self.units[event.unit].defending = False  # Defense only lasts until the unit's next turn
+        elif event_type == EventTypes.Spawn:
+            self.units[event.unit] = ReplayUnit(event.unit, event.a, [event.b, event.c], event.d)
+        elif event_type == EventTypes.Move:
+            self.units[event.unit].loc = [event.a, event.b]
+        elif event_type == EventTypes.Damage:
+            self.units[event.unit].hp = event.b
+        elif event_type == EventTypes.Block:
+            self.units[event.unit].defending = False
+        elif event_type == EventTypes.Kill:
+            del self.units[event.unit]
+        elif event_type == EventTypes.Defend:
+            self.units[event.unit].defending = True
+        elif event_type == EventTypes.Fortify:
+            self.units[event.unit].hp = event.a
+        # Attacks and charges do not change the board by themselves
+
+    def matrix(self):
+        # Return the board as a matrix of unit ids (None for free tiles), in the same layout as
+        # Board.board_matrix.rows()
+        output_mtx = [[None for _ in range(self.board_size[1])] for _ in range(self.board_size[0])]
+        for unit in self.units.values():
+            output_mtx[unit.loc[0]][unit.loc[1]] = unit.id
+        return output_mtx
+
+    def num_units_per_player(self):
+        counts = {}
+        for unit in self.units.values():
+            counts[unit.player_id] = counts.get(unit.player_id, 0) + 1
+        return counts
+
+
+class EventReader:
+    # Reads an event log written by EventWriter, and reconstructs the state of the board at any point of the game
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as input_file:
+            header = input_file.read(header_struct.size)
+        file_magic, file_version, size_x, size_y = header_struct.unpack(header)
+        if file_magic != magic:
+            raise Exception(str(path) + " is not an event log")
+        if file_version != version:
+            raise Exception("Unsupported event log version " + str(file_version))
+        self.board_size = [size_x, size_y]
+
+    def __iter__(self):
+        # Iterate over all events in the log, reading the file in large chunks
+        chunk_size = record_struct.size * 4096
+        with open(self.path, "rb") as input_file:
+            input_file.seek(header_struct.size)
+            while True:
+                chunk = input_file.read(chunk_size)
+                if not chunk:
+                    return
+                for record in record_struct.iter_unpack(chunk):
+                    if record[0] == EventTypes.Charge:
+                        event_type, unit_id, num_turns, c, d = charge_struct.unpack(record_struct.pack(*record))
+                        yield Event(event_type, unit_id, num_turns, 0, c, d)
+                    else:
+                        yield Event._make(record)
+
+    def board_at(self, turn_number=None):
+        # Reconstruct the board as it was at the end of the given turn (or at the end of the game if no turn is given).
+        # Turn 0 is the board after the initial units have been spawned
+        replay_board = ReplayBoard(self.board_size)
+        for event in self:
+            if turn_number is not None and event.type == EventTypes.TurnStart and event.a > turn_number:
+                break
+            replay_board.apply(event)
+        return replay_board
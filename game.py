@@ -1,10 +1,17 @@
 import interpreter
 import board
+import unit
 import turn_handler
 import player
 import cmd
+import event_log
+import script_cache
+import profiler
 import argparse
 import logging
+import time
+from random import Random
+from contextlib import contextmanager
 from custom_logger_levels import LoggerLevels
 
 # Setup logging
@@ -18,7 +25,16 @@ class Game:
                  unit_limit_pct=0.05,
                  log_level=LoggerLevels.ActionMessage,
                  write_to_file=False,
-                 log_path="log.txt"):
+                 log_path="log.txt",
+                 interpreter_mode="tree",
+                 event_log_path=None,
+                 seed=None,
+                 early_exit=False,
+                 large_arena=False,
+                 script_cache_dir=None,
+                 profile=False,
+                 node_budget=None,
+                 time_budget=None):
 
         if board_size is None:  # Avoid mutable default argument
             board_size = [20, 20]
@@ -41,16 +57,45 @@ class Game:
         # Use LoggerLevels.PrimaryInformation to only display win/lose messages,
         # LoggerLevels.SecondaryInformation to also display  turn numbers and the board, and
         # LoggerLevels.ActionMessage to also display action messages
+        # Use LoggerLevels.Quiet to display nothing at all; messages and board displays are then never even formatted
         self.write_to_file = write_to_file
         self.log_path = log_path
+        self.interpreter_mode = interpreter_mode  # "tree" to walk the analyzed scripts as lambda trees, or "compiled"
+        # to compile each script into a single python function (faster for long games)
+        self.event_log_path = event_log_path  # If given, a binary record of all game events is written to this path
+        # (see event_log). This is much more compact than writing the text log to a file, and any board state can be
+        # reconstructed from it
+        self.seed = seed  # Seed of the game's random number generator. Games with the same seed (and settings) are
+        # identical. If None, the generator is seeded from the system
+        self.rng = Random(seed)
+        self.early_exit = early_exit  # If True, the script of a unit stops as soon as it has performed a critical
+        # action. This saves the commands that would follow, but also skips any define after the action
+        self.large_arena = large_arena  # If True, the board is stored compactly (see board.BoardMatrix), for very large
+        # boards with many players. See the README for the cost of a turn and the memory used per tile and unit
+        self.script_cache_dir = script_cache_dir  # If given, parsed scripts are also cached in this directory, where
+        # they are shared with other processes and later games (they are always cached in memory, see script_cache)
+        self.profiler = profiler.Profiler() if profile else None  # If profile is True, the time spent in each phase
+        # of the turns, in each player's script and in each command is recorded (see profiler)
+        self.node_budget = node_budget  # If given, the maximum number of calls a script may evaluate in a unit's turn
+        self.time_budget = time_budget  # If given, the maximum time in seconds a script may run for in a unit's turn.
+        # A unit whose script exceeds either budget forfeits the rest of its turn (see Interpreter). Note that games
+        # with a time budget may not be reproducible from their seed, since they depend on the speed of the machine
 
         # OBJECT INITIALIZATION
         self.players = {}  # Dict of players, player_id -> player_object
         self.turn_handler = turn_handler.TurnHandler()  # Turn handler in charge of determining which unit acts when
         self.board = board.Board(self.turn_handler, self.players,
-                                 self.board_size, self.unit_limit_pct)  # Board and units
+                                 self.board_size, self.unit_limit_pct, self.rng, self.large_arena)  # Board and units
         self.user_commands = cmd.Commands(self.board, turn_handler.TurnHandlerInterface(self.turn_handler))
-        self.interpreter = interpreter.Interpreter(self.user_commands)
+        self.interpreter = interpreter.Interpreter(self.user_commands, self.interpreter_mode,
+                                                   early_exit=self.early_exit,
+                                                   cache=script_cache.get_cache(self.script_cache_dir),
+                                                   profiler=self.profiler, node_budget=self.node_budget,
+                                                   time_budget=self.time_budget)
+        self.interpreter.on_budget_exceeded = self.record_budget_trip
+        self.budget_trips = {}  # Player id -> reason ("nodes" or "time") -> number of turns the budget was exceeded
+        self.script_labels = {}  # Player id -> label of the player's script in the profile (the path of the script)
+        self.profile_phase = profiler.no_phase if self.profiler is None else self.profiler.phase
 
         # CONFIGURE LOGGER
         self.configure_logger()
@@ -75,21 +120,42 @@ class Game:
 
         logging.basicConfig(handlers=handlers, level=10)
 
+    @contextmanager
+    def logger_levels(self):
+        # Set the level of the loggers of all game modules to the log level of the game while it is played, so that
+        # messages which no handler would output are discarded by the loggers before they are formatted (and the board
+        # is not rendered). The loggers are shared by all games of the process, so their previous levels are restored
+        # afterwards
+        module_loggers = (logger, board.logger, unit.logger, cmd.logger, turn_handler.logger)
+        previous_levels = [module_logger.level for module_logger in module_loggers]
+        for module_logger in module_loggers:
+            module_logger.setLevel(self.log_level)
+        try:
+            yield
+        finally:
+            for module_logger, level in zip(module_loggers, previous_levels):
+                module_logger.setLevel(level)
+
     def populate_players(self):
         # For each player, read their script and analyze it, and create a new player object
-        # with the resulting instructions
+        # with the resulting instructions. Players with the same script share the analyzed instructions
+        scripts = {}  # Script -> analyzed instructions
         for idx, path in enumerate(self.strategy_filepaths):
             with open(path, 'r') as input_file:
                 bot_cmds = input_file.read()
-            self.players[idx + 1] = player.Player(idx + 1, self.interpreter.analyze(bot_cmds))
+            if bot_cmds not in scripts:
+                scripts[bot_cmds] = self.interpreter.analyze(bot_cmds)
+            self.players[idx + 1] = player.Player(idx + 1, scripts[bot_cmds])
+            self.script_labels[idx + 1] = path
+            self.budget_trips[idx + 1] = {"nodes": 0, "time": 0}
 
     def spawn_initial_units(self):
         # For each player, spawn one unit in a random location on the board_matrix. If the location has already
-        # been picked, keep picking random locations until an available one has been found.
+        # been picked (or is already occupied), keep picking random locations until an available one has been found.
         spawn_locs = set()
         newloc = self.board.get_random_location()
         for player_id, player_inst in self.players.items():
-            while tuple(newloc) in spawn_locs:
+            while tuple(newloc) in spawn_locs or not self.board.is_free(newloc):
                 newloc = self.board.get_random_location()
             spawn_locs.add(tuple(newloc))
             self.board.spawn_unit(player_inst, newloc)
@@ -99,23 +165,41 @@ class Game:
 
     def turn(self):
         # Start turn (resetting all relevant state variables), set context for interpreter, execute script for current
-        # acting unit, and end turn
-        self.turn_handler.start_turn()
-        self.interpreter.set_context(self.turn_handler.current_unit().var_data)
-        self.turn_handler.current_player().command_script()
-        self.turn_handler.end_turn()
-        self.board.print_board()
-        self.remove_losing_players()
-
-    def remove_losing_players(self):
-        # Check if any players have had all of their units destroyed, and remove them from the players list
-        players_to_remove = []
-        for player_id, player_r in self.players.items():
-            if player_r.num_units() == 0:
-                players_to_remove.append(player_id)
-                logger.log(LoggerLevels.PrimaryInformation, "Player " + str(player_id) + " eliminated")
-        for player_id in players_to_remove:
-            del self.players[player_id]
+        # acting unit, and end turn. When profiling, each phase of the turn and the script of the acting unit are
+        # timed (see profiler); otherwise the phases are entered in a context which does nothing
+        phase = self.profile_phase
+        with phase("turn_start"):
+            if self.board.event_log is not None:
+                self.board.event_log.turn_start(self.turn_handler.turn_number + 1, self.turn_handler.current_unit())
+            self.turn_handler.begin_turn()
+        with phase("on_new_turn"):
+            self.turn_handler.current_unit().on_new_turn()
+        with phase("script", self.script_labels[self.turn_handler.current_player().id]):
+            self.interpreter.set_context(self.turn_handler.current_unit().var_data)
+            self.turn_handler.current_player().command_script()
+        with phase("end_turn"):
+            self.turn_handler.end_turn()
+            self.board.print_board()
+        with phase("remove_eliminated_players"):
+            self.remove_eliminated_players()
+
+    def record_budget_trip(self, reason):
+        # Called by the interpreter when the script of the acting unit has exceeded its turn budget
+        current_unit = self.turn_handler.current_unit()
+        self.budget_trips[current_unit.player.id][reason] += 1
+        logger.log(LoggerLevels.ActionMessage, "Unit %s of player %s exceeded its %s budget", current_unit.id,
+                   current_unit.player.id, reason)
+
+    def remove_eliminated_players(self):
+        # Remove the players whose last unit has been destroyed since the last call. The board reports players as they
+        # are eliminated, so this does not need to look at the other players. The board's list is swapped for an empty
+        # one, since popping its players one by one from the front would be quadratic when many players are eliminated
+        eliminated_players = self.board.eliminated_players
+        self.board.eliminated_players = []
+        for player_r in eliminated_players:
+            if self.players.get(player_r.id) is player_r and player_r.num_units() == 0:
+                del self.players[player_r.id]
+                logger.log(LoggerLevels.PrimaryInformation, "Player %s eliminated", player_r.id)
 
     def announce_winner(self):
         # Check and report the winning player(s).
@@ -124,23 +208,23 @@ class Game:
 
         if self.one_player_left():
             winning_player = list(self.players.values())[0]
-            logger.log(LoggerLevels.PrimaryInformation, "Player " + str(winning_player.id) + " has won the game")
+            logger.log(LoggerLevels.PrimaryInformation, "Player %s has won the game", winning_player.id)
             return winning_player.id
 
         #  Make a player id -> remaining units dict, check max value, then get all player ids with this max value
-        remaining_units = {player_id: self.players[player_id].num_units() for player_id in self.players}
+        remaining_units = {player_id: t_player.num_units() for player_id, t_player in self.players.items()}
         max_num_units_left = max(remaining_units.values())
-        tied_players = [self.players[player_id] for player_id in remaining_units
-                        if self.players[player_id].num_units() == max_num_units_left]
+        tied_players = [self.players[player_id] for player_id, num_units in remaining_units.items()
+                        if num_units == max_num_units_left]
 
         if len(tied_players) == 1:
-            logger.log(LoggerLevels.PrimaryInformation, "Turn limit reached, player " + str(tied_players[0].id)
-                       + " wins with " + str(max_num_units_left) + " units remaining")
+            logger.log(LoggerLevels.PrimaryInformation, "Turn limit reached, player %s wins with %s units remaining",
+                       tied_players[0].id, max_num_units_left)
             return tied_players[0].id
 
         tied_player_ids = [t_player.id for t_player in tied_players]
-        logger.log(LoggerLevels.PrimaryInformation, "Turn limit reached, players " + str(tied_player_ids)
-                   + " are tied with " + str(max_num_units_left) + " units remaining")
+        logger.log(LoggerLevels.PrimaryInformation, "Turn limit reached, players %s are tied with %s units remaining",
+                   tied_player_ids, max_num_units_left)
         return tied_player_ids
 
     def one_player_left(self):
@@ -151,23 +235,63 @@ class Game:
         return self.turn_limit_reached() or self.one_player_left()
 
     def start_game(self):
-        self.populate_players()
-        self.spawn_initial_units()
+        if self.event_log_path is not None:
+            self.board.event_log = event_log.EventWriter(self.event_log_path, self.board_size)
+        with self.logger_levels():
+            try:
+                self.populate_players()
+                self.spawn_initial_units()
 
-        while not self.game_ended():
-            self.turn()
+                while not self.game_ended():
+                    self.turn()
+            finally:
+                if self.board.event_log is not None:
+                    self.board.event_log.close()
+                    self.board.event_log = None
 
-        return self.announce_winner()
+            return self.announce_winner()
 
 
 def main():
     # Argument parsing
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', '--filepaths', nargs='*', help='Filepaths for bot strategy scripts')
-    paths = parser.parse_args().filepaths
+    parser.add_argument('-m', '--mode', choices=interpreter.Interpreter.modes, default="tree",
+                        help='Interpreter mode used to execute the scripts')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='Only display the result of the game, without any per-turn messages or boards')
+    parser.add_argument('-r', '--record', default=None, help='Path to write a binary record of the game events to')
+    parser.add_argument('-s', '--seed', type=int, default=None, help='Seed of the game, to reproduce it exactly')
+    parser.add_argument('-e', '--early-exit', action='store_true',
+                        help='Stop executing the script of a unit once it has performed a critical action')
+    parser.add_argument('-b', '--board-size', type=int, nargs=2, default=None, help='Width and height of the board')
+    parser.add_argument('-l', '--large-arena', action='store_true',
+                        help='Store the board compactly, for very large boards with many players')
+    parser.add_argument('-c', '--script-cache', default=None, help='Directory to cache parsed scripts in')
+    parser.add_argument('-p', '--profile', default=None,
+                        help='Profile the game, and write the time spent per phase, script and command to this path')
+    parser.add_argument('-g', '--flame-graph', default=None,
+                        help='Profile the game, and write the profile as folded stacks (for flame graphs) to this path')
+    parser.add_argument('-n', '--node-budget', type=int, default=None,
+                        help='Maximum number of commands a script may evaluate in a unit\'s turn')
+    parser.add_argument('-t', '--time-budget', type=float, default=None,
+                        help='Maximum time in seconds a script may run for in a unit\'s turn')
+    args = parser.parse_args()
 
-    game = Game(paths)
+    log_level = LoggerLevels.PrimaryInformation if args.quiet else LoggerLevels.ActionMessage
+    game = Game(args.filepaths, board_size=args.board_size, log_level=log_level, interpreter_mode=args.mode,
+                event_log_path=args.record, seed=args.seed, early_exit=args.early_exit, large_arena=args.large_arena,
+                script_cache_dir=args.script_cache, profile=args.profile is not None or args.flame_graph is not None,
+                node_budget=args.node_budget, time_budget=args.time_budget)
     game.start_game()
+    if game.interpreter.budgeted():
+        for player_id, trips in game.budget_trips.items():
+            logger.log(LoggerLevels.PrimaryInformation, "Player %s exceeded the turn budget %s times (nodes: %s, "
+                       "time: %s)", player_id, trips["nodes"] + trips["time"], trips["nodes"], trips["time"])
+    if args.profile is not None:
+        game.profiler.write_json(args.profile)
+    if args.flame_graph is not None:
+        game.profiler.write_folded_stacks(args.flame_graph)
 
 
 if __name__ == "__main__":
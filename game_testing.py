@@ -0,0 +1,25 @@
+import logging
+import game
+
+# Helpers shared by the unit tests which check that games are played alike in different configurations
+
+strategy_paths = ["strategies/test1.txt", "strategies/test2.txt"]
+
+
+def play_seeded_game(seed, paths=None, optimize=True, **kwargs):
+    # Play a game with the given seed and arguments of Game, and return its outcome and the game. The outcome is the
+    # winner, the number of turns and the id, hp and location of every unit left, so games which must be played alike
+    # have the same outcome. optimize is set on the interpreter before the scripts are analyzed. Logging is disabled
+    # while the game is played
+    if paths is None:  # Avoid mutable default argument
+        paths = strategy_paths
+    logging.disable(logging.CRITICAL)
+    try:
+        test_game = game.Game(paths, seed=seed, **kwargs)
+        test_game.interpreter.optimize = optimize
+        winner = test_game.start_game()
+    finally:
+        logging.disable(logging.NOTSET)
+    units = sorted((t_unit.id, t_unit.hp, tuple(t_unit.loc))
+                   for t_player in test_game.players.values() for t_unit in t_player.units)
+    return (winner, test_game.turn_handler.turn_number, units), test_game
@@ -1,51 +1,67 @@
-import re
-from cmd import CommandsInspector
+import time
+import script_parser
+import script_cache
+from cmd import BudgetExceeded, CommandsInspector, ScriptExit, short_circuit_commands, undefined
+from compiler import ScriptCompiler
+from optimizer import ScriptOptimizer
 
 
 class Interpreter:
     # This class handles parsing and analysis of user input
-    def __init__(self, commands):
-        self.commands = commands
-        self.__symbol_var_dict = None
+    # Scripts may be analyzed in one of two modes:
+    # - "tree": the script is turned into a tree of lambda functions which is walked on every execution
+    # - "compiled": the script is lowered once into a python function which calls the commands directly (see compiler)
+    # In both modes the syntax tree is first simplified by the optimizer (constant folding and dead branch elimination),
+    # unless optimize is False.
+    # If early_exit is True, the execution of a script stops as soon as a critical action has been performed, since the
+    # unit cannot act any more in the same turn. Note that this also skips any define or prnt after the action.
+    # The variables of a unit are held in a list with one slot per symbol (see set_context). Every symbol of an analyzed
+    # script is given a slot index when the script is analyzed, so that analyzed scripts read and write variables by
+    # index rather than by name. Slots of symbols which the unit has not defined hold undefined.
+    # Parsed (verified and optimized) syntax trees are kept in a script cache (see script_cache), shared by all the
+    # interpreters of the process by default, so each distinct script is only parsed once.
+    # The execution of a script may be limited to node_budget evaluated calls (of any command, including if_else,
+    # define, and and or) and to time_budget seconds per turn. A script exceeding its budget is stopped, and the unit
+    # forfeits the rest of its turn as with wait(); on_budget_exceeded, if set, is then called with the reason ("nodes"
+    # or "time"). The budget is enforced by a counter of evaluated calls, and the clock is only read every
+    # budget_check_interval calls, so a single slow command may exceed the time budget by its own duration. Without
+    # budgets, analyzed scripts do not count anything
+    modes = ("tree", "compiled")
+    budget_check_interval = 64
 
-    def set_context(self, symbol_var_dict):
-        self.__symbol_var_dict = symbol_var_dict
+    def __init__(self, commands, mode="tree", optimize=True, early_exit=False, cache=None, profiler=None,
+                 node_budget=None, time_budget=None):
+        if mode not in Interpreter.modes:
+            raise Exception("Unknown interpreter mode " + str(mode) + "; expected one of " + str(Interpreter.modes))
+        self.commands = commands
+        self.registry = commands.registry  # Command name -> CommandInfo, see cmd.build_registry
+        self.functions = CommandsInspector.bound_commands(commands)  # Command name -> bound command
+        if profiler is not None:  # Analyzed scripts call the commands through the profiler's timing wrappers
+            self.functions = profiler.wrap_commands(self.functions)
+        self.mode = mode
+        self.optimize = optimize
+        self.early_exit = early_exit
+        self.cache = script_cache.get_cache() if cache is None else cache
+        self.optimizer = ScriptOptimizer(self)
+        self.compiler = ScriptCompiler(self)
+        self.symbol_slots = {}  # Symbol -> index of its slot in the variables of each unit
+        self.symbol_names = []  # Slot index -> symbol
+        self.__variables = None
 
-    @staticmethod
-    def is_number(expr):
-        try:
-            float(expr)
-            return True
-        except ValueError:
-            return False
+        self.node_budget = node_budget
+        self.time_budget = time_budget
+        self.on_budget_exceeded = None
+        self.budget_nodes_left = 0  # Calls which the current turn may still evaluate after the current interval
+        self.budget_steps = 0  # Calls which may still be evaluated before the budget is checked again
+        self.budget_deadline = None  # Clock time at which the current turn's time budget runs out
 
-    @staticmethod
-    def parse(expr):
-        # Initial parsing for expression; strip off leading and trailing whitespaces, replace multiple spaces with
-        # singles, and separate into different commands on whitespace or linebreak if not enclosed within parentheses
-        expr_parsed = ' '.join(expr.split()).replace("\n", " ").replace("\t", " ")
-        par = 0
-        token = ""
-        expr_sep = []
-        for char in expr_parsed:
-            if par == 0 and char == " ":
-                expr_sep.append(token)
-                token = ""
-            else:
-                if char == ")":
-                    par -= 1
-                token += char
-                if char == "(":
-                    par += 1
-
-        if token != "":
-            expr_sep.append(token)
-
-        return expr_sep
+    def budgeted(self):
+        return self.node_budget is not None or self.time_budget is not None
 
-    @staticmethod
-    def is_command(expr):
-        return re.match(r"[^\s\n]+[(].*[)]+$", expr) is not None
+    def set_context(self, variables):
+        # Set the variables of the unit whose script is executed next. Units start with an empty list, which is filled
+        # with undefined slots when needed
+        self.__variables = variables
 
     @staticmethod
     def is_symbol(expr):
@@ -55,41 +71,7 @@ class Interpreter:
     @staticmethod
     def get_number_value(expr):
         # Get number value as int if possible, or float if not
-        f = float(expr)
-        i = int(f)
-        return i if i == f else f
-
-    @staticmethod
-    def get_cmd(expr):
-        return expr.split("(")[0]
-
-    @staticmethod
-    def get_args(expr):
-        # Extract the arguments inside the parentheses, separated by commas
-        # In order to handle nested functions, we make sure to count parentheses and only tokenize arguments inside
-        # the outermost parentheses
-        par = 0
-        token = ""
-        args = []
-
-        for char in expr:
-            if char == "," and par == 1:
-                args.append(token)
-                token = ""
-            else:
-                if char == ")":
-                    par -= 1
-                if par > 0:
-                    token += char
-                if char == "(":
-                    par += 1
-
-        if token != "":
-            args.append(token)
-        if par != 0:
-            raise Exception("Unclosed parentheses found")
-
-        return args
+        return script_parser.number_value(expr)
 
     @staticmethod
     def execute_multiple(exprs):
@@ -101,101 +83,305 @@ class Interpreter:
             res = expr()
         return res
 
+    @staticmethod
+    def execute_until_exit(script):
+        # Execute a script, stopping early if a critical action raises ScriptExit. The value of the script is then the
+        # value of the critical action
+        try:
+            return script()
+        except ScriptExit:
+            return True
+
+    @staticmethod
+    def exit_if_performed(performed):
+        # Called with the value of each critical action when early_exit is set. Critical actions return True only if
+        # they were performed
+        if performed is True:
+            raise ScriptExit()
+        return performed
+
+    def reset_budget(self):
+        # Start the budget of a new turn. The first evaluated call checks the budget
+        self.budget_nodes_left = self.node_budget if self.node_budget is not None else float("inf")
+        self.budget_steps = 0
+        self.budget_deadline = time.perf_counter() + self.time_budget if self.time_budget is not None else None
+
+    def charge_budget(self):
+        # Called for every evaluated call when a budget is set
+        self.budget_steps -= 1
+        if self.budget_steps < 0:
+            self.check_budget()
+
+    def check_budget(self):
+        # Raise BudgetExceeded if the budget of the turn is used up, or else allow the next interval of calls
+        if self.budget_nodes_left <= 0:
+            raise BudgetExceeded("nodes")
+        if self.budget_deadline is not None and time.perf_counter() > self.budget_deadline:
+            raise BudgetExceeded("time")
+        interval = min(self.budget_check_interval, self.budget_nodes_left)
+        self.budget_nodes_left -= interval
+        self.budget_steps = interval - 1  # Including the call being charged
+
+    def execute_with_budget(self, script):
+        # Execute a script within the budget of a turn. If it runs out, the unit forfeits the rest of its turn
+        self.reset_budget()
+        try:
+            return script()
+        except BudgetExceeded as e:
+            if self.on_budget_exceeded is not None:
+                self.on_budget_exceeded(e.reason)
+            return self.functions["wait"]()
+
+    def symbol_slot(self, symb):
+        # Return the slot index of a symbol, giving it a new slot if it has none yet
+        slot = self.symbol_slots.get(symb)
+        if slot is None:
+            slot = len(self.symbol_names)
+            self.symbol_slots[symb] = slot
+            self.symbol_names.append(symb)
+        return slot
+
+    def current_variables(self):
+        # Return the variables of the current unit, with a slot for every symbol known so far
+        variables = self.__variables
+        if len(variables) < len(self.symbol_names):
+            variables.extend([undefined] * (len(self.symbol_names) - len(variables)))
+        return variables
+
+    def defined_symbols(self, variables):
+        # Return a dict of the symbols defined in the given variables and their values, e.g. for debugging
+        return {self.symbol_names[slot]: value for slot, value in enumerate(variables) if value is not undefined}
+
+    def get_slot_value(self, slot):
+        try:
+            value = self.__variables[slot]
+        except IndexError:  # The unit has not defined any symbol since the slot was added
+            value = undefined
+        if value is undefined:
+            raise Exception("Undefined symbol " + self.symbol_names[slot])
+        return value
+
+    def set_slot_value(self, slot, value):
+        try:
+            self.__variables[slot] = value
+        except IndexError:
+            self.current_variables()[slot] = value
+        return True
+
     def get_symbol_value(self, expr):
-        # Defined symbol values are saved on a per-unit basis, so the value is always taken from the dictionary
+        # Defined symbol values are saved on a per-unit basis, so the value is always taken from the variables
         # of the "current unit", which is determined by the turn handler
-        try:
-            return self.__symbol_var_dict[expr]
-        except KeyError:
+        slot = self.symbol_slots.get(expr)
+        if slot is None:
             raise Exception("Undefined symbol " + expr)
+        return self.get_slot_value(slot)
+
+    def define(self, symb, val):
+        # Define is performed by the interpreter itself, since it stores the value in the variables of the current unit
+        return self.set_slot_value(self.symbol_slot(symb), val)
+
+    def resolve(self, value):
+        # Resolve a value whose type is only known at runtime: a symbol is replaced by its value
+        if self.is_symbol(value):
+            return self.get_symbol_value(value)
+        return value
+
+    # The eval_and_exec methods execute a command on arguments given as functions (such as those returned by
+    # analyze_sequence with resolve False), resolving the arguments' values at runtime. Analyzed scripts do not use
+    # them, since analyze_node knows which arguments need resolving, and builds a specialized function for each call
 
     def eval_and_exec_general(self, cmd, args):
         # First execute all lambda functions for all arguments, reducing them all to either numbers or symbols
         # Then resolve all symbols by replacing them with their defined values
-        args_eval = args.copy()  # Avoid modifying the original arguments
-        for idx, arg in enumerate(args_eval):
-            args_eval[idx] = arg()
-            if self.is_symbol(args_eval[idx]):
-                args_eval[idx] = self.get_symbol_value(args_eval[idx])
-        return CommandsInspector.execute_command(self.commands, cmd, args_eval)
+        return self.functions[cmd](*[self.resolve(arg()) for arg in args])
 
     def eval_and_exec_define(self, args):
         # Define is a special case since it expects the first argument to be an undefined symbol, so we must not
         # attempt to fully resolve it
-        args_eval = args.copy()  # Avoid modifying the original arguments
-        for idx, arg in enumerate(args_eval):
-            args_eval[idx] = arg()
-        if self.is_symbol(args_eval[1]):
-            args_eval[1] = self.get_symbol_value(args_eval[1])
-        return CommandsInspector.execute_command(self.commands, "define", args_eval)
+        symb = args[0]()
+        return self.define(symb, self.resolve(args[1]()))
 
     def eval_and_exec_if_else(self, args):
         # If statements are a special case since we only want to execute the lambdas of the arguments based on the
-        # predicate. Therefore only the first argument (the predicate) is evaluated at this stage, and the relevant
-        # result is evaluated within the function itself
-        args_eval = args.copy()  # Avoid modifying the original arguments
-        args_eval[0] = args_eval[0]()
-        if self.is_symbol(args_eval[0]):
-            args_eval[0] = self.get_symbol_value(args_eval[0])
-        return CommandsInspector.execute_command(self.commands, "if_else", args_eval)
+        # predicate. Therefore the first argument (the predicate) is evaluated first, and then only the chosen branch
+        return args[1]() if self.resolve(args[0]()) else args[2]()
+
+    def eval_and_exec_short_circuit(self, cmd, args):
+        # And/or statements are a special case since the second argument is only evaluated if the first one does not
+        # decide the result. Therefore only the first argument is evaluated at this stage, and the second one is passed
+        # on as a function which evaluates and resolves it
+        first = self.resolve(args[0]())
+        second = args[1]
+        return self.functions[cmd](first, lambda: self.resolve(second()))
 
     def eval_and_exec(self, cmd, args):
-        # Command execution requires special handling for define and if statements
+        # Command execution requires special handling for define, if, and and or statements
         if cmd == "define":
             return self.eval_and_exec_define(args)
         elif cmd == "if_else":
             return self.eval_and_exec_if_else(args)
+        elif cmd in short_circuit_commands:
+            return self.eval_and_exec_short_circuit(cmd, args)
         else:
             return self.eval_and_exec_general(cmd, args)
 
+    def verify_call(self, node):
+        # Verify that a call node refers to a known command with the correct number of arguments, reporting the
+        # position of the call in the script if it does not
+        try:
+            CommandsInspector.verify_commands(self.commands, node.name, node.args)
+        except Exception as e:
+            raise Exception(str(e) + " (at " + node.position() + ")")
+
+    def verify_tree(self, sequence):
+        # Verify all calls of a syntax tree, including those in branches which may never be executed
+        for node in sequence.statements:
+            if isinstance(node, script_parser.Call):
+                self.verify_call(node)
+                for arg in node.args:
+                    self.verify_tree(arg)
+
+    def tree_settings(self):
+        # The settings a parsed tree depends on besides the script itself: the commands it was verified against (their
+        # names, arities and flags, so that trees cached on disk are not reused once a command changes), whether it is
+        # optimized, and the values of pure commands without arguments, which the optimizer folds into the tree although
+        # they depend on the game (e.g. get_unit_limit)
+        settings = [type(self.commands).__name__, CommandsInspector.registry_signature(self.commands), self.optimize]
+        if self.optimize:
+            settings += sorted(CommandsInspector.constant_values(self.commands).items())
+        return tuple(settings)
+
+    def parse_tree(self, input_string):
+        # Parse the script into a syntax tree, verify it and optimize it if enabled. The tree is taken from the script
+        # cache if the same script has already been parsed with the same settings
+        key = self.cache.key(input_string, self.tree_settings())
+        tree = self.cache.get(key)
+        if tree is None:
+            tree = script_parser.parse(input_string)
+            self.verify_tree(tree)
+            if self.optimize:
+                tree = self.optimizer.optimize(tree)
+            self.cache.put(key, tree)
+        return tree
+
     def analyze(self, input_string):
-        # Parse statement into its component statements, then recursively analyze each one
-        # and finally return a lambda function that evaluates all parameters and executes commands
-        exprs = self.parse(input_string)
-        exprs_processed = []
-        for expr in exprs:
-            if self.is_number(expr):
-                # Numbers are our most basic primitive; we return a lambda function that replaces the string
-                # with the corresponding number
-                exprs_processed.append(lambda: self.get_number_value(expr))
-            elif self.is_symbol(expr):
-                # For strings ("symbols"), the returned function simply keeps them as is. Their value (if defined)
-                # will be evaluated later as part of the execution
-                exprs_processed.append(lambda: expr)
-            elif self.is_command(expr):
-                # For commands we first recursively analyze the arguments, then verify correct syntax,
-                # and finally return a lambda function that evaluates all arguments and executes the command
-                # (note that the arguments themselves may be commands, which get executed as part of the evaluation
-                # process as well)
-                cmd = self.get_cmd(expr)
-                args_unevaluated = self.get_args(expr)
-                args = []
-                for arg in args_unevaluated:
-                    args.append(self.analyze(arg))
-
-                if cmd == "if":
-                    cmd = "if_else"
-                    args.append(lambda: 0)
-                # Special case handling for "if" statement, which transforms it into an if_else statement with a
-                # blank else clause. This saves us from having to implement both functions, as well as avoids problems
-                # with the "if" command shadowing python's
-
-                if cmd == "and":
-                    cmd = "i_and"
-                if cmd == "or":
-                    cmd = "i_or"
-                # Avoid shadowing with and/or commands
-                CommandsInspector.verify_commands(self.commands, cmd, args)
-                # self.commands.verify_command(cmd, args)
-                exprs_processed.append((lambda xcmd, xargs: lambda: self.eval_and_exec(xcmd, xargs))(cmd, args))
-                # Important: This double-lambda construct is here because python evaluates variables on execution
-                # and not on definition. Without this, other processed statements which return a lambda function will
-                # refer to the same cmd and arg, which will only be evaluated in the end. In other words, instead of
-                # analyzing all statements, only the last one will be analyzed (multiple times). To work our way around
-                # this, we construct a lambda that constructs the lambda we actually want, and immediately call it.
-                # Another way around this would be to define default arguments cmd=cmd, args=args since default
-                # arguments are evaluated on definition.
-            else:
-                raise Exception("Syntax error in expression " + str(expr))
+        # Parse the script into a syntax tree in a single pass, then recursively analyze the tree and finally return a
+        # lambda function that evaluates all parameters and executes commands
+        tree = self.parse_tree(input_string)
+        if self.mode == "compiled":
+            script = self.compiler.compile(tree)
+        else:
+            tree_script = self.analyze_sequence(tree)
+            script = (lambda: self.execute_until_exit(tree_script)) if self.early_exit else tree_script
+        if self.budgeted():
+            unbudgeted = script
+            return lambda: self.execute_with_budget(unbudgeted)
+        return script
 
+    def analyze_sequence(self, sequence, resolve=False):
+        # Analyze each statement of a sequence, and return a function that executes all of them in order and returns
+        # the value of the last one. If resolve is True, the value is resolved (see analyze_node)
+        nodes = sequence.statements
+        if len(nodes) == 0:
+            return lambda: None
+        exprs_processed = [self.analyze_node(node) for node in nodes[:-1]] + [self.analyze_node(nodes[-1], resolve)]
+        if len(exprs_processed) == 1:
+            return exprs_processed[0]
         return lambda: self.execute_multiple(exprs_processed)
+
+    def analyze_node(self, node, resolve=False):
+        # Analyze a single statement into a function returning its value. Each kind of statement gets a function of
+        # its own, which does no more work than the statement needs: arguments are classified when the script is
+        # analyzed (numbers, symbols and calls), so no lists are built and no values are checked on every execution.
+        # If resolve is True the statement's value is resolved: symbols are replaced by their values (read from their
+        # slot, see set_context). Otherwise a symbol evaluates to its own name, as e.g. the first argument of define
+        if isinstance(node, script_parser.Number):
+            # Numbers are our most basic primitive; we return a lambda function that returns the number
+            value = node.value
+            return lambda: value
+        elif isinstance(node, script_parser.Symbol):
+            # For strings ("symbols"), the returned function either keeps them as is, or reads their value (raising
+            # an exception if the current unit has not defined them)
+            name = node.name
+            slot = self.symbol_slot(name)
+            if resolve:
+                get_slot_value = self.get_slot_value
+                return lambda: get_slot_value(slot)
+            return lambda: name
+        else:
+            # For commands we recursively analyze the arguments (calls have already been verified by parse_tree), and
+            # return a function that evaluates all arguments and executes the command (note that the arguments
+            # themselves may be commands, which get executed as part of the evaluation process as well).
+            # Aliases such as "if" -> "if_else" have already been resolved by the parser.
+            # Note that since each call to this method has its own scope, the returned functions refer to the
+            # cmd and args of their own node
+            call = self.analyze_call(node, resolve)
+            if self.early_exit and self.registry[node.name].critical:
+                performed = call
+                exit_if_performed = self.exit_if_performed
+                call = lambda: exit_if_performed(performed())
+            if self.budgeted():
+                unbudgeted = call
+                charge_budget = self.charge_budget
+                call = lambda: charge_budget() or unbudgeted()  # charge_budget returns None
+            return call
+
+    def analyze_call(self, node, resolve):
+        cmd = node.name
+        if cmd == "if_else":
+            # Only the branch chosen by the predicate is evaluated. Its value is resolved if the if_else's value is,
+            # which is the same as resolving the value returned by the if_else
+            pred = self.analyze_sequence(node.args[0], True)
+            if_true = self.analyze_sequence(node.args[1], resolve)
+            if_false = self.analyze_sequence(node.args[2], resolve)
+            return lambda: if_true() if pred() else if_false()
+        if cmd == "define":
+            value = self.analyze_sequence(node.args[1], True)
+            names = node.args[0].statements
+            if len(names) == 1 and isinstance(names[0], script_parser.Symbol):
+                # The value of a symbol given as is is stored directly in its slot
+                slot = self.symbol_slot(names[0].name)
+                set_slot_value = self.set_slot_value
+                return lambda: set_slot_value(slot, value())
+            name = self.analyze_sequence(node.args[0])
+            define = self.define
+            return lambda: define(name(), value())
+        if cmd in short_circuit_commands:
+            # The second argument is only evaluated if the first one does not decide the result (as python's and/or)
+            first = self.analyze_sequence(node.args[0], True)
+            second = self.analyze_sequence(node.args[1], True)
+            if cmd == "i_and":
+                return lambda: first() and second()
+            return lambda: first() or second()
+
+        # Any other command is called with its resolved arguments, with functions specialized on the number of
+        # arguments and on whether each of them is a constant
+        function = self.functions[cmd]
+        args = node.args
+        if len(args) == 0:
+            return function
+        constants = [self.constant_value(arg) for arg in args]
+        evaluators = [self.analyze_sequence(arg, True) for arg in args]
+        if len(args) == 1:
+            if constants[0] is not None:
+                value = constants[0]
+                return lambda: function(value)
+            arg = evaluators[0]
+            return lambda: function(arg())
+        if len(args) == 2:
+            first, second = evaluators
+            if constants[0] is not None:
+                first_value = constants[0]
+                return lambda: function(first_value, second())
+            if constants[1] is not None:
+                second_value = constants[1]
+                return lambda: function(first(), second_value)
+            return lambda: function(first(), second())
+        return lambda: function(*[arg() for arg in evaluators])
+
+    @staticmethod
+    def constant_value(sequence):
+        # Return the value of an argument made of a single number, or None for any other argument
+        if len(sequence.statements) == 1 and isinstance(sequence.statements[0], script_parser.Number):
+            return sequence.statements[0].value
+        return None
@@ -0,0 +1,109 @@
+import script_parser
+from cmd import CommandsInspector, short_circuit_commands
+
+
+class ScriptOptimizer:
+    # This class simplifies the syntax tree of a user script before it is analyzed (see Interpreter.analyze). The
+    # optimized tree behaves exactly like the original one when executed, but does less work on every execution:
+    # - Calls to pure commands (see cmd.pure) whose arguments are all constants are evaluated once, and replaced by
+    #   their value. Calls raising an error (e.g. a division by 0) are kept, so that the error is still raised if and
+    #   when the call is executed. and/or are also evaluated if their first argument is constant and decides the
+    #   result on its own, since their second argument is then never evaluated
+    # - if_else statements with a constant predicate are replaced by the statements of the chosen branch
+    # - Numbers and symbols whose value is not used (i.e. which are not the last statement of a sequence) are removed,
+    #   since they do nothing
+    # - neg(neg(x)) is replaced by x where only the truth value of the result matters: in the predicate of an if_else
+    #   and in the arguments of neg (and of and/or, if their own truth value is all that matters)
+    # All other statements are kept in their original order, so critical actions and other commands with side effects
+    # are executed just as before. Trees must have been verified (see Interpreter.verify_tree) before they are
+    # optimized, so that invalid calls in removed branches are still rejected
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        # The optimizer calls the commands through its own bound functions, so that commands evaluated in advance are
+        # not counted as executed by a profiler wrapping the interpreter's functions
+        self.functions = CommandsInspector.bound_commands(interpreter.commands)
+
+    def optimize(self, tree):
+        return self.optimize_sequence(tree, False)
+
+    def optimize_sequence(self, sequence, truth_value):
+        # Optimize a sequence of statements. If truth_value is True, only the truth value of the sequence is used
+        nodes = sequence.statements
+        statements = []
+        for idx, node in enumerate(nodes):
+            last = idx == len(nodes) - 1
+            statements.extend(self.optimize_node(node, last, truth_value and last))
+        statements = [node for node in statements[:-1] if isinstance(node, script_parser.Call)] + statements[-1:]
+        return script_parser.Sequence(statements, sequence.line, sequence.column)
+
+    def optimize_node(self, node, last, truth_value):
+        # Optimize a single statement, and return the list of statements replacing it. last tells whether the statement
+        # is the last of its sequence, i.e. whether its value may be used
+        if not isinstance(node, script_parser.Call):
+            return [node]
+        if node.name == "if_else":
+            return self.optimize_if_else(node, last, truth_value)
+
+        args_truth_value = node.name == "neg" or (truth_value and node.name in short_circuit_commands)
+        args = [self.optimize_sequence(arg, args_truth_value) for arg in node.args]
+        call = script_parser.Call(node.name, args, node.line, node.column)
+        if truth_value and node.name == "neg":
+            inner = args[0].statements
+            if len(inner) > 0 and isinstance(inner[-1], script_parser.Call) and inner[-1].name == "neg" \
+                    and len(inner[-1].args[0].statements) > 0:
+                return inner[:-1] + inner[-1].args[0].statements
+        value = self.fold(call)
+        return [call if value is None else value]
+
+    def optimize_if_else(self, node, last, truth_value):
+        # The branches are only used for their truth value if the if_else itself is
+        pred = self.optimize_sequence(node.args[0], True)
+        if_true = self.optimize_sequence(node.args[1], truth_value)
+        if_false = self.optimize_sequence(node.args[2], truth_value)
+
+        pred_nodes = pred.statements
+        if len(pred_nodes) > 0 and isinstance(pred_nodes[-1], script_parser.Number):
+            chosen = if_true if pred_nodes[-1].value else if_false
+            # An empty branch returns None, which must be kept if the value of the if_else may be used
+            if len(chosen.statements) > 0 or not last:
+                return pred_nodes[:-1] + chosen.statements
+        return [script_parser.Call("if_else", [pred, if_true, if_false], node.line, node.column)]
+
+    def fold(self, call):
+        # Return a Number holding the value of a call to a pure command whose arguments are all constants, or None if
+        # the call cannot be evaluated when the script is analyzed
+        if not self.interpreter.registry[call.name].pure:
+            return None
+        if call.name in short_circuit_commands:
+            return self.fold_short_circuit(call)
+        values = []
+        for arg in call.args:
+            constant = self.constant(arg)
+            if constant is None:
+                return None
+            values.append(constant.value)
+        try:
+            value = self.functions[call.name](*values)
+        except Exception:
+            return None  # Raised again if the call is executed
+        return script_parser.Number(value, call.line, call.column)
+
+    def fold_short_circuit(self, call):
+        # The value of and/or is known if the first argument is constant and decides it on its own (false for and, true
+        # for or), or else if both arguments are constant
+        first = self.constant(call.args[0])
+        if first is None:
+            return None
+        if (call.name == "i_and") != bool(first.value):
+            return script_parser.Number(first.value, call.line, call.column)
+        second = self.constant(call.args[1])
+        if second is None:
+            return None
+        return script_parser.Number(second.value, call.line, call.column)
+
+    @staticmethod
+    def constant(sequence):
+        # Return the Number node of a sequence made of a single number, or None for any other sequence
+        if len(sequence.statements) == 1 and isinstance(sequence.statements[0], script_parser.Number):
+            return sequence.statements[0]
+        return None
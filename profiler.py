@@ -0,0 +1,144 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+# Phases of a turn timed by the profiler (see Game.turn), in the order they happen
+phases = ("turn_start", "on_new_turn", "script", "end_turn", "remove_eliminated_players")
+no_op = nullcontext()
+
+
+def no_phase(name, script=None):
+    # Used by games which are not profiled in place of Profiler.phase: the phase is run as is
+    return no_op
+
+
+class Stats:
+    # Call count and cumulative time of one profiled item
+    __slots__ = ("calls", "seconds")
+
+    def __init__(self, calls=0, seconds=0.0):
+        self.calls = calls
+        self.seconds = seconds
+
+    def add(self, calls, seconds):
+        self.calls += calls
+        self.seconds += seconds
+
+    def to_dict(self):
+        return {"calls": self.calls, "seconds": self.seconds}
+
+
+class Profiler:
+    # This class records where the time of a game goes: per phase of a turn, per player script, and per command called
+    # by each script. Profiling is opt-in (see Game's profile argument): when it is enabled, the game times each phase
+    # of its turns in the context returned by phase, and the interpreter calls commands through the timing wrappers of
+    # wrap_commands. When it is disabled, the phases are run in a context which does nothing (see no_phase), and the
+    # commands are called directly.
+    # The time of a command does not include the evaluation of its arguments (which happens before the command is
+    # called), and the time of a script includes the time of its commands. Language constructs which the interpreter
+    # evaluates itself (define, if_else, and, or) are part of the script's own time.
+    # Results may be exported as JSON (to_dict), or as folded stacks (folded_stacks), one "frame;frame;... value" line
+    # per stack with the time in microseconds, which flame graph tools such as flamegraph.pl and speedscope read
+    def __init__(self):
+        self.phases = defaultdict(Stats)  # Phase -> stats
+        self.scripts = defaultdict(Stats)  # Script label -> stats
+        self.commands = defaultdict(Stats)  # (script label, command name) -> stats
+        self.current_script = None  # Label of the script being executed, which the commands it calls are counted for
+        self.turns = 0
+
+    def wrap_command(self, name, function):
+        # Return a function which calls the given command and records its call and time
+        clock = time.perf_counter
+        commands = self.commands
+
+        def profiled_command(*args):
+            start = clock()
+            try:
+                return function(*args)
+            finally:
+                commands[self.current_script, name].add(1, clock() - start)
+        return profiled_command
+
+    def wrap_commands(self, functions):
+        # Wrap a dict of command name -> function (see Interpreter.functions)
+        return {name: self.wrap_command(name, function) for name, function in functions.items()}
+
+    @contextmanager
+    def phase(self, name, script=None):
+        # Time the code run in the context as a phase of the turn. Every turn starts with the first phase. If the label
+        # of a script is given, the phase is also counted for that script, and so are the commands called in it
+        if name == phases[0]:
+            self.turns += 1
+        if script is not None:
+            self.current_script = script
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        self.add_phase(name, seconds)
+        if script is not None:
+            self.add_script(script, seconds)
+
+    def add_phase(self, phase, seconds):
+        self.phases[phase].add(1, seconds)
+
+    def add_script(self, label, seconds):
+        self.scripts[label].add(1, seconds)
+
+    def merge(self, profile):
+        # Add the results of another profile, as returned by to_dict (e.g. from a game played in another process)
+        self.turns += profile["turns"]
+        for phase, stats in profile["phases"].items():
+            self.phases[phase].add(stats["calls"], stats["seconds"])
+        for label, script_stats in profile["scripts"].items():
+            self.scripts[label].add(script_stats["calls"], script_stats["seconds"])
+            for name, stats in script_stats["commands"].items():
+                self.commands[label, name].add(stats["calls"], stats["seconds"])
+
+    def command_totals(self):
+        # Return the stats of each command over all scripts, by command name
+        totals = defaultdict(Stats)
+        for (label, name), stats in self.commands.items():
+            totals[name].add(stats.calls, stats.seconds)
+        return totals
+
+    def to_dict(self):
+        scripts = {}
+        for label, stats in self.scripts.items():
+            scripts[label] = stats.to_dict()
+            scripts[label]["commands"] = {name: command_stats.to_dict()
+                                          for (command_label, name), command_stats in sorted(self.commands.items())
+                                          if command_label == label}
+        return {"turns": self.turns,
+                "phases": {phase: self.phases[phase].to_dict() for phase in phases if phase in self.phases},
+                "scripts": scripts,
+                "commands": {name: stats.to_dict() for name, stats in sorted(self.command_totals().items())}}
+
+    def folded_stacks(self):
+        # Return the profile as folded stack lines. Every phase is a frame under "turn", and the script phase is split
+        # into the scripts and their commands. Times are self times, i.e. a script's time excludes that of its commands
+        def line(frames, seconds):
+            frames = [str(frame).replace(";", ":") for frame in frames]  # Semicolons separate the frames
+            return ";".join(frames) + " " + str(max(0, int(round(seconds * 1e6))))
+
+        lines = []
+        for phase in phases:
+            if phase == "script":
+                for label, stats in sorted(self.scripts.items()):
+                    commands_seconds = 0
+                    for (command_label, name), command_stats in sorted(self.commands.items()):
+                        if command_label == label:
+                            lines.append(line(["turn", "script", label, name], command_stats.seconds))
+                            commands_seconds += command_stats.seconds
+                    lines.append(line(["turn", "script", label], stats.seconds - commands_seconds))
+            elif phase in self.phases:
+                lines.append(line(["turn", phase], self.phases[phase].seconds))
+        return lines
+
+    def write_json(self, path):
+        with open(path, 'w') as output_file:
+            json.dump(self.to_dict(), output_file, indent=2)
+
+    def write_folded_stacks(self, path):
+        with open(path, 'w') as output_file:
+            output_file.write("\n".join(self.folded_stacks()) + "\n")
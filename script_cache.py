@@ -0,0 +1,142 @@
+import os
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+import script_parser
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Version of the cached syntax trees. Change it whenever the parser or the optimizer produce different trees, so that
+# trees written to disk by older versions are not used. Changes to the commands themselves need no new version, since
+# the registry of the commands is part of the settings of every tree (see Interpreter.tree_settings)
+cache_version = 2
+
+
+# Trees are written to the cache directory as JSON, with each node as a list: ["number", value, line, column],
+# ["symbol", name, line, column], ["call", name, args, line, column] or ["sequence", statements, line, column]. Unlike
+# pickle, reading a file can only ever produce a syntax tree, so a cache directory which others can write to cannot be
+# used to run arbitrary code (though it can still make scripts behave differently, so it should not be shared with
+# untrusted users)
+
+def tree_to_data(node):
+    # Convert a syntax tree to nested lists which can be written as JSON
+    if isinstance(node, script_parser.Number):
+        return ["number", node.value, node.line, node.column]
+    elif isinstance(node, script_parser.Symbol):
+        return ["symbol", node.name, node.line, node.column]
+    elif isinstance(node, script_parser.Call):
+        return ["call", node.name, [tree_to_data(arg) for arg in node.args], node.line, node.column]
+    return ["sequence", [tree_to_data(statement) for statement in node.statements], node.line, node.column]
+
+
+def tree_from_data(data):
+    # Rebuild a syntax tree from the nested lists of tree_to_data, raising an exception if they do not describe one
+    kind = data[0]
+    if kind == "number" and isinstance(data[1], (int, float)) and len(data) == 4:
+        return script_parser.Number(data[1], data[2], data[3])
+    elif kind == "symbol" and isinstance(data[1], str) and len(data) == 4:
+        return script_parser.Symbol(data[1], data[2], data[3])
+    elif kind == "call" and isinstance(data[1], str) and len(data) == 5:
+        args = [tree_from_data(arg) for arg in data[2]]
+        if not all(isinstance(arg, script_parser.Sequence) for arg in args):
+            raise Exception("Invalid arguments of call " + str(data[1]))
+        return script_parser.Call(data[1], args, data[3], data[4])
+    elif kind == "sequence" and isinstance(data[1], list) and len(data) == 4:
+        return script_parser.Sequence([tree_from_data(statement) for statement in data[1]], data[2], data[3])
+    raise Exception("Invalid syntax tree node " + str(kind))
+
+
+class ScriptCache:
+    # This class caches the syntax trees of parsed scripts (see Interpreter.parse_tree), so that each distinct script is
+    # parsed, verified and optimized only once, however many games it is played in. Trees are kept in memory in a least
+    # recently used cache of max_size scripts and, if cache_dir is given, written to files in that directory (see
+    # tree_to_data), where they are shared with other processes (e.g. the workers of a tournament) and later runs.
+    # Trees are looked up by a hash of the script's content and of the settings the tree depends on, so a script which
+    # is changed is parsed again. The cached trees are shared, and must not be modified
+    def __init__(self, max_size=256, cache_dir=None):
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.trees = OrderedDict()  # Key -> tree, from the least to the most recently used
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(input_string, settings):
+        # The key of a script: a hash of its content, of the settings its tree depends on and of the cache version
+        digest = hashlib.sha256(input_string.encode("utf-8"))
+        digest.update(repr((cache_version, settings)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key):
+        # Return the cached tree of the given key, or None if it is not cached
+        tree = self.trees.get(key)
+        if tree is not None:
+            self.trees.move_to_end(key)
+        elif self.cache_dir is not None:
+            tree = self.load(key)
+            if tree is not None:
+                self.store(key, tree)
+        if tree is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return tree
+
+    def put(self, key, tree):
+        self.store(key, tree)
+        if self.cache_dir is not None:
+            self.save(key, tree)
+
+    def store(self, key, tree):
+        # Add a tree to the in-memory cache, evicting the least recently used tree if the cache is full
+        self.trees[key] = tree
+        self.trees.move_to_end(key)
+        if len(self.trees) > self.max_size:
+            self.trees.popitem(last=False)
+
+    def load(self, key):
+        # Read a tree from the cache directory. Missing or unreadable files are treated as cache misses
+        try:
+            with open(self.path(key), 'r') as cache_file:
+                tree = tree_from_data(json.load(cache_file))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Ignoring unreadable script cache file %s (%s)", self.path(key), e)
+            return None
+        if not isinstance(tree, script_parser.Sequence):
+            logger.warning("Ignoring unreadable script cache file %s (not a script)", self.path(key))
+            return None
+        return tree
+
+    def save(self, key, tree):
+        # Write a tree to the cache directory. The file is written under a temporary name and then renamed, so that
+        # other processes never read a partially written file
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = self.path(key) + "." + str(os.getpid()) + ".tmp"
+        try:
+            with open(temp_path, 'w') as cache_file:
+                json.dump(tree_to_data(tree), cache_file)
+            os.replace(temp_path, self.path(key))
+        except OSError as e:
+            logger.warning("Could not write script cache file %s (%s)", self.path(key), e)
+
+    def clear(self):
+        # Empty the in-memory cache (files in the cache directory are kept)
+        self.trees.clear()
+
+
+caches = {}  # Cache directory (or None for memory only) -> the cache of the current process using it
+
+
+def get_cache(cache_dir=None):
+    # Return the script cache of this process for the given cache directory, creating it if needed. All interpreters
+    # using the same directory share one cache
+    if cache_dir not in caches:
+        caches[cache_dir] = ScriptCache(cache_dir=cache_dir)
+    return caches[cache_dir]
@@ -0,0 +1,200 @@
+import re
+from math import isfinite
+
+# Every character of a script other than whitespace belongs to exactly one of these tokens (linebreaks are matched as
+# well, to keep track of line numbers). A word immediately followed by an opening parenthesis is the name of a command
+# call; any other word is either a number or a symbol.
+token_pattern = re.compile(r"(?P<call>[^\s(),]+\()|(?P<word>[^\s(),]+)|(?P<rpar>\))|(?P<comma>,)|(?P<lpar>\()|(?P<nl>\n)")
+
+# Aliases for commands whose names would shadow python keywords. "if" is additionally turned into an "if_else" with a
+# blank else clause (see Parser.parse_call)
+command_aliases = {"if": "if_else", "and": "i_and", "or": "i_or"}
+
+# Words made up only of letters which python would still convert into a number
+float_words = {"inf", "infinity", "nan"}
+
+
+########################################################################################################################
+# Syntax tree
+########################################################################################################################
+
+class Node:
+    # Base class for all nodes of the syntax tree. Each node remembers where it was found in the source
+    __slots__ = ("line", "column")
+
+    def __init__(self, line, column):
+        self.line = line
+        self.column = column
+
+    def position(self):
+        return "line " + str(self.line) + ", column " + str(self.column)
+
+
+class Number(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value, line=0, column=0):
+        self.value = value
+        self.line = line
+        self.column = column
+
+    def __repr__(self):
+        return "Number(" + repr(self.value) + ")"
+
+
+class Symbol(Node):
+    __slots__ = ("name",)
+
+    def __init__(self, name, line=0, column=0):
+        self.name = name
+        self.line = line
+        self.column = column
+
+    def __repr__(self):
+        return "Symbol(" + self.name + ")"
+
+
+class Call(Node):
+    # A command call. Each argument is a Sequence, since an argument may hold several statements
+    __slots__ = ("name", "args")
+
+    def __init__(self, name, args, line=0, column=0):
+        self.name = name
+        self.args = args
+        self.line = line
+        self.column = column
+
+    def __repr__(self):
+        return "Call(" + self.name + ", " + repr(self.args) + ")"
+
+
+class Sequence(Node):
+    # A sequence of statements. Its value is the value of the last statement
+    __slots__ = ("statements",)
+
+    def __init__(self, statements, line=0, column=0):
+        self.statements = statements
+        self.line = line
+        self.column = column
+
+    def __repr__(self):
+        return "Sequence(" + repr(self.statements) + ")"
+
+
+########################################################################################################################
+# Lexer
+########################################################################################################################
+
+def tokenize(input_string):
+    # Split the input into tokens in a single pass, dropping whitespaces. Each token is a tuple of its kind, its text,
+    # and its line and column numbers
+    tokens = []
+    line = 1
+    line_start = -1  # Offset of the character before the start of the line, so that columns start from 1
+    for match in token_pattern.finditer(input_string):
+        kind = match.lastgroup
+        if kind == "nl":
+            line += 1
+            line_start = match.start()
+        elif kind == "call":
+            tokens.append((kind, match.group()[:-1], line, match.start() - line_start))  # Drop the parenthesis
+        else:
+            tokens.append((kind, match.group(), line, match.start() - line_start))
+    tokens.append(("end", "", line, len(input_string) - line_start))
+    return tokens
+
+
+def number_value(expr):
+    # Get number value of a string as int if possible, or float if not. Raises ValueError if it is not a number
+    f = float(expr)
+    if not isfinite(f):
+        return f
+    i = int(f)
+    return i if i == f else f
+
+
+########################################################################################################################
+# Parser
+########################################################################################################################
+
+class Parser:
+    # Recursive descent parser which turns the list of tokens into a syntax tree
+    def __init__(self, input_string):
+        self.tokens = tokenize(input_string)
+        self.idx = 0
+
+    @staticmethod
+    def error(message, token):
+        return Exception("Syntax error at line " + str(token[2]) + ", column " + str(token[3]) + ": " + message)
+
+    def parse(self):
+        tree = self.parse_sequence()
+        token = self.tokens[self.idx]
+        if token[0] != "end":
+            raise self.error("unexpected '" + token[1] + "'", token)
+        return tree
+
+    def parse_sequence(self):
+        # Parse statements until reaching a token that cannot start a statement (a comma, closing parenthesis or the
+        # end of the input)
+        tokens = self.tokens
+        statements = []
+        first = tokens[self.idx]
+        while True:
+            token = tokens[self.idx]
+            kind = token[0]
+            if kind == "word":
+                self.idx += 1
+                statements.append(self.parse_atom(token))
+            elif kind == "call":
+                self.idx += 1
+                statements.append(self.parse_call(token))
+            elif kind == "lpar":
+                raise self.error("unexpected '(' (commands must be immediately followed by their arguments)", token)
+            else:
+                return Sequence(statements, first[2], first[3])
+
+    def parse_atom(self, token):
+        # Numbers are our most basic primitive. Anything else must be an alphanumeric symbol
+        text, line, column = token[1:]
+        if text.isalpha():
+            # Only a few words made of letters alone are numbers (e.g. "inf"), so check this first to avoid most of
+            # the failed conversions
+            if text.lower() not in float_words:
+                return Symbol(text, line, column)
+        try:
+            return Number(number_value(text), line, column)
+        except ValueError:
+            pass
+        if text.isalnum():
+            return Symbol(text, line, column)
+        raise self.error("invalid expression '" + text + "'", token)
+
+    def parse_call(self, token):
+        tokens = self.tokens
+        name = token[1]
+        args = []
+        if tokens[self.idx][0] == "rpar":
+            self.idx += 1  # Command without arguments
+        else:
+            while True:
+                arg = self.parse_sequence()
+                end = tokens[self.idx]
+                if end[0] == "end":
+                    raise self.error("unclosed parentheses in command " + name + "()", token)
+                if len(arg.statements) == 0:
+                    raise self.error("empty argument in command " + name + "()", end)
+                args.append(arg)
+                self.idx += 1
+                if end[0] == "rpar":
+                    break
+
+        line, column = token[2:]
+        if name == "if":
+            args.append(Sequence([Number(0, line, column)], line, column))
+        return Call(command_aliases.get(name, name), args, line, column)
+
+
+def parse(input_string):
+    # Parse a script into a syntax tree. The root of the tree is the sequence of top-level statements
+    return Parser(input_string).parse()
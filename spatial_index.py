@@ -0,0 +1,110 @@
+class SpatialIndex:
+    # Index of the units on the board for nearest ally/enemy queries.
+    # The board is divided into a grid of buckets of (roughly) bucket_size x bucket_size tiles, and each bucket holds
+    # the units inside it, grouped by player. A query searches rings of buckets outward from the bucket of the unit,
+    # and stops as soon as no bucket further out can hold a closer unit, so the cost depends on the distance to the
+    # closest ally/enemy rather than on the total number of units.
+    # Distances are the same as in Board.distance_between_units: the number of moves needed to reach the other unit
+    # (moving diagonally is allowed) on a board which wraps around.
+    def __init__(self, board_size, bucket_size=8):
+        self.board_size = board_size
+        # Number of buckets along each axis. The tiles are split as evenly as possible between the buckets, so every
+        # bucket spans at least min_bucket_size tiles along each axis
+        self.num_buckets = [max(1, size // bucket_size) for size in board_size]
+        self.min_bucket_size = [size // num for size, num in zip(board_size, self.num_buckets)]
+        self.bucket_of_x = [x * self.num_buckets[0] // board_size[0] for x in range(board_size[0])]
+        self.bucket_of_y = [y * self.num_buckets[1] // board_size[1] for y in range(board_size[1])]
+        self.buckets = {}  # bucket index -> {player -> set of units}. Empty buckets are not kept
+
+    def bucket_index(self, cell):
+        # The bucket of a cell of the board matrix (see board.BoardMatrix)
+        x, y = divmod(cell, self.board_size[1])
+        return self.bucket_of_x[x] * self.num_buckets[1] + self.bucket_of_y[y]
+
+    ####################################################################################################################
+    # Index maintenance
+    ####################################################################################################################
+
+    def add(self, unit):
+        bucket = self.buckets.setdefault(self.bucket_index(unit.cell), {})
+        bucket.setdefault(unit.player, set()).add(unit)
+
+    def remove(self, unit, cell=None):
+        # Remove a unit from the index. cell is the cell the unit was indexed in (by default, its current cell)
+        idx = self.bucket_index(unit.cell if cell is None else cell)
+        bucket = self.buckets[idx]
+        player_units = bucket[unit.player]
+        player_units.remove(unit)
+        if len(player_units) == 0:
+            del bucket[unit.player]
+            if len(bucket) == 0:
+                del self.buckets[idx]
+
+    def move(self, unit, old_cell):
+        # Update the index after a unit has moved from old_cell to its current cell
+        if self.bucket_index(old_cell) != self.bucket_index(unit.cell):
+            self.remove(unit, old_cell)
+            self.add(unit)
+
+    ####################################################################################################################
+    # Queries
+    ####################################################################################################################
+
+    @staticmethod
+    def buckets_at_distance(center, dist, num):
+        # Return the buckets (along one axis) whose distance from the center bucket is exactly dist, taking into account
+        # that the buckets wrap around
+        if dist == 0:
+            return [center]
+        if 2 * dist > num:
+            return []
+        if 2 * dist == num:
+            return [(center + dist) % num]
+        return [(center + dist) % num, (center - dist) % num]
+
+    def ring(self, loc, radius):
+        # Return the indices of all buckets whose (wrapped) distance in buckets from the bucket of loc is exactly radius
+        num_x, num_y = self.num_buckets
+        center_x = self.bucket_of_x[loc[0]]
+        center_y = self.bucket_of_y[loc[1]]
+        xs_at = self.buckets_at_distance(center_x, radius, num_x)
+        ys_at = self.buckets_at_distance(center_y, radius, num_y)
+        xs_within = [bx for dist in range(radius) for bx in self.buckets_at_distance(center_x, dist, num_x)]
+        ys_within = [by for dist in range(radius + 1) for by in self.buckets_at_distance(center_y, dist, num_y)]
+        return [bx * num_y + by for bx in xs_at for by in ys_within] + \
+               [bx * num_y + by for bx in xs_within for by in ys_at]
+
+    def distance_from_closest(self, unit, allies):
+        # Return the distance from the unit to the closest unit of the same player (if allies is True) or of any other
+        # player (if allies is False), or None if there is no such unit
+        size_x, size_y = self.board_size
+        x, y = divmod(unit.cell, size_y)
+        player = unit.player
+        buckets = self.buckets
+        best = None
+        max_radius = max(self.num_buckets[0] // 2, self.num_buckets[1] // 2)
+        min_bucket_size = min(self.min_bucket_size)
+
+        for radius in range(max_radius + 1):
+            # Any unit in a bucket at this radius is separated from the unit by at least radius - 1 whole buckets
+            if best is not None and radius > 0 and (radius - 1) * min_bucket_size + 1 >= best:
+                break
+            for idx in self.ring((x, y), radius):
+                bucket = buckets.get(idx)
+                if bucket is None:
+                    continue
+                if allies:
+                    candidate_sets = [bucket[player]] if player in bucket else []
+                else:
+                    candidate_sets = [units for t_player, units in bucket.items() if t_player != player]
+                for units in candidate_sets:
+                    for t_unit in units:
+                        if t_unit is unit:
+                            continue
+                        t_x, t_y = divmod(t_unit.cell, size_y)
+                        xdist = abs(x - t_x)
+                        ydist = abs(y - t_y)
+                        dist = max(min(xdist, size_x - xdist), min(ydist, size_y - ydist))
+                        if best is None or dist < best:
+                            best = dist
+        return best
@@ -0,0 +1,122 @@
+import unittest
+import os
+import logging
+import tempfile
+import game
+import batch_engine
+from custom_logger_levels import LoggerLevels
+
+
+def game_state(test_game):
+    # Return the state of all units of a game, in the same form as BatchEngine.board_state
+    return {unit.id: (t_player.id, list(unit.loc), unit.hp)
+            for t_player in test_game.players.values() for unit in t_player.units}
+
+
+@unittest.skipUnless(batch_engine.np is not None, "numpy is not installed")
+class TestBatchEngine(unittest.TestCase):
+    # Class for unit testing the batch engine. Games of the batch are cross-checked against regular games with the same
+    # seeds, which must be played exactly alike
+    def setUp(self):
+        logging.disable(logging.CRITICAL)  # Disable logging
+        self.paths = ["strategies/test1.txt", "strategies/test2.txt"]
+        # This strategy uses every info command and most critical actions, including info commands after an action
+        self.all_commands_path = "unit_test_files/unit_test_strategy_3.txt"
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)  # Enable logging again for the tests which follow
+
+    def check_against_game(self, paths, seeds, script_mode="vector", **game_kwargs):
+        engine = batch_engine.BatchEngine(paths, len(seeds), seeds=seeds, script_mode=script_mode, **game_kwargs)
+        winners = engine.run()
+        for game_idx, seed in enumerate(seeds):
+            test_game = game.Game(paths, log_level=LoggerLevels.Quiet, seed=seed, **game_kwargs)
+            self.assertEqual(winners[game_idx], test_game.start_game())
+            self.assertEqual(engine.turn_number[game_idx], test_game.turn_handler.turn_number)
+            self.assertEqual(engine.board_state(game_idx), game_state(test_game))
+
+    def test_same_as_game(self):
+        self.check_against_game(self.paths, list(range(8)), turn_limit=1000)
+
+    def test_same_as_game_all_commands(self):
+        # Three players on a small crowded board, so that units often fight, block, charge and die
+        self.check_against_game([self.paths[0], self.all_commands_path, self.paths[1]], list(range(8)),
+                                turn_limit=1000, board_size=[12, 9], unit_limit_pct=0.2)
+
+    def test_same_as_game_scalar(self):
+        self.check_against_game([self.paths[0], self.all_commands_path, self.paths[1]], list(range(4)),
+                                script_mode="scalar", turn_limit=500, board_size=[12, 9], unit_limit_pct=0.2)
+
+    def test_same_as_game_early_exit(self):
+        for script_mode in batch_engine.BatchEngine.script_modes:
+            self.check_against_game([self.paths[0], self.all_commands_path, self.paths[1]], list(range(4)),
+                                    script_mode=script_mode, turn_limit=500, board_size=[12, 9], unit_limit_pct=0.2,
+                                    early_exit=True)
+
+    def test_many_players(self):
+        # Player ids above 127 fit in the board and unit arrays
+        paths = [self.paths[i % 2] for i in range(200)]
+        self.check_against_game(paths, [0, 1], turn_limit=400, board_size=[40, 40], unit_limit_pct=0.02)
+        with self.assertRaises(Exception):
+            batch_engine.BatchEngine([self.paths[0]] * (batch_engine.BatchEngine.max_players + 1), 1)
+
+    def test_scalar_fallback(self):
+        # Scripts which cannot be vectorized are executed game by game, next to the vectorized ones
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "strategy.txt")
+            with open(path, "w") as output_file:
+                output_file.write("prnt(num_adjacent_enemies()) if(gt(num_adjacent_enemies(), 0), attack()) move()")
+            engine = batch_engine.BatchEngine([path, self.paths[0]], 1, seeds=[0])
+            self.assertIsNone(engine.programs[1])
+            self.assertIsNotNone(engine.programs[2])
+            self.check_against_game([path, self.paths[0]], list(range(4)), turn_limit=500, board_size=[10, 10])
+
+    def test_turn_order(self):
+        # New units act just before the unit which spawned them, as in TurnHandler. The initial units act in order of
+        # their players
+        engine = batch_engine.BatchEngine(self.paths, 1, seeds=[0])
+        first, second = engine.current[0], engine.next_slot[0, engine.current[0]]
+        self.assertEqual(engine.unit_id[0, first], 1)
+        self.assertEqual(engine.unit_id[0, second], 2)
+        engine.spawn_unit(0, 1, 0)
+        new_slot = engine.prev_slot[0, first]
+        self.assertEqual(engine.unit_id[0, new_slot], 3)
+        self.assertEqual(engine.next_slot[0, second], new_slot)
+        engine.despawn_unit(0, second)
+        self.assertEqual(engine.next_slot[0, first], new_slot)
+
+    def test_numpy_rng(self):
+        # Games are reproducible from their seeds, and every game follows the rules until it ends
+        engine1 = batch_engine.BatchEngine(self.paths, 20, seeds=list(range(20)), rng_mode="numpy", turn_limit=500)
+        engine2 = batch_engine.BatchEngine(self.paths, 20, seeds=list(range(20)), rng_mode="numpy", turn_limit=500)
+        self.assertEqual(engine1.run(), engine2.run())
+        self.assertTrue(engine1.ended.all())
+        for game_idx in range(20):
+            num_units = engine1.player_units[game_idx, 1:]
+            self.assertTrue((num_units <= engine1.unit_limit).all())
+            self.assertEqual(engine1.alive[game_idx].sum(), num_units.sum())
+
+    def test_info_commands(self):
+        # Info commands computed for all games at once must match the board queries of a regular game
+        test_game = game.Game(self.paths, log_level=LoggerLevels.Quiet, seed=3, turn_limit=200)
+        test_game.start_game()
+        engine = batch_engine.BatchEngine(self.paths, 1, seeds=[3], turn_limit=200)
+        engine.run()
+        units = {t_unit.id: t_unit for t_player in test_game.players.values() for t_unit in t_player.units}
+        for slot in range(engine.num_slots):
+            if not engine.alive[0, slot]:
+                continue
+            t_unit = units[engine.unit_id[0, slot]]
+            games, slots = batch_engine.np.array([0]), batch_engine.np.array([slot])
+            self.assertEqual(engine.compute_info("num_adjacent_allies", games, slots)[0],
+                             test_game.board.num_allies_around_unit(t_unit))
+            self.assertEqual(engine.compute_info("num_adjacent_enemies", games, slots)[0],
+                             test_game.board.num_enemies_around_unit(t_unit))
+            self.assertEqual(engine.compute_info("distance_from_closest_ally", games, slots)[0],
+                             test_game.board.distance_from_closest_ally(t_unit))
+            self.assertEqual(engine.compute_info("distance_from_closest_enemy", games, slots)[0],
+                             test_game.board.distance_from_closest_enemy(t_unit))
+
+
+if __name__ == '__main__':
+    unittest.main()
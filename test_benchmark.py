@@ -0,0 +1,43 @@
+import unittest
+import json
+import logging
+import board
+import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    # Class for unit testing the benchmark harness. The benchmarks are run at a tiny scale, only to check that they
+    # work and that their results can be written as JSON
+    def setUp(self):
+        logging.disable(logging.CRITICAL)  # Disable logging
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)  # Enable logging again for the tests which follow
+
+    def test_run_benchmarks(self):
+        names = ["interpreter_analyze", "script_execution", "game_throughput"]
+        results = benchmark.run_benchmarks(names, scale=0.01)
+        self.assertEqual(list(results["results"]), names)
+        self.assertEqual(json.loads(json.dumps(results)), results)
+        self.assertGreater(results["results"]["game_throughput"]["tree"]["turns"], 0)
+
+    def test_board_queries(self):
+        level = board.logger.level
+        results = benchmark.bench_board_queries(0.01, sizes=(20,), densities=(0.1,))
+        self.assertEqual(results["20x20_0.1"]["units"], 40)
+        self.assertGreater(results["20x20_0.1"]["num_enemies_around_unit"]["calls_per_second"], 0)
+        self.assertEqual(board.logger.level, level)  # The board logger is only silenced while the boards are filled
+
+    def test_large_arena(self):
+        results = benchmark.bench_large_arena(0.01, units_per_player=10)
+        self.assertEqual(results["units"], 50)
+        self.assertLess(results["bytes_per_tile"], 100)
+        self.assertGreater(results["turns"], 0)
+
+    def test_unknown_benchmark(self):
+        with self.assertRaises(Exception):
+            benchmark.run_benchmarks(["no_such_benchmark"])
+
+
+if __name__ == '__main__':
+    unittest.main()
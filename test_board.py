@@ -1,4 +1,5 @@
 import unittest
+import random
 import board
 import turn_handler
 import player
@@ -20,6 +21,11 @@ def check_adjacent(loc1, loc2, board_size):
     return x_dist_okay and y_dist_okay and comb_dist_okay
 
 
+def count_adjacent_locs(test_board, loc, f_bool):
+    # Count the adjacent locations that satisfy a boolean function, checking every adjacent location one by one
+    return len([adjacent_loc for adjacent_loc in test_board.get_all_adjacent_locs(loc) if f_bool(adjacent_loc)])
+
+
 class TestBoard(unittest.TestCase):
     # Class for unit testing the board object
     def setUp(self):
@@ -35,6 +41,15 @@ class TestBoard(unittest.TestCase):
         with self.assertRaises(Exception):
             board.Board(self.turn_handler, {}, [20, 20], 1.2)
 
+    def test_rng(self):
+        # All randomness of the board goes through its generator, so boards with identically seeded generators make
+        # the same choices
+        board1 = board.Board(self.turn_handler, self.players, [20, 20], 0.5, random.Random(3))
+        board2 = board.Board(self.turn_handler, self.players, [20, 20], 0.5, random.Random(3))
+        self.assertEqual([board1.get_random_location() for _ in range(10)],
+                         [board2.get_random_location() for _ in range(10)])
+        self.assertEqual(board1.get_free_adjacent_loc([5, 5]), board2.get_free_adjacent_loc([5, 5]))
+
     def test_spawn(self):
         # Test that spawning a unit adds it to board
         test_board = board.Board(self.turn_handler, self.players, [20, 20], 0.5)
@@ -93,7 +108,7 @@ class TestBoard(unittest.TestCase):
         test_board.spawn_unit(self.players[0], [0, 0])
         unit1 = self.players[0].units.pop()
         test_board.move_unit(unit1, [3, 3])
-        self.assertTrue(unit1.loc == [3, 3])
+        self.assertTrue(unit1.loc == (3, 3))
         self.assertTrue(test_board.board_matrix[[3, 3]] == unit1)
 
     def test_move_to_adjacent_loc(self):
@@ -148,6 +163,25 @@ class TestBoard(unittest.TestCase):
         test_board.spawn_unit(self.players[1], [7, 0])
         self.assertEqual(test_board.distance_from_closest_enemy(unit1), 5)
 
+    def test_query_cache(self):
+        # Repeated queries are answered from the cache, which is cleared whenever units are spawned, moved or removed
+        test_board = board.Board(self.turn_handler, self.players, [20, 20], 0.01)
+        test_board.spawn_unit(self.players[0], [0, 0])
+        unit1 = next(iter(self.players[0].units))
+        test_board.spawn_unit(self.players[1], [5, 5])
+        enemy = next(iter(self.players[1].units))
+        self.assertEqual(test_board.distance_from_closest_enemy(unit1), 5)
+        self.assertEqual(test_board.distance_from_closest_enemy(unit1), 5)
+        self.assertEqual(test_board.distance_from_closest_ally(unit1), 40)
+        self.assertEqual(len(test_board.query_cache), 2)
+        test_board.move_unit(enemy, [3, 1])
+        self.assertEqual(len(test_board.query_cache), 0)
+        self.assertEqual(test_board.distance_from_closest_enemy(unit1), 3)
+        test_board.spawn_unit(self.players[2], [1, 1])
+        self.assertEqual(test_board.distance_from_closest_enemy(unit1), 1)
+        test_board.despawn_unit(test_board.get_unit_in_loc([1, 1]))
+        self.assertEqual(test_board.distance_from_closest_enemy(unit1), 3)
+
     def test_attack_adjacent_enemy(self):
         # First spawn a unit and have it attack, and check that this fails.
         # Then spawn an adjacent enemy and check that it works, and that the unit took damage
@@ -218,41 +252,77 @@ class TestBoard(unittest.TestCase):
         unit2 = self.players[1].units.pop()
         self.assertEqual(test_board.get_adjacent_enemy_unit(unit1), unit2)
 
-    def test_get_adjacent_locs(self):
-        # Test method that returns all adjacent locs that satisfy some boolean function
-        # For this test we'll use the condition (x_loc + y_loc) mod 2 == 0
-        test_board = board.Board(self.turn_handler, self.players, [20, 20], 0.01)
-        test_loc = [5, 5]
-        expected_locs = sorted([[4, 4], [4, 6], [6, 4], [6, 6]])
-
-        def loc_is_even(loc):
-            return (loc[0] + loc[1]) % 2 == 0
-        res = sorted(test_board.get_adjacent_locs(test_loc, loc_is_even))
-        self.assertEqual(expected_locs, res)
-
-    def test_get_all_enemies(self):
-        # Spawn some enemies and make sure we get the right answer
+    def test_get_adjacent_enemy_unit_ignores_allies(self):
+        # An adjacent ally must never be returned as an enemy
         test_board = board.Board(self.turn_handler, self.players, [20, 20], 0.01)
         test_board.spawn_unit(self.players[0], [0, 0])
-        unit = self.players[0].units.pop()
-        test_board.spawn_unit(self.players[1], [1, 0])
-        test_board.spawn_unit(self.players[1], [1, 1])
-        test_board.spawn_unit(self.players[2], [0, 1])
-        test_board.spawn_unit(self.players[2], [3, 2])
-        test_board.spawn_unit(self.players[2], [10, 17])
-        self.assertEqual(set(test_board.get_all_enemies(unit)), self.players[1].units | self.players[2].units)
-
-    def test_get_all_allies(self):
-        # Spawn a unit, remove it from the play, spawn some ally units and check that they are returned by the method
-        test_board = board.Board(self.turn_handler, self.players, [20, 20], 0.01)
-        test_board.spawn_unit(self.players[0], [0, 0])
-        unit = self.players[0].units.pop()
+        unit1 = self.players[0].units.pop()
         test_board.spawn_unit(self.players[0], [1, 0])
-        test_board.spawn_unit(self.players[0], [1, 1])
-        test_board.spawn_unit(self.players[0], [0, 1])
-        test_board.spawn_unit(self.players[0], [3, 2])
-        test_board.spawn_unit(self.players[0], [10, 17])
-        self.assertEqual(set(test_board.get_all_allies(unit)), self.players[0].units)
+        for _ in range(20):
+            self.assertIsNone(test_board.get_adjacent_enemy_unit(unit1))
+        self.assertEqual(test_board.num_enemies_around_unit(unit1), 0)
+        self.assertEqual(test_board.num_allies_around_unit(unit1), 1)
+
+    def test_neighbour_counts(self):
+        # After many random spawns, moves and despawns, the maintained neighbour counts of every cell must match a
+        # count over its adjacent locations, and the unit counts must match the units of the players
+        test_board = board.Board(self.turn_handler, self.players, [7, 9], 1)
+        rng = random.Random(3)
+        units = []
+        for _ in range(500):
+            action = rng.random()
+            if action < 0.4:
+                loc = test_board.get_random_location()
+                if test_board.is_free(loc):
+                    test_board.spawn_unit(self.players[rng.randrange(3)], loc)
+                    units.append(test_board.get_unit_in_loc(loc))
+            elif action < 0.8 and units:
+                test_board.move_to_adjacent_loc(rng.choice(units))
+            elif units:
+                test_board.despawn_unit(units.pop(rng.randrange(len(units))))
+        for x in range(7):
+            for y in range(9):
+                self.assertEqual(test_board.num_free_tiles_around_loc([x, y]),
+                                 count_adjacent_locs(test_board, [x, y], test_board.is_free))
+        for unit in units:
+            self.assertEqual(test_board.num_allies_around_unit(unit),
+                             count_adjacent_locs(test_board, unit.loc,
+                                                 lambda loc: test_board.is_ally(loc, unit.player)))
+            self.assertEqual(test_board.num_enemies_around_unit(unit),
+                             count_adjacent_locs(test_board, unit.loc,
+                                                 lambda loc: test_board.is_enemy(loc, unit.player)))
+        # The unit counts kept by the board must match the units of the players
+        self.assertEqual(test_board.num_live_units, len(units))
+        for t_player in self.players.values():
+            self.assertEqual(test_board.num_total_enemies(t_player), len(units) - t_player.num_units())
+
+    def test_neighbour_table(self):
+        # The precomputed neighbours of every cell must match the adjacent locations, and the table must be shared by
+        # all boards of the same size
+        test_board = board.Board(self.turn_handler, self.players, [4, 6], 0.1)
+        matrix = test_board.board_matrix
+        for x in range(4):
+            for y in range(6):
+                neighbours = [matrix.cell_loc(idx) for idx in test_board.neighbours[matrix.cell_index([x, y])]]
+                self.assertEqual(len(neighbours), 8)
+                for loc in neighbours:
+                    self.assertTrue(check_adjacent([x, y], loc, [4, 6]))
+        other_board = board.Board(self.turn_handler, self.players, [4, 6], 0.1)
+        self.assertIs(test_board.neighbours, other_board.neighbours)
+
+    def test_compact_board(self):
+        # A compact board computes the neighbours of cells in the same order as the neighbour table, so it makes the
+        # same random choices as a regular board
+        table = board.neighbour_table([5, 7])
+        computed = board.ComputedNeighbours([5, 7])
+        self.assertEqual([computed[idx] for idx in range(len(computed))], table)
+        boards = [board.Board(turn_handler.TurnHandler(), self.players, [5, 7], 1, random.Random(2), compact)
+                  for compact in (False, True)]
+        for test_board in boards:
+            test_board.spawn_unit(self.players[0], [0, 0])
+            test_board.spawn_unit(self.players[1], [4, 6])
+        self.assertEqual(boards[0].get_free_adjacent_loc([0, 0]), boards[1].get_free_adjacent_loc([0, 0]))
+        self.assertEqual(boards[0].num_free_tiles_around_loc([4, 0]), boards[1].num_free_tiles_around_loc([4, 0]))
 
     def test_distance_between_units(self):
         # Test some different cases of distances
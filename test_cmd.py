@@ -26,6 +26,34 @@ class TestCmd(unittest.TestCase):
         with self.assertRaises(Exception):
             cmd.CommandsInspector.verify_commands(test_cmd, "add", [1])
 
+    def test_registry(self):
+        # Every public method of the commands class is in its registry, with its number of arguments and whether it is
+        # critical and pure. Other attributes of the commands object are not commands
+        registry = cmd.Commands.registry
+        self.assertEqual(registry["charge_attack"][:4], ("charge_attack", 1, True, False))
+        self.assertEqual(registry["add"][:4], ("add", 2, False, True))
+        self.assertEqual(registry["add"].construct, False)
+        # Language constructs are evaluated by the interpreter, and have no function
+        self.assertEqual(registry["if_else"][:5], ("if_else", 3, False, False, True))
+        self.assertEqual(registry["define"][:5], ("define", 2, False, False, True))
+        self.assertIsNone(registry["define"].function)
+        self.assertEqual(registry["get_unit_limit"][:4], ("get_unit_limit", 0, False, True))
+        test_board = board.Board(self.turn_handler, self.players, [20, 20], 0.05)
+        test_cmd = cmd.Commands(test_board, self.turn_handler)
+        for name in ["board", "registry", "__init__", "turn_handler_interface", "bound_functions"]:
+            with self.assertRaises(Exception):
+                cmd.CommandsInspector.verify_commands(test_cmd, name, [])
+        self.assertEqual(cmd.CommandsInspector.bound_commands(test_cmd)["mul"](3, 4), 12)
+        self.assertNotIn("if_else", cmd.CommandsInspector.bound_commands(test_cmd))
+        self.assertEqual(cmd.CommandsInspector.constant_values(test_cmd), {"get_unit_limit": 20})
+
+        # Subclasses get a registry of their own
+        class TestCommands(cmd.Commands):
+            def double(self, a):
+                return 2 * a
+        self.assertEqual(TestCommands.registry["double"].arity, 1)
+        self.assertNotIn("double", cmd.Commands.registry)
+
     def test_critical_action(self):
         # Test that critical actions cannot be performed more than once per turn
         test_board = board.Board(self.turn_handler, self.players, [20, 20], 0.05)
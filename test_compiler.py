@@ -0,0 +1,120 @@
+import unittest
+import cmd
+import player
+import board
+import turn_handler
+import interpreter
+import game_testing
+
+
+class TestCompiler(unittest.TestCase):
+    # Class for unit testing the script compiler. Since the compiled scripts must behave exactly like the scripts
+    # analyzed by the tree-walking interpreter, most tests run the same script in both modes and compare the results
+    def setUp(self):
+        self.turn_handler = turn_handler.TurnHandler()
+        self.players = {0: player.Player(0, None), 1: player.Player(1, None), 2: player.Player(2, None)}
+        self.board = board.Board(self.turn_handler, self.players, [20, 20], 0.01)
+        self.cmd = cmd.Commands(self.board, self.turn_handler)
+        self.tree_interpreter = interpreter.Interpreter(self.cmd)
+        self.compiled_interpreter = interpreter.Interpreter(self.cmd, "compiled")
+
+        self.board.spawn_unit(self.players[0], [0, 0])
+        self.unit = self.players[0].units.pop()
+        self.tree_interpreter.set_context(self.unit.var_data)
+        self.compiled_interpreter.set_context(self.unit.var_data)
+
+    def assert_same_result(self, script):
+        # Run the script in both modes (starting from the same variables) and compare the return values
+        self.unit.var_data.clear()
+        expected = self.tree_interpreter.analyze(script)()
+        self.unit.var_data.clear()
+        self.assertEqual(self.compiled_interpreter.analyze(script)(), expected)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(Exception):
+            interpreter.Interpreter(self.cmd, "nonexistent_mode")
+
+    def test_primitives(self):
+        self.assert_same_result("-3")
+        self.assert_same_result("2.5")
+        self.assert_same_result("test")
+        self.assert_same_result("add(3, 2)")
+        self.assert_same_result("div(add(3, 2), mul(2, 4))")
+
+    def test_define(self):
+        # Test that defined symbols are resolved, persist between calls and that the value of a sequence is the value
+        # of its last statement
+        self.assert_same_result("define(x, 2) add(x, 6)")
+        self.assert_same_result("define(x, 2) define(y, mul(x, x)) sub(y, x)")
+        self.assert_same_result("define(x, add(define(y, 3) y, 1)) x")
+        script = self.compiled_interpreter.analyze("define(z, 4)")
+        script()
+        self.assertEqual(self.compiled_interpreter.analyze("mul(z, z)")(), 16)
+
+    def test_if_else(self):
+        self.assert_same_result("if(gt(1, 3), add(1, 1))")
+        self.assert_same_result("if(lt(1, 3), add(1, 1))")
+        self.assert_same_result("if_else(eq(2, 2), 5, 7)")
+        self.assert_same_result("if_else(eq(2, 3), 5, define(x, 1) add(x, 1))")
+        self.assert_same_result("define(x, 7) define(y, 8) if_else(0, x, y)")
+        self.assert_same_result("define(x, 7) define(y, 8) add(if_else(1, x, y), 1)")
+        self.assert_same_result("and(gt(3, 1), or(0, eq(1, 1)))")
+        self.assert_same_result("neg(and(1, 0))")
+
+    def test_only_chosen_branch_is_executed(self):
+        # The branch that is not chosen must not be executed; here it would raise a division by 0 exception
+        self.assertEqual(self.compiled_interpreter.analyze("if_else(1, 4, div(1, 0))")(), 4)
+        with self.assertRaises(Exception):
+            self.compiled_interpreter.analyze("if_else(0, 4, div(1, 0))")()
+
+    def test_short_circuit(self):
+        # The second argument of and/or is only evaluated if the first one does not decide the result
+        self.assert_same_result("define(x, 2) and(x, 3)")
+        self.assert_same_result("define(x, 0) or(x, if(1, x))")
+        self.assert_same_result("or(1, div(1, 0))")
+        self.assert_same_result("and(0, div(1, 0))")
+        self.assert_same_result("and(1, define(y, 3)) or(0, y)")
+        with self.assertRaises(Exception):
+            self.compiled_interpreter.analyze("and(1, div(1, 0))")()
+
+    def test_early_exit(self):
+        # With early exit, nothing is executed after a critical action has been performed, in either mode
+        for mode in interpreter.Interpreter.modes:
+            self.unit.performed_critical_action = False
+            self.unit.var_data.clear()
+            test_interpreter = interpreter.Interpreter(self.cmd, mode, early_exit=True)
+            test_interpreter.set_context(self.unit.var_data)
+            self.assertTrue(test_interpreter.analyze("define(x, 1) if(x, fortify() define(y, 2)) define(z, 3)")())
+            self.assertEqual(test_interpreter.defined_symbols(self.unit.var_data), {"x": 1})
+            # Critical actions which are not performed do not stop the script
+            self.assertEqual(test_interpreter.analyze("move() define(z, 3) add(z, 0)")(), 3)
+
+    def test_undefined_symbol(self):
+        with self.assertRaises(Exception):
+            self.compiled_interpreter.analyze("add(undefined, 1)")()
+
+    def test_syntax_errors(self):
+        with self.assertRaises(Exception):  # Space between command and arguments
+            self.compiled_interpreter.analyze("mul (2, 8)")
+        with self.assertRaises(Exception):  # Missing parentheses
+            self.compiled_interpreter.analyze("mul(2, 8")
+        with self.assertRaises(Exception):  # Wrong number of arguments
+            self.compiled_interpreter.analyze("add(5, 1, 8)")
+        with self.assertRaises(Exception):  # Unknown command
+            self.compiled_interpreter.analyze("nonexistent_command()")
+
+    def test_critical_action(self):
+        # Only the first critical action in a turn is performed
+        self.assertTrue(self.compiled_interpreter.analyze("move()")())
+        self.assertFalse(self.compiled_interpreter.analyze("move()")())
+        self.assertFalse(self.compiled_interpreter.analyze("fortify() wait()")())
+
+    def test_game_equivalence(self):
+        # A full game played with the same seed must end the same way in both modes
+        results = [game_testing.play_seeded_game(1234, turn_limit=2000, interpreter_mode=mode)[0]
+                   for mode in interpreter.Interpreter.modes]
+        self.assertEqual(results[0], results[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import os
+import logging
+import tempfile
+import game
+import event_log
+
+
+def board_state(test_game):
+    # Return the state of all units on the board of a game, in the same form as replay_state below
+    return {unit.id: (t_player.id, list(unit.loc), unit.hp)
+            for t_player in test_game.players.values() for unit in t_player.units}
+
+
+def replay_state(replay_board):
+    return {unit.id: (unit.player_id, unit.loc, unit.hp) for unit in replay_board.units.values()}
+
+
+class TestEventLog(unittest.TestCase):
+    # Class for unit testing the binary event log
+    def setUp(self):
+        logging.disable(logging.CRITICAL)  # Disable logging
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "game.events")
+        self.paths = ["strategies/test1.txt", "strategies/test2.txt"]
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)  # Enable logging again for the tests which follow
+        self.temp_dir.cleanup()
+
+    def test_write_and_read(self):
+        # Events must be read back exactly as they were written, as fixed-size records
+        with event_log.EventWriter(self.path, [5, 7]) as writer:
+            writer.write(event_log.EventTypes.Spawn, 1, 2, 3, 4, 5)
+            writer.write(event_log.EventTypes.Damage, 1, 2, -1)
+        self.assertEqual(os.path.getsize(self.path),
+                         event_log.header_struct.size + 2 * event_log.record_struct.size)
+        reader = event_log.EventReader(self.path)
+        self.assertEqual(reader.board_size, [5, 7])
+        self.assertEqual(list(reader), [(event_log.EventTypes.Spawn, 1, 2, 3, 4, 5),
+                                        (event_log.EventTypes.Damage, 1, 2, -1, 0, 0)])
+
+    def test_float_charge(self):
+        # Scripts may charge for a number of turns which is not an integer, and the optimizer folds div(4, 2) to 2.0
+        script_path = os.path.join(self.temp_dir.name, "charge.txt")
+        with open(script_path, "w") as script_file:
+            script_file.write("if_else(gt(num_adjacent_enemies(), 0), charge_attack(div(4, 2)), move())")
+        test_game = game.Game([script_path, self.paths[1]], turn_limit=300, event_log_path=self.path, seed=3)
+        test_game.start_game()
+        reader = event_log.EventReader(self.path)
+        charges = [event.a for event in reader if event.type == event_log.EventTypes.Charge]
+        self.assertIn(2.0, charges)
+        self.assertEqual(replay_state(reader.board_at()), board_state(test_game))
+        # Charges are stored as floats, and read back exactly
+        with event_log.EventWriter(self.path, [5, 7]) as writer:
+            writer.write(event_log.EventTypes.Spawn, 1, 0, 2, 3, 4)
+            writer.charge(event_log.ReplayUnit(1, 0, [2, 3], 4), 2.5)
+            writer.write(event_log.EventTypes.Move, 1, 3, 3)
+        reader = event_log.EventReader(self.path)
+        self.assertEqual(list(reader), [(event_log.EventTypes.Spawn, 1, 0, 2, 3, 4),
+                                        (event_log.EventTypes.Charge, 1, 2.5, 0, 0, 0),
+                                        (event_log.EventTypes.Move, 1, 3, 3, 0, 0)])
+        self.assertEqual(replay_state(reader.board_at()), {1: (0, [3, 3], 4)})
+
+    def test_not_an_event_log(self):
+        with open(self.path, "wb") as output_file:
+            output_file.write(b"not an event log")
+        with self.assertRaises(Exception):
+            event_log.EventReader(self.path)
+
+    def test_replay_final_board(self):
+        # The board reconstructed from the log of a full game must be identical to the board at the end of the game
+        test_game = game.Game(self.paths, turn_limit=1000, event_log_path=self.path, seed=42)
+        test_game.start_game()
+        replay_board = event_log.EventReader(self.path).board_at()
+        self.assertEqual(replay_state(replay_board), board_state(test_game))
+        self.assertEqual(replay_board.turn_number, test_game.turn_handler.turn_number)
+
+    def test_replay_intermediate_board(self):
+        # The board reconstructed at some turn must be identical to the board of the same game stopped at that turn
+        test_game = game.Game(self.paths, turn_limit=1000, event_log_path=self.path, seed=7)
+        test_game.start_game()
+        short_game = game.Game(self.paths, turn_limit=300, seed=7)
+        short_game.start_game()
+        replay_board = event_log.EventReader(self.path).board_at(300)
+        self.assertEqual(replay_state(replay_board), board_state(short_game))
+        matrix = replay_board.matrix()
+        for unit_id, (player_id, loc, hp) in replay_state(replay_board).items():
+            self.assertEqual(matrix[loc[0]][loc[1]], unit_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
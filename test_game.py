@@ -1,7 +1,11 @@
 import game
+import game_testing
 import unittest
 import player
+import board
+import unit
 import logging
+from custom_logger_levels import LoggerLevels
 
 
 class TestBoard(unittest.TestCase):
@@ -10,6 +14,9 @@ class TestBoard(unittest.TestCase):
         logging.disable(logging.CRITICAL)  # Disable logging
         self.paths = ["unit_test_files//unit_test_strategy_1.txt", "unit_test_files//unit_test_strategy_2.txt"]
 
+    def tearDown(self):
+        logging.disable(logging.NOTSET)  # Enable logging again for the tests which follow
+
     def test_init(self):
         # Game object should crash if called with less than 2 paths (players), or more players than the number of
         # tiles on the board.
@@ -32,38 +39,45 @@ class TestBoard(unittest.TestCase):
             for j in range(10):
                 self.assertFalse(test_game.board.is_free([i, j]))
 
+    def test_log_level(self):
+        # The loggers of all game modules must discard messages below the level of the game, so that they are never
+        # formatted
+        test_game = game.Game(self.paths, log_level=LoggerLevels.Quiet)
+        level = board.logger.level
+        with test_game.logger_levels():
+            self.assertEqual(board.logger.getEffectiveLevel(), LoggerLevels.Quiet)
+            self.assertEqual(unit.logger.getEffectiveLevel(), LoggerLevels.Quiet)
+            # The board must not even be rendered if it is not displayed
+            board_matrix, test_game.board.board_matrix = test_game.board.board_matrix, None
+            test_game.board.print_board()
+            test_game.board.board_matrix = board_matrix
+        # The level of a game does not leak into the games and tests which follow it
+        self.assertEqual(board.logger.level, level)
+        test_game.start_game()
+        self.assertEqual(board.logger.level, level)
+
     def test_turn(self):
         # Placeholder. At the moment turn() is made up entirely of calls which are tested elsewhere with no internal
         # logic, so nothing to test.
         pass
 
-    def test_remove_losing_players(self):
-        # Test that players with no remaining units are removed from self.players when this method is called
-        # First, try it with two players (minimum) and don't spawn units for them to begin with
+    def test_remove_eliminated_players(self):
+        # Players are removed as soon as their last unit is destroyed, and only then
         test_game = game.Game(self.paths, board_size=[10, 10])
         test_game.populate_players()
-        self.assertEqual(len(test_game.players), 2)
-        test_game.remove_losing_players()
-        self.assertEqual(len(test_game.players), 0)
-
-        # Repopulate players, add one unit to one of them. Only the other should be removed now.
-        test_game.populate_players()
-        self.assertEqual(len(test_game.players), 2)
-        test_game.board.spawn_unit(test_game.players[1], [0, 0])
-        player1 = test_game.players[1]
-        test_game.remove_losing_players()
-        self.assertEqual(test_game.players, {1: player1})
-
-        # For the last test, add units to both, call the function, then remove unit from one and check that it is
-        # removed
-        test_game.populate_players()
         test_game.spawn_initial_units()
         player1 = test_game.players[1]
-        test_game.remove_losing_players()
+        test_game.board.spawn_in_adjacent_location(player1, list(player1.units)[0].loc)
+        test_game.remove_eliminated_players()
+        self.assertEqual(len(test_game.players), 2)
+        list(player1.units)[0].kill()
+        test_game.remove_eliminated_players()
         self.assertEqual(len(test_game.players), 2)
         list(test_game.players[2].units)[0].kill()
-        test_game.remove_losing_players()
+        self.assertEqual(test_game.board.num_total_enemies(player1), 0)
+        test_game.remove_eliminated_players()
         self.assertEqual(test_game.players, {1: player1})
+        self.assertEqual(test_game.board.eliminated_players, [])
 
     def test_announce_winner(self):
         # Test the announce_winner method, which both announces and returns the number of the winning player
@@ -84,8 +98,32 @@ class TestBoard(unittest.TestCase):
         self.assertEqual(test_game.announce_winner(), [4, 6])
 
     def test_start_game(self):
-        # Placeholder. At the moment start_game() does not have enough internal logic to test.
-        pass
+        # Games with the same seed must be identical, down to the location and hp of every unit
+        results = [game_testing.play_seeded_game(5, turn_limit=1000)[0] for _ in range(2)]
+        self.assertEqual(results[0], results[1])
+
+    def test_turn_budget(self):
+        # With a budget of a single call per turn, every script exceeds the budget on every turn, and no unit ever
+        # acts. The trips are counted per player
+        test_game = game.Game(["strategies/test1.txt", "strategies/test2.txt"], turn_limit=50, seed=2,
+                              log_level=LoggerLevels.Quiet, node_budget=1)
+        test_game.start_game()
+        self.assertEqual(sum(trips["nodes"] for trips in test_game.budget_trips.values()), 50)
+        self.assertEqual(test_game.budget_trips[1]["nodes"], 25)
+        self.assertEqual(test_game.budget_trips[2]["time"], 0)
+        self.assertEqual(test_game.board.num_live_units, 2)
+        # Without a budget nothing is counted
+        test_game = game.Game(["strategies/test1.txt", "strategies/test2.txt"], turn_limit=50, seed=2,
+                              log_level=LoggerLevels.Quiet)
+        test_game.start_game()
+        self.assertEqual(test_game.budget_trips, {1: {"nodes": 0, "time": 0}, 2: {"nodes": 0, "time": 0}})
+
+    def test_large_arena(self):
+        # The compact board of the large arena mode must not change the course of a game
+        results = [game_testing.play_seeded_game(8, game_testing.strategy_paths * 3, board_size=[30, 25],
+                                                 turn_limit=1000, large_arena=large_arena)[0]
+                   for large_arena in (False, True)]
+        self.assertEqual(results[0], results[1])
 
 
 if __name__ == '__main__':
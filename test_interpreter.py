@@ -18,82 +18,15 @@ class TestInterpreter(unittest.TestCase):
         # The interpreter is mostly static so we can use one instance for all the tests
         self.interpreter = interpreter.Interpreter(self.cmd)
 
-    def test_is_number(self):
-        # Test is_number method
-        self.assertTrue(self.interpreter.is_number(5))
-        self.assertTrue(self.interpreter.is_number(-12.5))
-        self.assertTrue(self.interpreter.is_number('5'))
-        self.assertTrue(self.interpreter.is_number('-12.5'))
-        self.assertFalse(self.interpreter.is_number('-12d'))
-        self.assertFalse(self.interpreter.is_number('string'))
-
-    def test_parse(self):
-        # Test the parse method, which separates the input into different statements, except parts which are in
-        # one or  more levels of parentheses. All linebreaks or consecutive whitespaces are converted to one whitespace
-        test_input = "   test test2  \n  "
-        test_output = ["test", "test2"]
-        self.assertEqual(self.interpreter.parse(test_input), test_output)
-
-        test_input = "   test(test2 \ntest3)  "
-        test_output = ["test(test2 test3)"]
-        self.assertEqual(self.interpreter.parse(test_input), test_output)
-
-        test_input = "   test(test2)  test3"
-        test_output = ["test(test2)", "test3"]
-        self.assertEqual(self.interpreter.parse(test_input), test_output)
-
-        test_input = "   test((test2)  test3) test4(test5)"
-        test_output = ["test((test2) test3)", "test4(test5)"]
-        self.assertEqual(self.interpreter.parse(test_input), test_output)
-
-    def test_is_command(self):
-        # Test the is_command method
-        # A valid command is any string of the form string1(string2), where string 1 may not contain any spaces or
-        # linebreaks
-        self.assertTrue(self.interpreter.is_command("a(b)"))
-        self.assertTrue(self.interpreter.is_command("a2(b c)"))
-        self.assertFalse(self.interpreter.is_command("a (b c)"))
-        self.assertFalse(self.interpreter.is_command("a(b c) "))
-        self.assertFalse(self.interpreter.is_command("ab c)"))
-        self.assertFalse(self.interpreter.is_command("a(b c"))
-
     def test_get_number_value(self):
-        # This method gets a string representing a number (assume it has passed is_number), and must return the
-        # numeric value. It must return int if it is whole or float if it is not.
+        # This method gets a string representing a number, and must return the numeric value. It must return int if it
+        # is whole or float if it is not.
         self.assertEqual(self.interpreter.get_number_value("5"), 5)
         self.assertIsInstance(self.interpreter.get_number_value("5"), int)
         self.assertEqual(self.interpreter.get_number_value("-5.0"), -5)
         self.assertIsInstance(self.interpreter.get_number_value("-5.0"), int)
         self.assertAlmostEqual(self.interpreter.get_number_value("5.69"), 5.69)
 
-    def test_get_args(self):
-        # Test the get_args method, which extracts the arguments of an input command from the first level of parentheses
-        # Note that whitespaces and linebreaks are not ignored here. It can be assumed that the input is a
-        # "valid command" as defined in is_command
-
-        # Test base case
-        test_input = "dummy(1, 2, 3)"
-        test_output = ["1", " 2", " 3"]
-        self.assertEqual(self.interpreter.get_args(test_input), test_output)
-
-        # Test linebreak
-        test_input = "dummy(1, 2, \n 3)"
-        test_output = ["1", " 2", " \n 3"]
-        self.assertEqual(self.interpreter.get_args(test_input), test_output)
-
-        # Test that arguments in inner parentheses are not further decomposed
-        test_input = "dummy(1, (2, 3))"
-        test_output = ["1", " (2, 3)"]
-        self.assertEqual(self.interpreter.get_args(test_input), test_output)
-
-        # Test that an exception is raised if imbalanced parentheses are found
-        test_input = "dummy(1, 2), 3)"
-        with self.assertRaises(Exception):
-            self.interpreter.get_args(test_input)
-        test_input = "dummy(1, (2, 3)"
-        with self.assertRaises(Exception):
-            self.interpreter.get_args(test_input)
-
     def test_get_symbol_value(self):
         # Test the get_symbol_value method
         # This method looks at the current unit (as determined by the turn handler) and returns the value of the
@@ -106,13 +39,92 @@ class TestInterpreter(unittest.TestCase):
         self.interpreter.analyze("define(x, 5)")()
         self.assertEqual(self.interpreter.get_symbol_value("x"), 5)
 
+    def test_symbol_slots(self):
+        # Symbols are given slots when scripts are analyzed, and the variables of each unit hold one value per slot. A
+        # symbol a unit has not defined is undefined for that unit only, even if other units have defined it
+        self.board.spawn_unit(self.players[0], [0, 0])
+        unit1 = self.players[0].units.pop()
+        self.board.spawn_unit(self.players[0], [1, 1])
+        unit2 = self.players[0].units.pop()
+        for mode in interpreter.Interpreter.modes:
+            unit1.var_data.clear()
+            unit2.var_data.clear()
+            test_interpreter = interpreter.Interpreter(self.cmd, mode)
+            script = test_interpreter.analyze("define(x, 4) define(y, add(x, 1)) add(y, 0)")
+            self.assertEqual(test_interpreter.symbol_names, ["x", "y"])
+            test_interpreter.set_context(unit1.var_data)
+            self.assertEqual(script(), 5)
+            self.assertEqual(test_interpreter.defined_symbols(unit1.var_data), {"x": 4, "y": 5})
+            # A symbol whose name is computed at runtime is given a slot when it is first defined
+            test_interpreter.analyze("define(if_else(1, z, w), 2)")()
+            self.assertEqual(test_interpreter.get_symbol_value("z"), 2)
+            test_interpreter.set_context(unit2.var_data)
+            with self.assertRaisesRegex(Exception, "Undefined symbol x"):
+                test_interpreter.analyze("add(x, 1)")()
+            with self.assertRaisesRegex(Exception, "Undefined symbol z"):
+                test_interpreter.get_symbol_value("z")
+            self.assertEqual(test_interpreter.defined_symbols(unit2.var_data), {})
+
+    def test_analyzed_calls(self):
+        # Each call is analyzed into a function specialized on its arguments (constants, symbols or calls). Check every
+        # kind of argument in each position, unoptimized so that constant arguments are not folded away
+        self.board.spawn_unit(self.players[0], [0, 0])
+        unit = self.players[0].units.pop()
+        test_interpreter = interpreter.Interpreter(self.cmd, optimize=False)
+        test_interpreter.set_context(unit.var_data)
+        scripts = {"define(x, 6) neg(0)": True, "neg(x)": False, "neg(sub(x, 6))": True, "sub(10, x)": 4,
+                   "sub(x, 10)": -4, "sub(x, x)": 0, "sub(10, 3)": 7, "sub(mul(x, 2), if_else(1, x, y))": 6,
+                   "define(if_else(gt(x, 1), y, z), x) y": "y", "add(y, if_else(0, y, x))": 12,
+                   "and(x, or(0, y))": 6, "or(0, and(x, 0))": 0, "if(x, define(w, 1) 2 w)": "w"}
+        for script, value in scripts.items():
+            self.assertEqual(test_interpreter.analyze(script)(), value)
+        with self.assertRaisesRegex(Exception, "Undefined symbol z"):
+            test_interpreter.analyze("add(1, if_else(0, x, z))")()
+
+    def test_turn_budget(self):
+        # A script may evaluate at most node_budget calls per turn. A script exceeding the budget is stopped, and the
+        # unit forfeits the rest of its turn as with wait()
+        self.board.spawn_unit(self.players[0], [0, 0])
+        unit = self.players[0].units.pop()
+        for mode in interpreter.Interpreter.modes:
+            trips = []
+            test_interpreter = interpreter.Interpreter(self.cmd, mode, node_budget=5)
+            test_interpreter.on_budget_exceeded = trips.append
+            test_interpreter.set_context(unit.var_data)
+            # Five calls (the if_else, the gt and the three defines) are within the budget
+            unit.performed_critical_action = False
+            script = test_interpreter.analyze("define(a, 1) if(gt(a, 0), define(b, 2)) define(c, 3)")
+            self.assertTrue(script())
+            self.assertEqual(trips, [])
+            self.assertFalse(unit.performed_critical_action)
+            # The budget is reset on every execution
+            self.assertTrue(script())
+            # The sixth call is not evaluated
+            script = test_interpreter.analyze("define(a, 1) if(gt(a, 0), define(b, 2)) define(c, 3) define(d, 4)")
+            self.assertTrue(script())
+            self.assertEqual(trips, ["nodes"])
+            self.assertTrue(unit.performed_critical_action)
+            self.assertEqual(sorted(test_interpreter.defined_symbols(unit.var_data)), ["a", "b", "c"])
+            unit.var_data.clear()
+
+            # A time budget which has already run out stops the script at its first call
+            test_interpreter = interpreter.Interpreter(self.cmd, mode, time_budget=0)
+            test_interpreter.on_budget_exceeded = trips.append
+            test_interpreter.set_context(unit.var_data)
+            unit.performed_critical_action = False
+            test_interpreter.analyze("define(a, 1)")()
+            self.assertEqual(trips, ["nodes", "time"])
+            self.assertEqual(test_interpreter.defined_symbols(unit.var_data), {})
+            test_interpreter.time_budget = 10
+            test_interpreter.analyze("define(a, 1)")()
+            self.assertEqual(trips, ["nodes", "time"])
+
     def test_eval_and_exec_general(self):
         # The eval_and_exec_general method takes a command (string) and a list of arguments, which are in
         # delta function form, i.e. the argument "5" is given as a delta function delta: 5
         # It can be assumed that both the command and the number of arguments are valid as this is checked separately
-        # beforehand. Since the execute_command method which actually executes the command is tested separately
-        # in test_cmd, here we need only test that the reduction of lambda functions to numbers and symbols (and then
-        # symbols->numbers) is done correctly
+        # beforehand. Since the commands themselves are tested separately in test_cmd, here we need only test that the
+        # reduction of lambda functions to numbers and symbols (and then symbols->numbers) is done correctly
         self.board.spawn_unit(self.players[0], [0, 0])
         unit = self.players[0].units.pop()
         self.interpreter.set_context(unit.var_data)
@@ -159,6 +171,23 @@ class TestInterpreter(unittest.TestCase):
         test_args = [lambda: False, lambda: 5, self.interpreter.analyze("gt(8, -2)")]
         self.assertTrue(self.interpreter.eval_and_exec_if_else(test_args))
 
+    def test_eval_and_exec_short_circuit(self):
+        # As test_eval_and_exec_if_else, but for and/or: the first argument is reduced and resolved, and the second one
+        # is only evaluated if the first one does not decide the result
+        self.board.spawn_unit(self.players[0], [0, 0])
+        unit = self.players[0].units.pop()
+        self.interpreter.set_context(unit.var_data)
+        self.interpreter.analyze("define(x, 8)")()
+
+        test_args = [lambda: "x", lambda: 5]
+        self.assertEqual(self.interpreter.eval_and_exec_short_circuit("i_and", test_args), 5)
+        self.assertEqual(self.interpreter.eval_and_exec_short_circuit("i_or", test_args), 8)
+        # The second argument would raise a division by 0 exception if it was evaluated
+        test_args = [lambda: 0, self.interpreter.analyze("div(1, 0)")]
+        self.assertEqual(self.interpreter.eval_and_exec_short_circuit("i_and", test_args), 0)
+        with self.assertRaises(Exception):
+            self.interpreter.eval_and_exec_short_circuit("i_or", test_args)
+
     def test_analyze(self):
         # Test the analyze method, which takes a string as input and returns lambda functions that run the relevant
         # commands. Essentially this test checks that the syntax of the programming language used for the bots behaves
@@ -178,6 +207,8 @@ class TestInterpreter(unittest.TestCase):
         # Test for persistence (i.e. that defines are "remembered" between calls) and linebreak
         self.interpreter.analyze("define(y, -3) \n   define(z, -2)")()
         self.assertEqual(self.interpreter.analyze("mul(y, z)")(), 6)
+        # Test that numbers and symbols which are not the last statement of a sequence are analyzed on their own
+        self.assertEqual(self.interpreter.analyze("3 test add(1, 2)")(), 3)
         # Test that the false branch of an if statement returns 0
         self.assertEqual(self.interpreter.analyze("if(gt(1, 3), add(1, 1))")(), 0)
         # Test that wrong syntax raises an exception
@@ -0,0 +1,109 @@
+import unittest
+import cmd
+import player
+import board
+import turn_handler
+import interpreter
+import script_parser
+import game_testing
+
+
+class TestOptimizer(unittest.TestCase):
+    # Class for unit testing the script optimizer. Optimized scripts must behave exactly like the original ones, so
+    # besides checking the optimized trees, the tests run scripts with and without optimization and compare the results
+    def setUp(self):
+        self.turn_handler = turn_handler.TurnHandler()
+        self.players = {0: player.Player(0, None), 1: player.Player(1, None)}
+        self.board = board.Board(self.turn_handler, self.players, [20, 20], 0.01)
+        self.cmd = cmd.Commands(self.board, self.turn_handler)
+        self.interpreter = interpreter.Interpreter(self.cmd)
+        self.optimizer = self.interpreter.optimizer
+
+        self.board.spawn_unit(self.players[0], [0, 0])
+        self.unit = self.players[0].units.pop()
+
+    def optimize(self, script):
+        return repr(self.optimizer.optimize(script_parser.parse(script)))
+
+    def assert_same_result(self, script):
+        # Run the script with and without optimization in both interpreter modes, starting from the same variables
+        results = []
+        for mode in interpreter.Interpreter.modes:
+            for optimize in (False, True):
+                self.unit.var_data.clear()
+                test_interpreter = interpreter.Interpreter(self.cmd, mode, optimize)
+                test_interpreter.set_context(self.unit.var_data)
+                script_function = test_interpreter.analyze(script)
+                results.append((script_function(), test_interpreter.defined_symbols(self.unit.var_data)))
+        for result in results[1:]:
+            self.assertEqual(result, results[0])
+
+    def test_constant_folding(self):
+        self.assertEqual(self.optimize("add(2, mul(3, 4))"), "Sequence([Number(14)])")
+        self.assertEqual(self.optimize("and(gt(3, 1), or(0, eq(1, 1)))"), "Sequence([Number(True)])")
+        self.assertEqual(self.optimize("get_unit_limit()"), "Sequence([Number(4)])")
+        # Calls with arguments which are not constant are kept, with their constant arguments folded
+        self.assertEqual(self.optimize("add(x, sub(3, 1))"),
+                         "Sequence([Call(add, [Sequence([Symbol(x)]), Sequence([Number(2)])])])")
+        self.assertEqual(self.optimize("add(num_total_allies(), 1)"),
+                         "Sequence([Call(add, [Sequence([Call(num_total_allies, [])]), Sequence([Number(1)])])])")
+
+    def test_short_circuit_folding(self):
+        # and/or are folded if their first argument decides the result, in which case the second one is never evaluated
+        self.assertEqual(self.optimize("and(0, attack())"), "Sequence([Number(0)])")
+        self.assertEqual(self.optimize("or(gt(2, 1), attack())"), "Sequence([Number(True)])")
+        self.assertEqual(self.optimize("or(0, 5)"), "Sequence([Number(5)])")
+        self.assertEqual(self.optimize("and(1, attack())"),
+                         "Sequence([Call(i_and, [Sequence([Number(1)]), Sequence([Call(attack, [])])])])")
+        self.assertEqual(self.optimize("and(x, 0)"),
+                         "Sequence([Call(i_and, [Sequence([Symbol(x)]), Sequence([Number(0)])])])")
+
+    def test_errors_are_not_folded(self):
+        # A division by 0 must only raise an error when it is executed
+        self.assertEqual(self.optimize("div(1, 0)"),
+                         "Sequence([Call(div, [Sequence([Number(1)]), Sequence([Number(0)])])])")
+        with self.assertRaises(Exception):
+            self.interpreter.analyze("div(1, 0)")()
+        self.assertEqual(self.interpreter.analyze("if_else(1, 4, div(1, 0))")(), 4)
+
+    def test_dead_branches(self):
+        self.assertEqual(self.optimize("if(gt(1, 3), attack()) move()"), "Sequence([Call(move, [])])")
+        self.assertEqual(self.optimize("if_else(lt(1, 3), attack(), move())"), "Sequence([Call(attack, [])])")
+        # The statements of the predicate are kept, and numbers and symbols whose value is not used are removed
+        self.assertEqual(self.optimize("if_else(spawn() 0, x 1, y fortify()) 2 z wait()"),
+                         "Sequence([Call(spawn, []), Call(fortify, []), Call(wait, [])])")
+        # Invalid calls are rejected even in branches which are never executed
+        with self.assertRaises(Exception):
+            self.interpreter.analyze("if(0, nonexistent_command())")
+        with self.assertRaises(Exception):
+            self.interpreter.analyze("if(0, add(1, 2, 3))")
+
+    def test_double_negation(self):
+        # neg(neg(x)) is only replaced by x where the truth value is all that matters
+        self.assertEqual(self.optimize("if_else(neg(neg(x)), 1, 2)"),
+                         "Sequence([Call(if_else, [Sequence([Symbol(x)]), Sequence([Number(1)]), "
+                         "Sequence([Number(2)])])])")
+        self.assertEqual(self.optimize("neg(neg(neg(x)))"), "Sequence([Call(neg, [Sequence([Symbol(x)])])])")
+        self.assertEqual(self.optimize("neg(neg(x))"),
+                         "Sequence([Call(neg, [Sequence([Call(neg, [Sequence([Symbol(x)])])])])])")
+
+    def test_same_result(self):
+        self.assert_same_result("add(2, mul(3, 4))")
+        self.assert_same_result("define(x, 7) define(y, 8) add(if_else(1, x, y), 1)")
+        self.assert_same_result("define(x, 7) if_else(0, x, y)")
+        self.assert_same_result("define(x, 3) if_else(neg(neg(x)), define(y, 1), define(y, 2)) y")
+        self.assert_same_result("define(x, 0) neg(neg(neg(x)))")
+        self.assert_same_result("define(x, if(0, 5)) x")
+        self.assert_same_result("define(x, get_unit_limit()) if(gt(x, 3), define(y, x) 3 y)")
+        self.assert_same_result("neg(and(1, 0)) 5 test")
+        self.assert_same_result("define(x, 2) if(and(neg(neg(x)), or(0, x)), define(y, x)) y")
+
+    def test_game_equivalence(self):
+        # A full game played with the same seed must end the same way with and without optimization
+        results = [game_testing.play_seeded_game(99, turn_limit=2000, optimize=optimize)[0]
+                   for optimize in (False, True)]
+        self.assertEqual(results[0], results[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import logging
+import game
+import game_testing
+import profiler
+import tournament
+
+
+class TestProfiler(unittest.TestCase):
+    # Class for unit testing the profiler
+    def setUp(self):
+        logging.disable(logging.CRITICAL)  # Disable logging
+        self.paths = ["strategies/test1.txt", "strategies/test2.txt"]
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)  # Enable logging again for the tests which follow
+
+    def test_profiled_game(self):
+        # A profiled game is played exactly as an unprofiled one, and every turn is counted in every phase
+        for mode in ("tree", "compiled"):
+            outcome = game_testing.play_seeded_game(5, turn_limit=500, interpreter_mode=mode)[0]
+            profiled_outcome, test_game = game_testing.play_seeded_game(5, turn_limit=500, interpreter_mode=mode,
+                                                                        profile=True)
+            self.assertEqual(outcome, profiled_outcome)
+            self.assertIsNone(game.Game(self.paths).profiler)
+
+            profile = test_game.profiler.to_dict()
+            turns = test_game.turn_handler.turn_number
+            self.assertEqual(profile["turns"], turns)
+            self.assertEqual([phase for phase in profile["phases"]], list(profiler.phases))
+            for stats in profile["phases"].values():
+                self.assertEqual(stats["calls"], turns)
+            self.assertEqual(set(profile["scripts"]), set(self.paths))
+            self.assertEqual(sum(stats["calls"] for stats in profile["scripts"].values()), turns)
+            # Both strategies check the distance from the closest enemy on every turn
+            self.assertEqual(profile["commands"]["distance_from_closest_enemy"]["calls"], turns)
+            for label, script_stats in profile["scripts"].items():
+                self.assertLessEqual(sum(stats["seconds"] for stats in script_stats["commands"].values()),
+                                     script_stats["seconds"])
+
+    def test_folded_stacks(self):
+        test_profiler = profiler.Profiler()
+        test_profiler.add_phase("turn_start", 0.000002)
+        test_profiler.add_phase("script", 0.00001)
+        test_profiler.add_script("a;b", 0.00001)
+        test_profiler.current_script = "a;b"
+        test_profiler.wrap_command("add", lambda a, b: a + b)(1, 2)
+        test_profiler.commands["a;b", "add"].seconds = 0.000004
+        self.assertEqual(test_profiler.folded_stacks(),
+                         ["turn;turn_start 2", "turn;script;a:b;add 4", "turn;script;a:b 6"])
+
+    def test_merge(self):
+        # Merging the profiles of two games adds up their stats
+        test_game = game.Game(self.paths, turn_limit=100, seed=1, profile=True)
+        test_game.start_game()
+        profile = test_game.profiler.to_dict()
+        merged = profiler.Profiler()
+        merged.merge(profile)
+        merged.merge(profile)
+        merged_profile = merged.to_dict()
+        self.assertEqual(merged_profile["turns"], 2 * profile["turns"])
+        for name, stats in profile["commands"].items():
+            self.assertEqual(merged_profile["commands"][name]["calls"], 2 * stats["calls"])
+
+    def test_tournament(self):
+        # The profiles of all games of a tournament are added up
+        test_tournament = tournament.Tournament(self.paths, games_per_pairing=2, num_processes=1, turn_limit=100,
+                                                profile=True)
+        results = list(test_tournament.run())
+        self.assertEqual(test_tournament.profiler.turns, sum(result.num_turns for result in results))
+        self.assertIsNone(tournament.Tournament(self.paths).profiler)
+
+
+if __name__ == '__main__':
+    unittest.main()
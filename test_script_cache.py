@@ -0,0 +1,117 @@
+import os
+import json
+import unittest
+import logging
+import tempfile
+import cmd
+import board
+import player
+import turn_handler
+import interpreter
+import script_cache
+import script_parser
+
+
+class TestScriptCache(unittest.TestCase):
+    # Class for unit testing the cache of parsed scripts
+    def setUp(self):
+        logging.disable(logging.CRITICAL)  # Disable logging
+        self.players = {0: player.Player(0, None), 1: player.Player(1, None)}
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)  # Enable logging again for the tests which follow
+        self.cache_dir.cleanup()
+
+    def new_interpreter(self, cache, unit_limit_pct=0.01, optimize=True):
+        test_board = board.Board(turn_handler.TurnHandler(), self.players, [20, 20], unit_limit_pct)
+        return interpreter.Interpreter(cmd.Commands(test_board, turn_handler.TurnHandler()), optimize=optimize,
+                                       cache=cache)
+
+    def test_lru(self):
+        # The least recently used tree is evicted once the cache is full
+        cache = script_cache.ScriptCache(max_size=2)
+        cache.put("a", "tree a")
+        cache.put("b", "tree b")
+        self.assertEqual(cache.get("a"), "tree a")
+        cache.put("c", "tree c")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "tree a")
+        self.assertEqual(cache.get("c"), "tree c")
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_key(self):
+        # Keys depend on the content of the script and on the settings
+        key = script_cache.ScriptCache.key("move()", (True,))
+        self.assertEqual(key, script_cache.ScriptCache.key("move()", (True,)))
+        self.assertNotEqual(key, script_cache.ScriptCache.key("move() ", (True,)))
+        self.assertNotEqual(key, script_cache.ScriptCache.key("move()", (False,)))
+
+    def test_interpreter(self):
+        # A script is parsed once, and its tree shared by interpreters with the same settings. Trees are not shared
+        # between games with a different unit limit, since get_unit_limit() is folded into the tree
+        cache = script_cache.ScriptCache()
+        script = "if(gt(get_unit_limit(), 3), move())"
+        tree = self.new_interpreter(cache).parse_tree(script)
+        self.assertIs(self.new_interpreter(cache).parse_tree(script), tree)
+        self.assertIsNot(self.new_interpreter(cache, unit_limit_pct=0.05).parse_tree(script), tree)
+        self.assertIsNot(self.new_interpreter(cache, optimize=False).parse_tree(script), tree)
+        self.assertEqual(len(cache.trees), 3)
+        # Invalid scripts are rejected every time, and never cached
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                self.new_interpreter(cache).parse_tree("if(0, no_such_command())")
+        self.assertEqual(len(cache.trees), 3)
+
+    def test_disk_cache(self):
+        # Trees written to the cache directory are read by other caches using it
+        script = "define(x, add(1, 2)) if(gt(x, 2), move())"
+        tree = self.new_interpreter(script_cache.ScriptCache(cache_dir=self.cache_dir.name)).parse_tree(script)
+        self.assertEqual(len(os.listdir(self.cache_dir.name)), 1)
+        cache = script_cache.ScriptCache(cache_dir=self.cache_dir.name)
+        self.assertEqual(repr(self.new_interpreter(cache).parse_tree(script)), repr(tree))
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        # Unreadable files, and files which do not hold a syntax tree, are ignored, and the script is parsed again
+        for content in ["not a tree", '["call", "add", 5, 0, 0]', '["number", 1, 0, 0]']:
+            for name in os.listdir(self.cache_dir.name):
+                with open(os.path.join(self.cache_dir.name, name), 'w') as cache_file:
+                    cache_file.write(content)
+            cache = script_cache.ScriptCache(cache_dir=self.cache_dir.name)
+            self.assertEqual(repr(self.new_interpreter(cache).parse_tree(script)), repr(tree))
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_tree_data(self):
+        # Trees are written to disk as nested lists, which give back the same tree, down to the type of each number and
+        # the position of each node
+        tree = script_parser.parse("define(x, 1.5) if(x, move(), prnt(neg(2)))")
+        tree.statements.append(script_parser.Number(True, 3, 4))
+        data = script_cache.tree_to_data(tree)
+        copy = script_cache.tree_from_data(json.loads(json.dumps(data)))
+        self.assertEqual(repr(copy), repr(tree))
+        self.assertEqual(script_cache.tree_to_data(copy), data)
+        self.assertIs(copy.statements[-1].value, True)
+
+    def test_changed_commands(self):
+        # Trees cached on disk are not reused once a command changes, even by a commands class of the same name
+        class Commands(cmd.Commands):
+            def add(self, a, b, c):  # One more argument, so the cached script would no longer be valid
+                return a + b + c
+
+        script = "define(x, add(1, 2)) if(gt(x, 2), move())"
+        self.new_interpreter(script_cache.ScriptCache(cache_dir=self.cache_dir.name)).parse_tree(script)
+        cache = script_cache.ScriptCache(cache_dir=self.cache_dir.name)
+        test_board = board.Board(turn_handler.TurnHandler(), self.players, [20, 20], 0.01)
+        with self.assertRaises(Exception):
+            interpreter.Interpreter(Commands(test_board, turn_handler.TurnHandler()), cache=cache).parse_tree(script)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_get_cache(self):
+        # Interpreters using the same directory share a cache
+        self.assertIs(script_cache.get_cache(), script_cache.get_cache(None))
+        self.assertIs(script_cache.get_cache(self.cache_dir.name), script_cache.get_cache(self.cache_dir.name))
+        self.assertIsNot(script_cache.get_cache(), script_cache.get_cache(self.cache_dir.name))
+        del script_cache.caches[self.cache_dir.name]
+
+
+if __name__ == '__main__':
+    unittest.main()
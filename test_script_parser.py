@@ -0,0 +1,107 @@
+import unittest
+import time
+import script_parser
+
+
+class TestScriptParser(unittest.TestCase):
+    # Class for unit testing the lexer and parser of the bot language
+
+    def test_tokenize(self):
+        # Whitespaces are dropped, a word directly followed by an opening parenthesis is a command call, and each token
+        # holds its position in the source
+        tokens = script_parser.tokenize("add(x, 2)\n  move()")
+        self.assertEqual([token[:2] for token in tokens],
+                         [("call", "add"), ("word", "x"), ("comma", ","), ("word", "2"), ("rpar", ")"),
+                          ("call", "move"), ("rpar", ")"), ("end", "")])
+        self.assertEqual(tokens[3][2:], (1, 8))
+        self.assertEqual(tokens[5][2:], (2, 3))
+
+    def test_number_value(self):
+        self.assertEqual(script_parser.number_value("5"), 5)
+        self.assertIsInstance(script_parser.number_value("-5.0"), int)
+        self.assertAlmostEqual(script_parser.number_value("5.69"), 5.69)
+        with self.assertRaises(ValueError):
+            script_parser.number_value("5a")
+
+    def test_parse(self):
+        # Test the structure of the tree for a nested script
+        tree = script_parser.parse("define(x, add(1, y))\nif(gt(x, 3), spawn() move())")
+        self.assertEqual(len(tree.statements), 2)
+        define = tree.statements[0]
+        self.assertIsInstance(define, script_parser.Call)
+        self.assertEqual(define.name, "define")
+        self.assertIsInstance(define.args[0].statements[0], script_parser.Symbol)
+        add = define.args[1].statements[0]
+        self.assertEqual(add.name, "add")
+        self.assertEqual(add.args[0].statements[0].value, 1)
+        self.assertEqual(add.args[1].statements[0].name, "y")
+        # "if" is turned into an "if_else" whose else clause is 0, and the branch holds two statements
+        if_else = tree.statements[1]
+        self.assertEqual(if_else.name, "if_else")
+        self.assertEqual(len(if_else.args), 3)
+        self.assertEqual([node.name for node in if_else.args[1].statements], ["spawn", "move"])
+        self.assertEqual(if_else.args[2].statements[0].value, 0)
+        self.assertEqual((if_else.line, if_else.column), (2, 1))
+
+    def test_aliases(self):
+        tree = script_parser.parse("and(1, 0) or(1, 0)")
+        self.assertEqual([node.name for node in tree.statements], ["i_and", "i_or"])
+
+    def test_numbers_and_symbols(self):
+        # Words which python converts to a number are numbers, alphanumeric words are symbols, and anything else is an
+        # error
+        self.assertEqual(repr(script_parser.parse("5 -12.5 5.0 string")),
+                         "Sequence([Number(5), Number(-12.5), Number(5), Symbol(string)])")
+        with self.assertRaises(Exception):
+            script_parser.parse("-12d")
+
+    def test_statements(self):
+        # Statements are separated by whitespaces and linebreaks, except those inside the arguments of a call
+        self.assertEqual(repr(script_parser.parse("   test test2  \n  ")), "Sequence([Symbol(test), Symbol(test2)])")
+        self.assertEqual(repr(script_parser.parse("   test(test2 \ntest3)  ")),
+                         "Sequence([Call(test, [Sequence([Symbol(test2), Symbol(test3)])])])")
+        self.assertEqual(repr(script_parser.parse("   test(test2)  test3")),
+                         "Sequence([Call(test, [Sequence([Symbol(test2)])]), Symbol(test3)])")
+        self.assertEqual(repr(script_parser.parse("   test(test2(1)  test3) test4(test5)")),
+                         "Sequence([Call(test, [Sequence([Call(test2, [Sequence([Number(1)])]), Symbol(test3)])]), "
+                         "Call(test4, [Sequence([Symbol(test5)])])])")
+
+    def test_args(self):
+        # The arguments of a call are separated by commas at its own level of parentheses only, across linebreaks
+        for script in ("dummy(1, 2, 3)", "dummy(1, 2, \n 3)"):
+            self.assertEqual(repr(script_parser.parse(script)),
+                             "Sequence([Call(dummy, [Sequence([Number(1)]), Sequence([Number(2)]), "
+                             "Sequence([Number(3)])])])")
+        self.assertEqual(repr(script_parser.parse("dummy(1, add(2, 3))")),
+                         "Sequence([Call(dummy, [Sequence([Number(1)]), "
+                         "Sequence([Call(add, [Sequence([Number(2)]), Sequence([Number(3)])])])])])")
+        # Calls must be a name immediately followed by balanced parentheses
+        for script in ("a (b c)", "ab c)", "a(b c", "dummy(1, 2), 3)", "dummy(1, add(2, 3)"):
+            with self.assertRaises(Exception):
+                script_parser.parse(script)
+
+    def test_syntax_errors(self):
+        # Every syntax error reports its position in the source
+        bad_scripts = ["mul (2, 8)",  # Space between command and arguments
+                       "mul(2, 8",  # Missing parentheses
+                       "mul(2, 8))",  # Extra parentheses
+                       "add(1, )",  # Empty argument
+                       "define(x-y, 2)",  # Symbols must be alphanumeric
+                       "move() ,"]
+        for script in bad_scripts:
+            with self.assertRaises(Exception) as context:
+                script_parser.parse(script)
+            self.assertIn("line 1", str(context.exception))
+
+    def test_large_script(self):
+        # Parsing must be linear in the size of the script, so a script of thousands of lines parses quickly
+        script = "\n".join("if(and(gt(distance_from_closest_enemy(), " + str(i) + "), lt(num_total_allies(), 4)),"
+                           " define(x" + str(i) + ", add(mul(2, 3), sub(4, 1))) spawn())" for i in range(5000))
+        start = time.perf_counter()
+        tree = script_parser.parse(script)
+        self.assertEqual(len(tree.statements), 5000)
+        self.assertLess(time.perf_counter() - start, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
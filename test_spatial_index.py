@@ -0,0 +1,72 @@
+import unittest
+import random
+import board
+import player
+import turn_handler
+
+
+def closest_distance(test_board, unit, allies):
+    # Return the distance from a unit to its closest ally or enemy by measuring the distance to every unit on the board,
+    # or a distance larger than the board if there is none
+    dist = [test_board.board_size[0] + test_board.board_size[1]]
+    for t_player in test_board.players.values():
+        if (t_player == unit.player) == allies:
+            dist += [test_board.distance_between_units(unit, t_unit) for t_unit in t_player.units if t_unit != unit]
+    return min(dist)
+
+
+class TestSpatialIndex(unittest.TestCase):
+    # Class for unit testing the spatial index. The index must always give the same distances as a search over all
+    # units on the board
+    def setUp(self):
+        self.turn_handler = turn_handler.TurnHandler()
+        self.players = {0: player.Player(0, None), 1: player.Player(1, None), 2: player.Player(2, None)}
+
+    def check_distances(self, test_board):
+        for t_player in self.players.values():
+            for unit in t_player.units:
+                self.assertEqual(test_board.distance_from_closest_ally(unit), closest_distance(test_board, unit, True))
+                self.assertEqual(test_board.distance_from_closest_enemy(unit),
+                                 closest_distance(test_board, unit, False))
+
+    def test_against_full_search(self):
+        # Spawn, move and remove units at random on boards of several sizes (including sizes that do not divide evenly
+        # into buckets and boards with a single row), and compare against a search over all units after every change
+        rng = random.Random(0)
+        for board_size in [[20, 20], [50, 37], [13, 7], [1, 30], [3, 3]]:
+            self.setUp()
+            test_board = board.Board(self.turn_handler, self.players, board_size, 1, random.Random(1))
+            for _ in range(150):
+                action = rng.random()
+                units = [unit for t_player in self.players.values() for unit in t_player.units]
+                if action < 0.4 or len(units) < 3:
+                    loc = test_board.get_random_location()
+                    if test_board.is_free(loc):
+                        test_board.spawn_unit(self.players[rng.randrange(3)], loc)
+                elif action < 0.8:
+                    test_board.move_to_adjacent_loc(rng.choice(units))
+                else:
+                    test_board.despawn_unit(rng.choice(units))
+                self.check_distances(test_board)
+
+    def test_no_units(self):
+        # Without any ally or enemy on the board, the distance is larger than the board
+        test_board = board.Board(self.turn_handler, self.players, [20, 20], 0.01)
+        test_board.spawn_unit(self.players[0], [0, 0])
+        unit = next(iter(self.players[0].units))
+        self.assertEqual(test_board.distance_from_closest_ally(unit), 40)
+        self.assertEqual(test_board.distance_from_closest_enemy(unit), 40)
+
+    def test_ring(self):
+        # Rings of buckets must not overlap, and together they must cover every bucket exactly once
+        test_board = board.Board(self.turn_handler, self.players, [100, 60], 0.01)
+        index = test_board.spatial_index
+        num_buckets = index.num_buckets[0] * index.num_buckets[1]
+        buckets = []
+        for radius in range(max(index.num_buckets) // 2 + 1):
+            buckets += index.ring([3, 58], radius)
+        self.assertEqual(sorted(buckets), list(range(num_buckets)))
+
+
+if __name__ == '__main__':
+    unittest.main()
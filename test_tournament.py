@@ -0,0 +1,63 @@
+import unittest
+import logging
+import tournament
+
+
+class TestTournament(unittest.TestCase):
+    # Class for unit testing the tournament runner
+    def setUp(self):
+        logging.disable(logging.CRITICAL)  # Disable logging
+        self.paths = ["strategies/test1.txt", "strategies/test2.txt", "unit_test_files/unit_test_strategy_2.txt"]
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)  # Enable logging again for the tests which follow
+
+    def test_init(self):
+        # A tournament needs enough strategies for a single game, and at least one game per pairing
+        with self.assertRaises(Exception):
+            tournament.Tournament(self.paths[:1])
+        with self.assertRaises(Exception):
+            tournament.Tournament(self.paths, games_per_pairing=0)
+
+    def test_matches(self):
+        # Round-robin with 3 strategies gives 3 pairings. The order of the players alternates between the games of a
+        # pairing, and every match has its own seed
+        test_tournament = tournament.Tournament(self.paths, games_per_pairing=2)
+        matches = list(test_tournament.matches())
+        self.assertEqual(len(matches), 6)
+        self.assertEqual(test_tournament.num_matches(), 6)
+        self.assertEqual([match.entrants for match in matches[:2]], [(0, 1), (1, 0)])
+        self.assertEqual(matches[1].filepaths, [self.paths[1], self.paths[0]])
+        self.assertEqual(len(set(match.seed for match in matches)), 6)
+
+    def test_run(self):
+        # Every entrant plays 4 games, each of which it either wins, ties or loses, and the results are reproducible
+        results = []
+        for num_processes in [1, 2]:
+            test_tournament = tournament.Tournament(self.paths, games_per_pairing=2, num_processes=num_processes,
+                                                    seed=3, turn_limit=300)
+            results.append(sorted(test_tournament.run(), key=lambda result: result.match_id))
+            for entrant_stats in test_tournament.stats:
+                self.assertEqual(entrant_stats.games, 4)
+                self.assertEqual(entrant_stats.wins + entrant_stats.ties + entrant_stats.losses, 4)
+        self.assertEqual(len(results[0]), 6)
+        self.assertEqual(results[0], results[1])
+
+    def test_run_match(self):
+        # Playing a single match again with its seed gives the same result
+        test_tournament = tournament.Tournament(self.paths, turn_limit=300)
+        match = next(test_tournament.matches())
+        self.assertEqual(tournament.run_match(match), tournament.run_match(match))
+
+    def test_budget_trips(self):
+        # The turns in which an entrant's script exceeded the turn budget are added up over its games
+        test_tournament = tournament.Tournament(self.paths[:2], games_per_pairing=2, num_processes=1, turn_limit=40,
+                                                node_budget=1)
+        results = list(test_tournament.run())
+        self.assertEqual([result.budget_trips for result in results], [[{"nodes": 20, "time": 0}] * 2] * 2)
+        for entrant_stats in test_tournament.stats:
+            self.assertEqual(entrant_stats.to_dict()["budget_trips"], {"nodes": 40, "time": 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
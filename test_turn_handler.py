@@ -1,4 +1,6 @@
 import unittest
+import random
+from collections import deque
 import board
 import turn_handler
 import player
@@ -36,6 +38,32 @@ class TestTurnHandler(unittest.TestCase):
         test_turn_handler.end_turn()
         self.assertEqual(unit2, test_turn_handler.current_unit())
 
+    def test_turn_order(self):
+        # The order of the units must be exactly that of a deque whose right end is the acting unit, where new units are
+        # added at the left end and ending a turn moves the acting unit to the left end
+        test_turn_handler = turn_handler.TurnHandler()
+        reference = deque()
+        rng = random.Random(5)
+        units = []
+        for idx in range(2000):
+            action = rng.random()
+            if action < 0.3 or len(units) == 0:
+                units.append(idx)
+                test_turn_handler.add_to_queue(idx)
+                reference.appendleft(idx)
+            elif action < 0.5:
+                unit = units.pop(rng.randrange(len(units)))
+                test_turn_handler.remove_from_queue(unit)
+                reference.remove(unit)
+            else:
+                test_turn_handler.end_turn()
+                reference.appendleft(reference.pop())
+            self.assertEqual(test_turn_handler.units(), list(reversed(reference)))
+        self.assertEqual(len(test_turn_handler), len(reference))
+        for unit in list(units):
+            test_turn_handler.remove_from_queue(unit)
+        self.assertIsNone(test_turn_handler.current_unit())
+
 
 if __name__ == '__main__':
     unittest.main()
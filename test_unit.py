@@ -25,6 +25,22 @@ class TestUnit(unittest.TestCase):
         self.assertTrue(unit.decrement_spawn_timer_and_spawn_if_ready())
         self.assertEqual(unit.spawn_timer, 0)
 
+    def test_location(self):
+        # The location of a unit is stored as the index of its cell on the board, and converted back to coordinates
+        # when read. Units have no instance dict, only the slots of their class
+        test_board = board.Board(self.turn_handler, self.players, [20, 30], 0.5)
+        test_board.spawn_unit(self.players[0], [4, 7])
+        unit = self.players[0].units.pop()
+        self.assertEqual(unit.loc, (4, 7))
+        self.assertEqual(unit.cell, 4 * 30 + 7)
+        unit.loc = [19, 29]
+        self.assertEqual(unit.loc, (19, 29))
+        # The location is read-only: changing it in place raises instead of silently doing nothing
+        with self.assertRaises(TypeError):
+            unit.loc[0] = 3
+        self.assertEqual(unit.cell, 19 * 30 + 29)
+        self.assertFalse(hasattr(unit, "__dict__"))
+
     def test_decrement_hp(self):
         # Spawn a unit, test that causing 1 damage won't kill it. Then cause 2 more damage, killing it.
         # Then spawn another unit, cause 10 damage and test that it dies immediately.
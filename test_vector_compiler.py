@@ -0,0 +1,104 @@
+import unittest
+import logging
+import batch_engine
+import script_parser
+import vector_compiler
+
+np = vector_compiler.np
+
+
+@unittest.skipUnless(np is not None, "numpy is not installed")
+class TestVectorCompiler(unittest.TestCase):
+    # Class for unit testing the compilation of scripts into programs over arrays
+    def setUp(self):
+        logging.disable(logging.CRITICAL)  # Disable logging
+        self.paths = ["strategies/test1.txt", "strategies/test2.txt"]
+        self.engine = batch_engine.BatchEngine(self.paths, 4, seeds=[0, 1, 2, 3])
+        self.games = np.arange(4)
+        self.slots = self.engine.current[self.games]
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)  # Enable logging again for the tests which follow
+
+    def run_script(self, script, info=None):
+        # Compile a script and execute it once for the acting unit of every game of the engine
+        program = self.engine.vector_compiler.compile(script_parser.parse(script))
+        program(self.games, self.slots, info if info is not None else {})
+
+    def variable(self, name):
+        values, defined = self.engine.variable_columns(name)
+        self.assertTrue(defined[self.games, self.slots].all())
+        return values[self.games, self.slots].tolist()
+
+    def test_arithmetic(self):
+        self.run_script("define(x, add(mul(2, 3), div(9, 2)))\ndefine(y, sub(x, neg(gt(x, 10))))")
+        self.assertEqual(self.variable("x"), [10.5] * 4)
+        self.assertEqual(self.variable("y"), [10.5] * 4)
+
+    def test_and_or_values(self):
+        # and/or return one of their arguments, as in python
+        self.run_script("define(a, and(2, 3)) define(b, and(0, 3)) define(c, or(0, 5)) define(d, or(4, 5))")
+        self.assertEqual([self.variable(name)[0] for name in "abcd"], [3, 0, 5, 4])
+
+    def test_short_circuit_masks(self):
+        # The second argument of and/or is only evaluated in the lanes where the first one does not decide the result
+        info = {"get_unit_id": np.array([1, 2, 3, 4])}
+        self.run_script("define(x, 0) and(gt(get_unit_id(), 2), define(x, 1))\n"
+                        "define(y, or(lt(get_unit_id(), 2), div(1, sub(get_unit_id(), 1))))", info)
+        self.assertEqual(self.variable("x"), [0, 0, 1, 1])
+        self.assertEqual(self.variable("y"), [1, 1, 0.5, 1 / 3])
+
+    def test_if_else_masks(self):
+        # Each lane takes its own branch, according to the info values of its game
+        info = {"get_unit_id": np.array([1, 2, 3, 4])}
+        self.run_script("define(x, if_else(gt(get_unit_id(), 2), get_unit_id(), 0))\n"
+                        "if(lt(get_unit_id(), 3), define(y, 1))\ndefine(y, 2)", info)
+        self.assertEqual(self.variable("x"), [0, 0, 3, 4])
+        self.assertEqual(self.variable("y"), [2, 2, 2, 2])
+
+    def test_branch_symbols(self):
+        # A symbol returned from a branch is resolved by the command which uses it, and unresolved symbols are ignored
+        self.run_script("define(a, 7)\ndefine(b, if(1, a))\nundefined\nif(1, undefined)")
+        self.assertEqual(self.variable("b"), [7] * 4)
+
+    def test_runtime_errors(self):
+        with self.assertRaises(Exception) as context:
+            self.run_script("define(x, y)")
+        self.assertIn("Undefined symbol y", str(context.exception))
+        with self.assertRaises(Exception) as context:
+            self.run_script("div(1, 0)")
+        self.assertIn("Division by 0", str(context.exception))
+        # Lanes outside of the mask do not raise errors
+        self.run_script("if(0, div(1, 0))")
+
+    def test_critical_actions(self):
+        # Only the first critical action of a turn is performed
+        self.run_script("fortify() fortify() define(a, spawn())")
+        self.assertEqual(self.engine.hp[self.games, self.slots].tolist(), [4] * 4)
+        self.assertEqual(self.engine.spawn_timer[self.games, self.slots].tolist(), [0] * 4)
+        self.assertEqual(self.variable("a"), [0] * 4)
+
+    def test_early_exit(self):
+        # With early exit, nothing is executed after a critical action in the lanes where it was performed
+        engine = batch_engine.BatchEngine(self.paths, 4, seeds=[0, 1, 2, 3], early_exit=True)
+        slots = engine.current[self.games]
+        info = {"get_unit_id": np.array([1, 2, 3, 4])}
+        program = engine.vector_compiler.compile(script_parser.parse(
+            "define(x, 1) if(gt(get_unit_id(), 2), fortify()) define(x, 2) define(y, div(1, 0))"))
+        with self.assertRaises(Exception):
+            program(self.games, slots, info)
+        values, defined = engine.variable_columns("x")
+        self.assertEqual(values[self.games, slots].tolist(), [2, 2, 1, 1])
+        values, defined = engine.variable_columns("y")
+        self.assertFalse(defined[self.games, slots].any())
+
+    def test_not_vectorizable(self):
+        for script in ["prnt(1)", "define(if(1, x, y), 1)"]:
+            with self.assertRaises(vector_compiler.NotVectorizable):
+                self.run_script(script)
+        with self.assertRaises(Exception):
+            self.run_script("no_such_command()")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import game
+import interpreter
+import profiler
+import json
+import random
+import argparse
+import itertools
+import multiprocessing
+from collections import namedtuple
+from custom_logger_levels import LoggerLevels
+
+# A single game of the tournament. entrants holds the indices (in the tournament's list of strategies) of the players
+# of the game, in the order of their player ids
+Match = namedtuple("Match", ["match_id", "entrants", "filepaths", "seed", "game_kwargs"])
+# The result of a match. winners holds the entrant indices of the winning player(s), and remaining_units the number of
+# units each entrant had left at the end of the game (in the same order as the match's entrants). budget_trips holds the
+# number of turns in which the script of each entrant exceeded the turn budget (see Game's node_budget and time_budget),
+# by reason. profile holds the profile of the game (see Profiler.to_dict) if the games are profiled, and is None
+# otherwise
+MatchResult = namedtuple("MatchResult", ["match_id", "entrants", "seed", "winners", "remaining_units", "num_turns",
+                                         "budget_trips", "profile"])
+MatchResult.__new__.__defaults__ = (None, None)
+
+
+def run_match(match):
+    # Play a single match. This runs in a worker process. Each game owns its random number generator, which is seeded
+    # with the seed of the match, so the match can be replayed exactly with Game(..., seed=match.seed)
+    match_game = game.Game(match.filepaths, log_level=LoggerLevels.Quiet, seed=match.seed, **match.game_kwargs)
+    winner_ids = match_game.start_game()
+    if not isinstance(winner_ids, list):
+        winner_ids = [winner_ids]
+    # Player ids are 1-based positions in the list of file paths of the match
+    winners = [match.entrants[player_id - 1] for player_id in winner_ids]
+    remaining_units = [match_game.players[player_id].num_units() if player_id in match_game.players else 0
+                       for player_id in range(1, len(match.entrants) + 1)]
+    budget_trips = [match_game.budget_trips[player_id] for player_id in range(1, len(match.entrants) + 1)]
+    profile = match_game.profiler.to_dict() if match_game.profiler is not None else None
+    return MatchResult(match.match_id, match.entrants, match.seed, winners, remaining_units,
+                       match_game.turn_handler.turn_number, budget_trips, profile)
+
+
+class EntrantStats:
+    # Aggregated results of a single entrant (strategy) over all of its matches
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.games = 0
+        self.wins = 0
+        self.ties = 0
+        self.losses = 0
+        self.remaining_units = 0  # Total number of units left at the end of all games
+        self.budget_trips = {"nodes": 0, "time": 0}  # Total number of turns in which the turn budget was exceeded
+
+    def add_result(self, result, position):
+        self.games += 1
+        self.remaining_units += result.remaining_units[position]
+        if result.budget_trips is not None:
+            for reason, trips in result.budget_trips[position].items():
+                self.budget_trips[reason] += trips
+        entrant = result.entrants[position]
+        if entrant not in result.winners:
+            self.losses += 1
+        elif len(result.winners) == 1:
+            self.wins += 1
+        else:
+            self.ties += 1
+
+    def average_remaining_units(self):
+        return self.remaining_units / self.games if self.games > 0 else 0
+
+    def to_dict(self):
+        return {"filepath": self.filepath, "games": self.games, "wins": self.wins, "ties": self.ties,
+                "losses": self.losses, "remaining_units": self.remaining_units,
+                "average_remaining_units": self.average_remaining_units(), "budget_trips": dict(self.budget_trips)}
+
+
+class Tournament:
+    # This class runs many games between a set of strategies, spreading the games over a pool of worker processes.
+    # Each combination of players_per_game strategies (a round-robin for two players per game) plays games_per_pairing
+    # games, rotating the order of the players between games so that no strategy always acts first.
+    # Every match has its own seed, which is derived from the tournament seed, so a tournament (and any single match of
+    # it) can be reproduced.
+    def __init__(self, filepaths, games_per_pairing=1, players_per_game=2, num_processes=None, seed=0,
+                 **game_kwargs):
+        if len(filepaths) < players_per_game:
+            raise Exception("Tournament requires at least " + str(players_per_game) + " strategies")
+        if games_per_pairing < 1:
+            raise Exception("Each pairing must play at least one game")
+        self.filepaths = filepaths
+        self.games_per_pairing = games_per_pairing
+        self.players_per_game = players_per_game
+        self.num_processes = num_processes  # Number of worker processes; None uses all cores, 1 runs in-process
+        self.seed = seed
+        self.game_kwargs = game_kwargs  # Passed on to every Game (e.g. board_size or turn_limit)
+        self.stats = [EntrantStats(path) for path in filepaths]
+        # With profile=True among the game arguments, the profiles of all games are added up here (see profiler)
+        self.profiler = profiler.Profiler() if game_kwargs.get("profile", False) else None
+
+    def matches(self):
+        # Generate all matches of the tournament
+        seed_generator = random.Random(self.seed)
+        match_id = 0
+        for pairing in itertools.combinations(range(len(self.filepaths)), self.players_per_game):
+            for game_idx in range(self.games_per_pairing):
+                shift = game_idx % self.players_per_game
+                entrants = pairing[shift:] + pairing[:shift]
+                yield Match(match_id, entrants, [self.filepaths[entrant] for entrant in entrants],
+                            seed_generator.getrandbits(32), self.game_kwargs)
+                match_id += 1
+
+    def num_matches(self):
+        num_pairings = len(list(itertools.combinations(range(len(self.filepaths)), self.players_per_game)))
+        return num_pairings * self.games_per_pairing
+
+    def add_result(self, result):
+        for position, entrant in enumerate(result.entrants):
+            self.stats[entrant].add_result(result, position)
+        if self.profiler is not None and result.profile is not None:
+            self.profiler.merge(result.profile)
+
+    def run(self):
+        # Play all matches, yielding the result of each match as soon as it arrives (so not necessarily in order).
+        # The aggregated statistics in self.stats are updated with each result before it is yielded
+        if self.num_processes == 1:
+            for match in self.matches():
+                result = run_match(match)
+                self.add_result(result)
+                yield result
+            return
+
+        with multiprocessing.Pool(self.num_processes) as pool:
+            # Send matches to the workers in chunks, to reduce the communication overhead for short games
+            num_workers = self.num_processes or multiprocessing.cpu_count()
+            chunk_size = max(1, self.num_matches() // (num_workers * 8))
+            for result in pool.imap_unordered(run_match, self.matches(), chunk_size):
+                self.add_result(result)
+                yield result
+
+    def run_all(self):
+        # Play all matches and return the aggregated statistics
+        for _ in self.run():
+            pass
+        return self.stats
+
+    def stats_to_dict(self):
+        return [entrant_stats.to_dict() for entrant_stats in self.stats]
+
+
+def main():
+    # Argument parsing
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f', '--filepaths', nargs='*', help='Filepaths for bot strategy scripts')
+    parser.add_argument('-n', '--games-per-pairing', type=int, default=1, help='Number of games per pairing')
+    parser.add_argument('-k', '--players-per-game', type=int, default=2, help='Number of players in each game')
+    parser.add_argument('-p', '--processes', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Seed of the tournament')
+    parser.add_argument('-t', '--turn-limit', type=int, default=10000, help='Turn limit of each game')
+    parser.add_argument('-m', '--mode', choices=interpreter.Interpreter.modes, default="compiled",
+                        help='Interpreter mode used to execute the scripts')
+    parser.add_argument('-o', '--output', default=None, help='Path to write the statistics to as JSON')
+    parser.add_argument('-c', '--script-cache', default=None,
+                        help='Directory to cache parsed scripts in, shared by the worker processes')
+    parser.add_argument('-P', '--profile', default=None,
+                        help='Profile the games, and write the time spent per phase, script and command to this path')
+    parser.add_argument('-g', '--flame-graph', default=None,
+                        help='Profile the games, and write the profile as folded stacks (for flame graphs) here')
+    parser.add_argument('--node-budget', type=int, default=None,
+                        help='Maximum number of commands a script may evaluate in a unit\'s turn')
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='Maximum time in seconds a script may run for in a unit\'s turn')
+    args = parser.parse_args()
+
+    tournament = Tournament(args.filepaths, args.games_per_pairing, args.players_per_game, args.processes, args.seed,
+                            turn_limit=args.turn_limit, interpreter_mode=args.mode, script_cache_dir=args.script_cache,
+                            profile=args.profile is not None or args.flame_graph is not None,
+                            node_budget=args.node_budget, time_budget=args.time_budget)
+    num_matches = tournament.num_matches()
+    for num_done, result in enumerate(tournament.run(), 1):
+        print("Match " + str(result.match_id) + " (" + str(num_done) + "/" + str(num_matches) + "): winners "
+              + str(result.winners) + " after " + str(result.num_turns) + " turns")
+
+    for idx, entrant_stats in enumerate(tournament.stats):
+        print(str(idx) + ": " + entrant_stats.filepath + " - " + str(entrant_stats.wins) + " wins, "
+              + str(entrant_stats.ties) + " ties, " + str(entrant_stats.losses) + " losses, "
+              + "{:.2f}".format(entrant_stats.average_remaining_units()) + " units left on average")
+
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(tournament.stats_to_dict(), output_file, indent=2)
+    if args.profile is not None:
+        tournament.profiler.write_json(args.profile)
+    if args.flame_graph is not None:
+        tournament.profiler.write_folded_stacks(args.flame_graph)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-from collections import deque
 from custom_logger_levels import LoggerLevels
 import logging
 
@@ -9,30 +8,71 @@ logger.setLevel(1)
 
 class TurnHandler:
     # This class handles keeping track of turns. Which is the active unit/player, turn order, etc.
+    # The units are kept in a ring in acting order, linked through the next_unit and prev_unit dicts, so that moving on
+    # to the next unit, adding a unit and removing any unit all take constant time. A new unit is added just before the
+    # current unit, i.e. it acts last in the current round. If the current unit is removed, the unit after it becomes
+    # the current unit
     def __init__(self):
-        self.queue = deque()
+        self.current = None  # The acting unit, or None if there are no units
+        self.next_unit = {}  # Unit -> the unit acting after it
+        self.prev_unit = {}  # Unit -> the unit acting before it
         self.turn_number = 0
 
+    def __len__(self):
+        return len(self.next_unit)
+
+    def units(self):
+        # Return all units in acting order, starting with the current unit
+        units = []
+        unit = self.current
+        for _ in range(len(self.next_unit)):
+            units.append(unit)
+            unit = self.next_unit[unit]
+        return units
+
     def current_unit(self):
-        return self.queue[-1]
+        return self.current
 
     def current_player(self):
         return self.current_unit().player
 
     def start_turn(self):
-        self.turn_number += 1
-        logger.log(LoggerLevels.SecondaryInformation, "Turn number " + str(self.turn_number))
-        logger.log(LoggerLevels.SecondaryInformation, "Acting unit: " + str(self.current_unit().id))
+        self.begin_turn()
         self.current_unit().on_new_turn()
 
+    def begin_turn(self):
+        # The first part of start_turn, before the acting unit updates its timers (see Game.turn)
+        self.turn_number += 1
+        if logger.isEnabledFor(LoggerLevels.SecondaryInformation):
+            logger.log(LoggerLevels.SecondaryInformation, "Turn number %s", self.turn_number)
+            logger.log(LoggerLevels.SecondaryInformation, "Acting unit: %s", self.current_unit().id)
+
     def end_turn(self):
-        self.queue.appendleft(self.queue.pop())
+        self.current = self.next_unit[self.current]
 
     def add_to_queue(self, unit):
-        self.queue.appendleft(unit)
+        current = self.current
+        if current is None:
+            self.current = unit
+            self.next_unit[unit] = unit
+            self.prev_unit[unit] = unit
+            return
+        last = self.prev_unit[current]
+        self.next_unit[last] = unit
+        self.prev_unit[unit] = last
+        self.next_unit[unit] = current
+        self.prev_unit[current] = unit
 
     def remove_from_queue(self, unit):
-        self.queue.remove(unit)
+        next_unit = self.next_unit.pop(unit)
+        prev_unit = self.prev_unit.pop(unit)
+        if next_unit is unit:  # The last unit
+            self.current = None
+            return
+        self.next_unit[prev_unit] = next_unit
+        self.prev_unit[next_unit] = prev_unit
+        if self.current is unit:
+            self.current = next_unit
 
 
 class TurnHandlerInterface:
@@ -7,17 +7,23 @@ logger.setLevel(1)
 
 
 class Unit:
-    # Class representing the basic unit (bot) and its state
+    # Class representing the basic unit (bot) and its state.
+    # Units are kept small, since there may be tens of thousands of them: attributes are held in slots rather than in a
+    # dict, and the location is held as the index of the unit's cell in the board matrix (see board.BoardMatrix). The
+    # loc property converts it to and from the usual [x, y] coordinates
+    __slots__ = ("board", "var_data", "id", "player", "cell", "hp", "spawn_timer", "charge_timer", "charge_strength",
+                 "unit_turn_number", "defending", "performed_critical_action")
+
     def __init__(self, board, unit_id, player, initial_loc, initial_hp=3):
         self.board = board  # The board_matrix the unit is on
-        self.var_data = {}  # holds user-defined variable data
+        self.var_data = []  # holds user-defined variable data, by slot (see Interpreter.set_context)
 
         # Unit identification
         self.id = unit_id
         self.player = player
 
         # State variables
-        self.loc = initial_loc
+        self.cell = board.board_matrix.cell_index(initial_loc)
         self.hp = initial_hp
         self.spawn_timer = 0
         self.charge_timer = 0
@@ -27,6 +33,16 @@ class Unit:
         self.performed_critical_action = False  # Critical actions are user-commands such as attack() or move(),
         # which may not be performed more than once a turn
 
+    @property
+    def loc(self):
+        # The location of the unit as an (x, y) tuple, so that it cannot be changed in place (use Board.move_unit to
+        # move the unit)
+        return divmod(self.cell, self.board.board_matrix.size_y)
+
+    @loc.setter
+    def loc(self, loc):
+        self.cell = self.board.board_matrix.cell_index(loc)
+
     def set_spawn(self, interval):
         # Begin spawn countdown. After interval units have passed and timer reaches 0, a new unit will be spawned.
         # In the meantime the unit is unable to act
@@ -46,13 +62,15 @@ class Unit:
         if self.spawn_timer > 0:
             self.spawn_timer -= 1
             if self.spawn_timer == 0:
-                return self.board.spawn_in_adjacent_location(self.player, self.loc)
+                return self.board.spawn_in_adjacent_cell(self.player, self.cell)
         return False
 
     def decrement_hp(self, dmg):
         # Reduce hp, check if unit dies (return True if it does, False otherwise - for testing purposes)
         self.hp -= dmg
-        logger.log(LoggerLevels.ActionMessage, "Unit " + str(self.id) + " took " + str(dmg) + " damage")
+        logger.log(LoggerLevels.ActionMessage, "Unit %s took %s damage", self.id, dmg)
+        if self.board.event_log is not None:
+            self.board.event_log.damage(self, dmg)
         if self.hp <= 0:
             self.kill()
             return True
@@ -61,11 +79,13 @@ class Unit:
     def kill(self):
         # Despawn unit from board_matrix
         self.board.despawn_unit(self)
-        logger.log(LoggerLevels.ActionMessage, "Unit " + str(self.id) + " destroyed")
+        logger.log(LoggerLevels.ActionMessage, "Unit %s destroyed", self.id)
 
     def defend(self):
         # Enter defense mode (unit will block next attack against it)
         self.defending = True
+        if self.board.event_log is not None:
+            self.board.event_log.defend(self)
 
     def attack(self, dmg):
         # Attack adjacent enemy for dmg points of damage
@@ -76,8 +96,10 @@ class Unit:
         if num_turns == 0:
             self.attack(1)
         else:
-            logger.log(LoggerLevels.ActionMessage, "Unit " + str(self.id) + " is charging an attack!")
+            logger.log(LoggerLevels.ActionMessage, "Unit %s is charging an attack!", self.id)
             self.charge_timer = num_turns
+            if self.board.event_log is not None:
+                self.board.event_log.charge(self, num_turns)
 
     def decrement_charge_timer_and_attack_if_ready(self):
         # Decrement charge timer (if active) and attack when it hits 0
@@ -95,13 +117,17 @@ class Unit:
         # Otherwise, unit hp is decremented
         if self.defending:
             self.defending = False
-            logger.log(LoggerLevels.ActionMessage, "Unit " + str(self.id) + " defense broken")
+            logger.log(LoggerLevels.ActionMessage, "Unit %s defense broken", self.id)
+            if self.board.event_log is not None:
+                self.board.event_log.block(self)
             return
         self.decrement_hp(dmg)
 
     def fortify(self):
         # Fortify command: gain 1 hp
         self.hp += 1
+        if self.board.event_log is not None:
+            self.board.event_log.fortify(self)
 
     def get_turn_number(self):
         # Return the number of turns this unit has been alive
@@ -0,0 +1,242 @@
+import script_parser
+from cmd import short_circuit_commands
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency, only needed by the batch engine
+    np = None
+
+
+class NotVectorizable(Exception):
+    # Raised for scripts which use a construct that has no array equivalent
+    pass
+
+
+# Commands computed element-wise on their (resolved) arguments. Comparisons return 1.0 for True and 0.0 for False
+elementwise_commands = {
+    "add": lambda a, b: a + b,
+    "sub": lambda a, b: a - b,
+    "mul": lambda a, b: a * b,
+    "div": lambda a, b: a / b,
+    "eq": lambda a, b: (a == b) * 1.0,
+    "gt": lambda a, b: (a > b) * 1.0,
+    "gqt": lambda a, b: (a >= b) * 1.0,
+    "lt": lambda a, b: (a < b) * 1.0,
+    "lqt": lambda a, b: (a <= b) * 1.0,
+    "neg": lambda a: (a == 0) * 1.0,
+}
+# Commands which provide information about the acting unit and the board. The batch engine computes their values for
+# the acting units of all games at once
+info_commands = ("get_unit_id", "get_turn_number", "num_adjacent_allies", "num_adjacent_enemies", "num_total_allies",
+                 "num_total_enemies", "distance_from_closest_ally", "distance_from_closest_enemy")
+
+
+class VectorContext:
+    # The units a program is executed for: lane i is the acting unit in slot slots[i] of game games[i]
+    __slots__ = ("engine", "games", "slots", "info", "acted", "num_lanes", "early_exit")
+
+    def __init__(self, engine, games, slots, info):
+        self.engine = engine
+        self.games = games
+        self.slots = slots
+        self.info = info  # Info command -> its value in each lane at the start of the turn
+        self.acted = np.zeros(len(games), dtype=bool)  # Lanes which performed a critical action during this execution
+        self.num_lanes = len(games)
+        self.early_exit = engine.interpreter.early_exit
+
+    def live(self, mask):
+        # With early exit, the script of a unit stops once it has performed a critical action, so the lanes which have
+        # acted are removed from the mask of any statement with side effects
+        if self.early_exit:
+            return mask & ~self.acted
+        return mask
+
+
+class VectorProgram:
+    # A script compiled by VectorCompiler. Calling it executes the script for the acting units of a set of games
+    def __init__(self, engine, statements):
+        self.engine = engine
+        self.statements = statements
+
+    def __call__(self, games, slots, info):
+        context = VectorContext(self.engine, games, slots, info)
+        mask = np.ones(len(games), dtype=bool)
+        with np.errstate(all="ignore"):  # Values of lanes outside of the mask are computed but never used
+            for statement in self.statements:
+                statement(context, mask)
+
+
+class VectorCompiler:
+    # This class compiles a user script into a data-flow program over arrays, for the batch engine. Each lane of the
+    # arrays holds the value for the acting unit of one game, so a single execution of the program runs the script for
+    # any number of games at once.
+    # Every node of the syntax tree is turned into a function taking the context and a mask of the lanes in which the
+    # node is evaluated, and returning an array with its value in every lane (values outside the mask are meaningless):
+    # - Numbers, booleans and the return values of commands are all held as floats (True and False as 1.0 and 0.0)
+    # - if_else evaluates its predicate, then each branch with the mask of the lanes where it was chosen. Likewise,
+    #   and/or evaluate their second argument only in the lanes where the first one does not decide the result
+    # - Variables are held in columns of the engine, with one value per unit slot of every game
+    # - Critical actions (as listed in the registry of the commands) are performed by the engine in the lanes of the
+    #   mask where the acting unit can act
+    # - Info commands read the values computed by the engine at the start of the turn, and recompute them only in the
+    #   lanes which have performed an action since
+    # The semantics are those of the interpreter, except that numbers are floats: integers larger than 2 ** 53 lose
+    # precision. Scripts which need python values (prnt, or define with a computed symbol name) raise NotVectorizable
+    def __init__(self, engine):
+        self.engine = engine
+        self.interpreter = engine.interpreter
+
+    def compile(self, tree):
+        statements = [self.lower_node(node, False) for node in tree.statements]
+        return VectorProgram(self.engine, statements)
+
+    def lower_sequence(self, sequence, resolve):
+        # Lower a sequence of statements. Only the value of the last statement is kept, so only it is resolved
+        nodes = sequence.statements
+        if len(nodes) == 0:
+            raise NotVectorizable("Empty sequence")
+        lowered = [self.lower_node(node, False) for node in nodes[:-1]] + [self.lower_node(nodes[-1], resolve)]
+        if len(lowered) == 1:
+            return lowered[0]
+
+        def run_sequence(context, mask):
+            for node in lowered[:-1]:
+                node(context, mask)
+            return lowered[-1](context, mask)
+        return run_sequence
+
+    def lower_node(self, node, resolve):
+        # Lower a single statement. If resolve is False, the value of the statement is not used
+        if isinstance(node, script_parser.Number):
+            value = float(node.value)
+            return lambda context, mask: np.full(context.num_lanes, value)
+        elif isinstance(node, script_parser.Symbol):
+            if not resolve:
+                return lambda context, mask: None  # An unresolved symbol does nothing
+            return self.lower_variable(node.name)
+        return self.lower_call(node, resolve)
+
+    def lower_variable(self, name):
+        values, defined = self.engine.variable_columns(name)
+
+        def read_variable(context, mask):
+            games, slots = context.games, context.slots
+            live = context.live(mask)
+            if not defined[games[live], slots[live]].all():
+                raise Exception("Undefined symbol " + name)
+            return values[games, slots]
+        return read_variable
+
+    def lower_call(self, node, resolve):
+        self.interpreter.verify_call(node)
+        cmd = node.name
+        args = node.args
+
+        if cmd == "if_else":
+            return self.lower_if_else(args, resolve)
+        if cmd == "define":
+            return self.lower_define(args)
+        if cmd in short_circuit_commands:
+            return self.lower_short_circuit(cmd, args)
+        if cmd in elementwise_commands:
+            return self.lower_elementwise(cmd, [self.lower_sequence(arg, True) for arg in args])
+        if self.interpreter.registry[cmd].critical:
+            return self.lower_critical_action(cmd, [self.lower_sequence(arg, True) for arg in args])
+        if cmd == "get_unit_limit":
+            unit_limit = float(self.engine.unit_limit)
+            return lambda context, mask: np.full(context.num_lanes, unit_limit)
+        if cmd in info_commands:
+            return self.lower_info(cmd)
+        raise NotVectorizable("Command " + cmd + "() has no array equivalent")
+
+    def lower_if_else(self, args, resolve):
+        # The predicate is always resolved, while the branches are only resolved if the value of the if_else is used
+        pred = self.lower_sequence(args[0], True)
+        if_true = self.lower_sequence(args[1], resolve)
+        if_false = self.lower_sequence(args[2], resolve)
+
+        def run_if_else(context, mask):
+            chosen = pred(context, mask) != 0
+            true_mask = mask & chosen
+            false_mask = mask & ~chosen
+            true_values = if_true(context, true_mask) if true_mask.any() else None
+            false_values = if_false(context, false_mask) if false_mask.any() else None
+            if not resolve:
+                return None
+            if true_values is None:
+                return false_values if false_values is not None else np.zeros(context.num_lanes)
+            if false_values is None:
+                return true_values
+            return np.where(chosen, true_values, false_values)
+        return run_if_else
+
+    def lower_short_circuit(self, cmd, args):
+        # The result is the first argument in the lanes where it decides the result (false for and, true for or), and
+        # the second argument elsewhere, which is only evaluated in those lanes
+        first = self.lower_sequence(args[0], True)
+        second = self.lower_sequence(args[1], True)
+
+        def run_short_circuit(context, mask):
+            first_values = first(context, mask)
+            undecided = (first_values != 0) if cmd == "i_and" else (first_values == 0)
+            second_mask = mask & undecided
+            if not second_mask.any():
+                return first_values
+            return np.where(undecided, second(context, second_mask), first_values)
+        return run_short_circuit
+
+    def lower_define(self, args):
+        # The name of the symbol must be given as is; a name computed at runtime would need python values
+        names = args[0].statements
+        if len(names) != 1 or not isinstance(names[0], script_parser.Symbol):
+            raise NotVectorizable("define() with a computed symbol name")
+        values, defined = self.engine.variable_columns(names[0].name)
+        value = self.lower_sequence(args[1], True)
+
+        def run_define(context, mask):
+            new_values = value(context, mask)
+            live = context.live(mask)
+            games, slots = context.games[live], context.slots[live]
+            values[games, slots] = new_values[live]
+            defined[games, slots] = True
+            return np.ones(context.num_lanes)
+        return run_define
+
+    @staticmethod
+    def lower_elementwise(cmd, args):
+        func = elementwise_commands[cmd]
+
+        def run_elementwise(context, mask):
+            values = [arg(context, mask) for arg in args]
+            if cmd == "div" and (values[1][context.live(mask)] == 0).any():
+                raise Exception("Division by 0")
+            return func(*values)
+        return run_elementwise
+
+    @staticmethod
+    def lower_critical_action(cmd, args):
+        # The action is performed in the lanes where the acting unit is able to act, and returns True there (and False
+        # elsewhere), as with the critical_action decorator
+        def run_critical_action(context, mask):
+            values = [arg(context, mask) for arg in args]
+            engine = context.engine
+            performed = mask & engine.can_act(context.games, context.slots)
+            if performed.any():
+                games, slots = context.games[performed], context.slots[performed]
+                engine.acted[games, slots] = True
+                context.acted |= performed
+                if cmd != "wait":
+                    getattr(engine, "act_" + cmd)(games, slots, *[value[performed] for value in values])
+            return performed * 1.0
+        return run_critical_action
+
+    @staticmethod
+    def lower_info(cmd):
+        def run_info(context, mask):
+            values = context.info[cmd]
+            changed = mask & context.acted
+            if changed.any():
+                values = values.copy()
+                values[changed] = context.engine.compute_info(cmd, context.games[changed], context.slots[changed])
+            return values.astype(np.float64)
+        return run_info